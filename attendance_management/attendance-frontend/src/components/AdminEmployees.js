@@ -16,6 +16,8 @@ const AdminEmployees = () => {
     designation: '',
     status: ''
   });
+  const [search, setSearch] = useState('');
+  const [searchIds, setSearchIds] = useState(null);
   const [newEmployee, setNewEmployee] = useState({
     username: '',
     email: '',
@@ -34,7 +36,24 @@ const AdminEmployees = () => {
 
   useEffect(() => {
     filterEmployees();
-  }, [employees, filters]);
+  }, [employees, filters, searchIds]);
+
+  useEffect(() => {
+    if (!search.trim()) {
+      setSearchIds(null);
+      return undefined;
+    }
+    // Wait for a pause in typing before asking the server
+    const timer = setTimeout(async () => {
+      try {
+        const response = await authAPI.searchUsers({ q: search, limit: 100, fields: 'id' });
+        setSearchIds(response.data.results.map(user => user.id));
+      } catch (error) {
+        setSearchIds([]);
+      }
+    }, 250);
+    return () => clearTimeout(timer);
+  }, [search]);
 
   const fetchEmployees = async () => {
     try {
@@ -48,6 +67,11 @@ const AdminEmployees = () => {
   const filterEmployees = () => {
     let filtered = employees;
     
+    if (searchIds) {
+      // Keep the server's best-match-first order
+      const byId = new Map(employees.map(emp => [emp.id, emp]));
+      filtered = searchIds.map(id => byId.get(id)).filter(Boolean);
+    }
     if (filters.project) {
       filtered = filtered.filter(emp => emp.project === filters.project);
     }
@@ -161,11 +185,43 @@ const AdminEmployees = () => {
     }
   };
 
+  const handleImport = async (e) => {
+    const file = e.target.files[0];
+    e.target.value = '';
+    if (!file) return;
+    try {
+      const response = await authAPI.importUsers(file);
+      const { created, errors } = response.data;
+      toast.success(`Imported ${created} employees`);
+      errors.slice(0, 5).forEach(error => {
+        toast.error(`Row ${error.row}: ${Object.values(error.errors).join(' ')}`);
+      });
+      fetchEmployees();
+    } catch (error) {
+      toast.error(error.response?.data?.error || 'Failed to import employees');
+    }
+  };
+
+  const loadMoreLeaveHistory = async () => {
+    // Leave history is paginated; append the next page to the drawer
+    try {
+      const response = await attendanceAPI.getEmployeeLeaveHistory(selectedEmployee.id, { cursor: leaveData.next_cursor });
+      setLeaveData({
+        ...leaveData,
+        leave_history: [...leaveData.leave_history, ...response.data.leave_history],
+        next_cursor: response.data.next_cursor,
+      });
+    } catch (error) {
+      toast.error('Failed to fetch leave history');
+    }
+  };
+
   return (
     <div className="container">
       <div className="card">
         <div style={{ display: 'flex', justifyContent: 'space-between', alignItems: 'center', marginBottom: '24px' }}>
           <h1 className="text-2xl font-bold" style={{ color: '#111827' }}>Employee Management</h1>
+          <div style={{ display: 'flex', gap: '12px' }}>
           <button
             onClick={() => setShowCreateForm(true)}
             className="btn btn-primary"
@@ -178,10 +234,29 @@ const AdminEmployees = () => {
           >
             + Add Employee
           </button>
+          <label className="btn btn-secondary" style={{ borderRadius: '8px', padding: '10px 20px', cursor: 'pointer' }}>
+            Import CSV/XLSX
+            <input type="file" accept=".csv,.xlsx" onChange={handleImport} style={{ display: 'none' }} />
+          </label>
+          </div>
         </div>
 
         {/* Filters */}
         <div style={{ display: 'flex', gap: '12px', marginBottom: '24px', flexWrap: 'wrap' }}>
+          <input
+            type="search"
+            value={search}
+            onChange={(e) => setSearch(e.target.value)}
+            placeholder="Search name, ID, project..."
+            style={{
+              padding: '8px 12px',
+              border: '1px solid #e2e8f0',
+              borderRadius: '8px',
+              fontSize: '14px',
+              backgroundColor: '#f8fafc',
+              minWidth: '240px'
+            }}
+          />
           <select
             value={filters.project}
             onChange={(e) => setFilters({ ...filters, project: e.target.value })}
@@ -869,6 +944,11 @@ const AdminEmployees = () => {
                     </div>
                   </div>
                 ))}
+                {leaveData.next_cursor && (
+                  <button onClick={loadMoreLeaveHistory} className="btn btn-secondary" style={{ width: '100%' }}>
+                    Load more
+                  </button>
+                )}
               </div>
             </div>
           </div>
@@ -14,36 +14,35 @@ const AdminReports = () => {
   const fetchAttendanceReport = async () => {
     setLoading(true);
     try {
-      const response = await attendanceAPI.getAdminReport();
-      setAttendanceData(response.data);
+      // The report is keyset-paginated; follow next_cursor until the last page
+      const rows = [];
+      let cursor = null;
+      do {
+        const response = await attendanceAPI.getAdminReport({ limit: 1000, ...(cursor && { cursor }) });
+        rows.push(...response.data.results);
+        cursor = response.data.next_cursor;
+      } while (cursor);
+      setAttendanceData(rows);
     } catch (error) {
       toast.error('Failed to fetch attendance report');
     }
     setLoading(false);
   };
 
-  const downloadReport = () => {
-    const csvContent = [
-      ['Employee', 'Date', 'Clock In', 'Clock Out', 'Total Hours', 'Sessions', 'Status'],
-      ...attendanceData.map(record => [
-        `${record.user?.first_name || ''} ${record.user?.last_name || ''}`,
-        record.date,
-        record.clock_in ? new Date(record.clock_in).toLocaleTimeString() : 'N/A',
-        record.clock_out ? new Date(record.clock_out).toLocaleTimeString() : 'N/A',
-        record.total_hours || '0.00',
-        record.sessions_count || '1',
-        record.is_present ? 'Present' : 'Absent'
-      ])
-    ].map(row => row.join(',')).join('\n');
-
-    const blob = new Blob([csvContent], { type: 'text/csv' });
-    const url = window.URL.createObjectURL(blob);
-    const a = document.createElement('a');
-    a.href = url;
-    a.download = `attendance_report_${new Date().toISOString().split('T')[0]}.csv`;
-    a.click();
-    window.URL.revokeObjectURL(url);
-    toast.success('Report downloaded successfully!');
+  const downloadReport = async () => {
+    // The server streams the CSV, so large ranges don't have to be loaded here first
+    try {
+      const response = await attendanceAPI.exportAdminReport();
+      const url = window.URL.createObjectURL(new Blob([response.data], { type: 'text/csv' }));
+      const a = document.createElement('a');
+      a.href = url;
+      a.download = `attendance_report_${new Date().toISOString().split('T')[0]}.csv`;
+      a.click();
+      window.URL.revokeObjectURL(url);
+      toast.success('Report downloaded successfully!');
+    } catch (error) {
+      toast.error('Failed to download attendance report');
+    }
   };
 
   const calculateStats = () => {
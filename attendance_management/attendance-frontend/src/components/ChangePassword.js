@@ -17,10 +17,13 @@ const ChangePassword = ({ onClose }) => {
     }
 
     try {
-      await userAPI.changePassword({
+      const response = await userAPI.changePassword({
         old_password: passwords.old_password,
         new_password: passwords.new_password
       });
+      // Changing the password revokes the old tokens; keep this session on the new ones
+      localStorage.setItem('access_token', response.data.access);
+      localStorage.setItem('refresh_token', response.data.refresh);
       toast.success('Password changed successfully!');
       onClose();
     } catch (error) {
@@ -54,8 +54,8 @@ const Dashboard = () => {
 
   const fetchNotifications = async () => {
     try {
-      const response = await attendanceAPI.getNotifications();
-      setNotifications(response.data.slice(0, 3)); // Show only latest 3
+      const response = await attendanceAPI.getNotifications({ limit: 3 }); // Show only latest 3
+      setNotifications(response.data.results);
     } catch (error) {
       console.error('Error fetching notifications:', error);
     }
@@ -25,9 +25,8 @@ const Layout = ({ children }) => {
 
   const fetchUnreadNotifications = async () => {
     try {
-      const response = await attendanceAPI.getNotifications();
-      const unread = response.data.filter(notif => !notif.is_read).length;
-      setUnreadCount(unread);
+      const response = await attendanceAPI.getUnreadNotificationCount();
+      setUnreadCount(response.data.unread);
     } catch (error) {
       console.error('Error fetching notifications:', error);
     }
@@ -2,7 +2,7 @@ import React, { useState, useEffect, useCallback } from 'react';
 import { useAuth } from '../context/AuthContext';
 import { useNavigate } from 'react-router-dom';
 import toast from 'react-hot-toast';
-import api from '../services/api';
+import { organizationAPI } from '../services/api';
 import '../styles/Login.css';
 
 const Login = () => {
@@ -15,7 +15,7 @@ const Login = () => {
 
   const fetchOrganization = useCallback(async (orgId) => {
     try {
-      const response = await api.get('/organizations/list/');
+      const response = await organizationAPI.getOrganizations();
       const org = response.data.find(o => o.id.toString() === orgId);
       setOrganization(org);
     } catch (error) {
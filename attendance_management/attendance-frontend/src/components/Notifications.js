@@ -4,6 +4,7 @@ import toast from 'react-hot-toast';
 
 const Notifications = () => {
   const [notifications, setNotifications] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
@@ -13,13 +14,36 @@ const Notifications = () => {
   const fetchNotifications = async () => {
     try {
       const response = await attendanceAPI.getNotifications();
-      setNotifications(response.data);
+      setNotifications(response.data.results);
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       toast.error('Failed to fetch notifications');
     }
     setLoading(false);
   };
 
+  const loadMore = async () => {
+    // Notifications are paginated; append the next page
+    try {
+      const response = await attendanceAPI.getNotifications({ cursor: nextCursor });
+      setNotifications([...notifications, ...response.data.results]);
+      setNextCursor(response.data.next_cursor);
+    } catch (error) {
+      toast.error('Failed to fetch notifications');
+    }
+  };
+
+  const markAllAsRead = async () => {
+    try {
+      await attendanceAPI.markAllNotificationsRead();
+      setNotifications(notifications.map(notif => ({...notif, is_read: true})));
+      // Trigger event to update sidebar badge
+      window.dispatchEvent(new CustomEvent('notificationRead'));
+    } catch (error) {
+      toast.error('Failed to mark notifications as read');
+    }
+  };
+
   const markAsRead = async (notificationId) => {
     try {
       await attendanceAPI.markNotificationRead(notificationId);
@@ -68,7 +92,14 @@ const Notifications = () => {
   return (
     <div className="container">
       <div className="card">
-        <h1 className="text-2xl font-bold mb-4" style={{color: '#111827'}}>Notifications</h1>
+        <div style={{display: 'flex', justifyContent: 'space-between', alignItems: 'center'}} className="mb-4">
+          <h1 className="text-2xl font-bold" style={{color: '#111827'}}>Notifications</h1>
+          {notifications.some(notif => !notif.is_read) && (
+            <button onClick={markAllAsRead} className="btn btn-secondary">
+              Mark all as read
+            </button>
+          )}
+        </div>
         
         {loading ? (
           <div className="text-center" style={{padding: '40px'}}>
@@ -148,6 +179,11 @@ const Notifications = () => {
                 </div>
               ))
             )}
+            {nextCursor && (
+              <button onClick={loadMore} className="btn btn-secondary" style={{ width: '100%' }}>
+                Load more
+              </button>
+            )}
           </div>
         )}
       </div>
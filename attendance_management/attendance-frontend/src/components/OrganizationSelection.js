@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
-import api from '../services/api';
+import api, { organizationAPI } from '../services/api';
 
 const OrganizationSelection = () => {
   const [organizations, setOrganizations] = useState([]);
@@ -14,7 +14,7 @@ const OrganizationSelection = () => {
 
   const fetchOrganizations = async () => {
     try {
-      const response = await api.get('/organizations/list/');
+      const response = await organizationAPI.getOrganizations();
       setOrganizations(response.data);
     } catch (error) {
       console.error('Error fetching organizations:', error);
@@ -40,6 +40,22 @@ api.interceptors.response.use(
   }
 );
 
+// List endpoints are keyset-paginated and return { results, next_cursor }.
+// firstPage unwraps a single page; allPages follows next_cursor to the end.
+const firstPage = (request) => request.then((response) => ({ ...response, data: response.data.results }));
+
+const allPages = async (url, params = {}) => {
+  const rows = [];
+  let cursor = null;
+  let response;
+  do {
+    response = await api.get(url, { params: { limit: 1000, ...params, ...(cursor && { cursor }) } });
+    rows.push(...response.data.results);
+    cursor = response.data.next_cursor;
+  } while (cursor);
+  return { ...response, data: rows };
+};
+
 export const authAPI = {
   login: async (credentials) => {
     try {
@@ -59,7 +75,13 @@ export const authAPI = {
     return api.patch('/auth/profile/update/', data, config);
   },
   createUser: (userData) => api.post('/auth/create-user/', userData),
-  getUsers: () => api.get('/auth/users/'),
+  importUsers: (file) => {
+    const formData = new FormData();
+    formData.append('file', file);
+    return api.post('/auth/users/import/', formData);
+  },
+  getUsers: () => allPages('/auth/users/'),
+  searchUsers: (params) => api.get('/auth/users/search/', { params }),
   // Remove the duplicate /api - it should be just /auth/users/
   updateUser: (id, userData) => api.put(`/auth/users/${id}/`, userData),
   deleteUser: (id) => api.delete(`/auth/users/${id}/`)
@@ -71,22 +93,31 @@ export const attendanceAPI = {
   clockOut: () => api.post('/attendance/clock-out/'),
   getAttendanceStatus: () => api.get('/attendance/status/'),
   getTodayAttendance: () => api.get('/attendance/today/'),
-  getAttendanceHistory: () => api.get('/attendance/history/'),
+  getAttendanceHistory: () => firstPage(api.get('/attendance/history/')),
   requestLeave: (leaveData) => api.post('/attendance/leave/request/', leaveData),
   getLeaveBalance: () => api.get('/attendance/leave/balance/'),
-  getAdminReport: () => api.get('/attendance/admin/report/'),
-  getLeaveRequests: () => api.get('/attendance/leave/requests/'),
+  getAdminReport: (params) => api.get('/attendance/admin/report/', { params }),
+  exportAdminReport: (params) => api.get('/attendance/admin/report/export/', { params, responseType: 'blob' }),
+  getLeaveRequests: () => allPages('/attendance/leave/requests/'),
   getEmployeesLeaveManagement: () => api.get('/attendance/employees/leave-management/'),
   approveLeave: (leaveId) => api.patch(`/attendance/leave/${leaveId}/approve/`),
   rejectLeave: (leaveId) => api.patch(`/attendance/leave/${leaveId}/reject/`),
-  getNotifications: () => api.get('/attendance/notifications/'),
+  decideLeaves: (action, ids) => api.post('/attendance/leave/bulk/', { action, ids }),
+  getLeaveCalendar: (params) => api.get('/attendance/leave/calendar/', { params }),
+  getNotifications: (params) => api.get('/attendance/notifications/', { params }),
+  getUnreadNotificationCount: () => api.get('/attendance/notifications/unread-count/'),
   markNotificationRead: (notificationId) => api.patch(`/attendance/notifications/${notificationId}/read/`),
-  getEmployeeLeaveHistory: (employeeId) => api.get(`/attendance/employee/${employeeId}/leaves/`),
+  markAllNotificationsRead: () => api.patch('/attendance/notifications/read-all/'),
+  getEmployeeLeaveHistory: (employeeId, params) => api.get(`/attendance/employee/${employeeId}/leaves/`, { params }),
   // Add to api.js
   getMyLeaveHistory: () => api.get('/attendance/my-leaves/'),
 
 };
 
+export const organizationAPI = {
+  getOrganizations: () => allPages('/organizations/list/'),
+};
+
 export const userAPI = {
   changePassword: (passwordData) => api.post('/auth/change-password/', passwordData),
 };
@@ -0,0 +1,174 @@
+"""
+Claims-carrying JWTs and token revocation.
+
+Access and refresh tokens carry the user's role, organization id, active state
+and ``token_version``. ``ClaimsJWTAuthentication`` builds a ``ClaimsUser`` from
+those claims, so the read-only endpoints that use it authenticate without
+loading the user or the organization. ``VersionedJWTAuthentication`` is the
+default class, for endpoints that need the ``User`` itself; it loads the user
+with the organization joined through ``load_user``, a per-user cache entry
+dropped by ``forget_user`` whenever the user or their organization changes,
+so a warm request does no authentication queries at all.
+
+Revocation is per user. ``revoke_tokens`` bumps ``User.token_version``, and a
+token whose ``ver`` claim no longer matches is refused. The current version
+is read from the cache and only falls back to a one-column query on a miss.
+Every change a claim reflects (role, organization, deactivation, password)
+revokes, so a token that passes the check carries current claims.
+"""
+import logging
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils.functional import cached_property
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+TOKEN_VERSION_TTL = getattr(settings, 'ACCOUNTS_TOKEN_VERSION_TTL', 60 * 5)
+USER_CACHE_TTL = getattr(settings, 'ACCOUNTS_USER_CACHE_TTL', 60 * 5)
+
+
+def add_claims(token, user):
+    """Stamp ``user``'s role, organization, active state and token version on ``token``"""
+    token['role'] = user.role
+    token['org'] = user.organization_id
+    token['active'] = user.is_active
+    token['ver'] = user.token_version
+    return token
+
+
+def token_version_key(user_id):
+    return f'accounts:token-version:{user_id}'
+
+
+def user_key(user_id):
+    return f'accounts:user:{user_id}'
+
+
+def current_token_version(user_id):
+    """The user's token version, or ``None`` for a deleted user; cached, one small query on a miss"""
+    try:
+        version = cache.get(token_version_key(user_id))
+    except Exception:
+        logger.exception('Token version cache read failed for user %s', user_id)
+        version = None
+    if version is not None:
+        return version
+
+    version = User.objects.filter(pk=user_id).values_list('token_version', flat=True).first()
+    if version is not None:
+        try:
+            cache.set(token_version_key(user_id), version, TOKEN_VERSION_TTL)
+        except Exception:
+            logger.exception('Token version cache write failed for user %s', user_id)
+    return version
+
+
+def load_user(user_id):
+    """The user with their organization joined, or ``None``; cached, one query on a miss"""
+    try:
+        user = cache.get(user_key(user_id))
+    except Exception:
+        logger.exception('User cache read failed for user %s', user_id)
+        user = None
+    if user is not None:
+        return user
+
+    user = User.objects.select_related('organization').filter(pk=user_id).first()
+    if user is not None:
+        try:
+            cache.set(user_key(user_id), user, USER_CACHE_TTL)
+        except Exception:
+            logger.exception('User cache write failed for user %s', user_id)
+    return user
+
+
+def forget_users(user_ids):
+    """Drop the cached user and token version of ``user_ids``"""
+    keys = [key for user_id in user_ids for key in (user_key(user_id), token_version_key(user_id))]
+    try:
+        cache.delete_many(keys)
+    except Exception:
+        logger.exception('User cache delete failed for %s users', len(user_ids))
+
+
+def forget_user(user_id):
+    """Drop the user's cache entries now and again once the transaction commits"""
+    forget_users([user_id])
+    transaction.on_commit(lambda: forget_users([user_id]))
+
+
+def forget_organization(organization_id):
+    """Drop the cache entries of every user of an organization that changed"""
+    user_ids = list(User.objects.filter(organization_id=organization_id).values_list('pk', flat=True))
+    forget_users(user_ids)
+    transaction.on_commit(lambda: forget_users(user_ids))
+
+
+def revoke_tokens(user):
+    """Invalidate every token issued to ``user`` so far"""
+    User.objects.filter(pk=user.pk).update(token_version=F('token_version') + 1)
+    user.refresh_from_db(fields=['token_version'])
+    forget_user(user.pk)
+
+
+def check_token_version(validated_token, version):
+    if version is None or validated_token.get('ver') != version:
+        raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+
+
+class ClaimsUser(TokenUser):
+    """The request user as described by the access token; has no database row behind it"""
+
+    @cached_property
+    def role(self):
+        return self.token.get('role')
+
+    @cached_property
+    def organization_id(self):
+        return self.token.get('org')
+
+    @cached_property
+    def is_active(self):
+        return self.token.get('active', False)
+
+
+class VersionedJWTAuthentication(JWTAuthentication):
+    """Authenticates with the cached ``User`` (organization included), refusing revoked tokens"""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+        user = load_user(user_id)
+        if user is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        if not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        check_token_version(validated_token, user.token_version)
+        return user
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    Authenticates from the token's claims alone, for endpoints that only need
+    the user's id, role and organization id; ``request.user`` is a ``ClaimsUser``.
+    """
+
+    def get_user(self, validated_token):
+        if jwt_settings.USER_ID_CLAIM not in validated_token or 'ver' not in validated_token:
+            raise InvalidToken('Token carries no user claims; log in again')
+        check_token_version(validated_token, current_token_version(validated_token[jwt_settings.USER_ID_CLAIM]))
+        if not validated_token.get('active'):
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        return ClaimsUser(validated_token)
@@ -1,5 +1,8 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
+from django.db.models import F
+from accounts.authentication import forget_users
+from attendance.models import LeaveRequest
 from organizations.models import Organization
 
 class Command(BaseCommand):
@@ -17,5 +20,10 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f'Organization with id {org_id} does not exist.'))
             return
         employees = User.objects.filter(role='employee', organization__isnull=True)
-        count = employees.update(organization=org)
+        user_ids = list(employees.values_list('pk', flat=True))
+        # The organization is a token claim, so moving users revokes their tokens
+        count = User.objects.filter(pk__in=user_ids).update(organization=org, token_version=F('token_version') + 1)
+        # Requests filed before the move are listed under the organization too
+        LeaveRequest.objects.filter(user__in=user_ids).update(organization=org)
+        forget_users(user_ids)
         self.stdout.write(self.style.SUCCESS(f'Assigned {count} employees to organization: {org.name} (id={org.id})'))
@@ -0,0 +1,55 @@
+import csv
+import io
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+from organizations.models import Organization
+from accounts import views
+from accounts.imports import import_employees, read_rows
+from accounts.models import User
+
+class Command(BaseCommand):
+    help = 'Benchmark creating employees one POST at a time against the bulk import (all data is rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help='Employees to create on each path')
+        parser.add_argument('--workers', type=int, help='Hashing processes for the bulk path (default: one per CPU)')
+
+    def sheet(self, prefix, count):
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(['username', 'password', 'email', 'first_name', 'last_name', 'employee_id'])
+        for n in range(count):
+            writer.writerow([f'{prefix}-{n}', 'Onboarding-2031', f'{prefix}-{n}@example.invalid', 'Bench', str(n), f'{prefix[0].upper()}{n}'])
+        return io.BytesIO(output.getvalue().encode())
+
+    def handle(self, *args, **options):
+        count = options['rows']
+        factory = APIRequestFactory()
+
+        with transaction.atomic():
+            organization = Organization.objects.create(name='Benchmark', email='benchmark@example.invalid')
+            admin = User.objects.create(username='benchmark-admin', role='admin', organization=organization)
+
+            started = time.perf_counter()
+            for n in range(count):
+                request = factory.post('/api/auth/create-user/', {
+                    'username': f'single-{n}', 'password': 'Onboarding-2031', 'email': f'single-{n}@example.invalid',
+                    'first_name': 'Bench', 'last_name': str(n), 'employee_id': f'S{n}'
+                }, format='json')
+                force_authenticate(request, admin)
+                views.UserCreateView.as_view()(request)
+            single_elapsed = time.perf_counter() - started
+
+            started = time.perf_counter()
+            report = import_employees(read_rows(self.sheet('bulk', count), 'bench.csv'), organization, options['workers'])
+            bulk_elapsed = time.perf_counter() - started
+            created = User.objects.filter(organization=organization).count() - 1
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'Employees per path: {count} (created {created}, {len(report["errors"])} bulk rows rejected)')
+        self.stdout.write(f'Single POST: {single_elapsed:.2f}s ({count / single_elapsed:,.1f} employees/sec)')
+        self.stdout.write(f'Bulk import: {bulk_elapsed:.2f}s ({count / bulk_elapsed:,.1f} employees/sec)')
+        self.stdout.write(self.style.SUCCESS(f'Bulk is {single_elapsed / bulk_elapsed:.1f}x faster'))
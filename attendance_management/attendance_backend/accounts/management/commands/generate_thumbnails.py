@@ -0,0 +1,54 @@
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from accounts.authentication import forget_users
+from accounts.imports import init_worker
+from accounts.thumbnails import thumbnail_file
+
+class Command(BaseCommand):
+    help = 'Generate thumbnails and content-hashed names for profile pictures stored without them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Processes rendering thumbnails in parallel')
+        parser.add_argument('--all', action='store_true', help='Redo pictures that already have thumbnails')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+
+        User = get_user_model()
+        users = User.objects.exclude(profile_picture='').exclude(profile_picture__isnull=True)
+        if not options['all']:
+            users = users.filter(profile_thumbnails={})
+        # Users sharing a file share its thumbnails
+        owners = defaultdict(list)
+        for user_id, name in users.values_list('pk', 'profile_picture'):
+            owners[name].append(user_id)
+
+        started = time.perf_counter()
+        workers = min(options['workers'], len(owners))
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+                results = list(pool.map(thumbnail_file, owners, chunksize=max(1, len(owners) // (workers * 4))))
+        else:
+            results = [thumbnail_file(name) for name in owners]
+
+        updated, failed = [], 0
+        for name, picture, thumbnails in results:
+            if picture is None:
+                failed += 1
+                self.stderr.write(self.style.WARNING(f'Skipped {name}: {thumbnails}'))
+                continue
+            User.objects.filter(pk__in=owners[name]).update(profile_picture=picture, profile_thumbnails=thumbnails)
+            updated += owners[name]
+        forget_users(updated)
+        elapsed = time.perf_counter() - started
+
+        rate = (len(owners) - failed) / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated thumbnails for {len(owners) - failed} pictures ({len(updated)} users, {failed} skipped) '
+            f'in {elapsed:.2f}s with {max(workers, 1)} workers ({rate:,.1f} pictures/sec)'
+        ))
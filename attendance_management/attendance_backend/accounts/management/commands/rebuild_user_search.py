@@ -0,0 +1,14 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from accounts.search import rebuild_index
+
+class Command(BaseCommand):
+    help = 'Rebuild the employee directory search index from the users table'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with transaction.atomic():
+            indexed = rebuild_index()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} users in {elapsed:.2f}s'))
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_alter_user_options_user_organization_and_more'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('organizations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['organization', 'username'], name='user_org_username_idx'),
+        ),
+    ]
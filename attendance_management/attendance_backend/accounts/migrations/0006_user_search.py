@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:02
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_user_token_version'),
+    ]
+
+    operations = [
+        # Full-text index of the employee directory (see accounts.search)
+        migrations.RunSQL(
+            sql=[
+                "CREATE VIRTUAL TABLE accounts_user_search USING fts5("
+                "username, first_name, last_name, employee_id, project, designation, "
+                "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+                "INSERT INTO accounts_user_search "
+                "(rowid, username, first_name, last_name, employee_id, project, designation) "
+                "SELECT id, username, first_name, last_name, COALESCE(employee_id, ''), project, designation "
+                "FROM accounts_user",
+            ],
+            reverse_sql='DROP TABLE accounts_user_search',
+        ),
+    ]
@@ -11,14 +11,22 @@ class User(AbstractUser):
     employee_id = models.CharField(max_length=20, null=True, blank=True)
     phone = models.CharField(max_length=15, blank=True)
     profile_picture = models.ImageField(upload_to='profiles/', blank=True, null=True)
+    # Thumbnail file per size of the profile picture (see accounts.thumbnails)
+    profile_thumbnails = models.JSONField(default=dict, blank=True)
     project = models.CharField(max_length=100, blank=True)
     designation = models.CharField(max_length=100, blank=True)
     date_joined_company = models.DateField(null=True, blank=True)
     organization = models.ForeignKey('organizations.Organization', on_delete=models.CASCADE, null=True, blank=True)
     is_active = models.BooleanField(default=True)
+    # Bumped to revoke every token issued so far (see accounts.authentication)
+    token_version = models.PositiveIntegerField(default=0)
     
     class Meta:
         unique_together = [['employee_id', 'organization']]
+        indexes = [
+            # user_list: an organization's users paged by username
+            models.Index(fields=['organization', 'username'], name='user_org_username_idx'),
+        ]
     
     def __str__(self):
         return f"{self.username} - {self.get_role_display()}"
\ No newline at end of file
@@ -0,0 +1,132 @@
+"""
+Employee directory search on an SQLite FTS5 index.
+
+``accounts_user_search`` is an FTS5 table holding each user's searchable
+text under ``rowid = user.id``. It stores no organization or status: a search
+joins back to ``accounts_user`` on the primary key for those, so moving or
+deactivating a user never leaves the index stale. The text is kept in sync by
+the ``User`` signals in ``accounts.signals`` and by ``bulk_create`` callers
+through ``index_users``; ``manage.py rebuild_user_search`` rebuilds it from
+scratch.
+
+Every word of the query is matched as a prefix, helped by the 2- and
+3-character prefix indexes. Results are ranked with ``bm25``, weighting
+usernames and employee ids above names and names above project and
+designation, and paged with an ``(id, score, ranked)`` keyset cursor. Only a
+query with at most ``MAX_RANKED_MATCHES`` hits in the organization is ranked;
+a broader one (a one- or two-letter prefix at tens of thousands of users) is
+listed in id order, which FTS5 reads straight off the index, so every search
+stays a few milliseconds. The cursor carries the first page's choice.
+"""
+import re
+from django.db import connection
+from attendance.pagination import decode_cursor, encode_cursor
+
+TABLE = 'accounts_user_search'
+COLUMNS = ('username', 'first_name', 'last_name', 'employee_id', 'project', 'designation')
+WEIGHTS = (10.0, 5.0, 5.0, 10.0, 1.0, 1.0)
+MAX_TERMS = 8
+# Broader queries are returned in id order instead of by relevance
+MAX_RANKED_MATCHES = 500
+
+POPULATE_SQL = (
+    f"INSERT INTO {TABLE} (rowid, {', '.join(COLUMNS)}) SELECT id, "
+    + ', '.join(f"COALESCE({name}, '')" for name in COLUMNS)
+    + ' FROM accounts_user'
+)
+# CROSS JOIN keeps SQLite from driving the query from the organization's users
+# and evaluating MATCH once per user
+MATCHES_SQL = (
+    f'FROM {TABLE} CROSS JOIN accounts_user u ON u.id = {TABLE}.rowid '
+    f"WHERE {TABLE} MATCH %s AND u.organization_id = %s AND u.is_active AND u.role = 'employee'"
+)
+SCORE = f"bm25({TABLE}, {', '.join(str(weight) for weight in WEIGHTS)})"
+
+
+def match_expression(text):
+    """FTS5 query matching every word of ``text`` as a prefix, or ``''`` if it has no words"""
+    # The same split as the unicode61 tokenizer: letters and digits, no underscores
+    terms = re.findall(r'[^\W_]+', text.lower())[:MAX_TERMS]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def index_users(users):
+    """Add or refresh the index rows of ``users``"""
+    rows = [[user.pk] + [getattr(user, name) or '' for name in COLUMNS] for user in users]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT OR REPLACE INTO {TABLE} (rowid, {', '.join(COLUMNS)}) VALUES ({', '.join(['%s'] * (len(COLUMNS) + 1))})",
+            rows
+        )
+
+
+def unindex_users(user_ids):
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {TABLE} WHERE rowid = %s', [[user_id] for user_id in user_ids])
+
+
+def rebuild_index():
+    """Re-create the index from ``accounts_user``; returns the number of users indexed"""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        cursor.execute(POPULATE_SQL)
+        indexed = cursor.rowcount
+        # Merge the b-trees left by the insert into one for the fastest reads
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+    return indexed
+
+
+def is_narrow(expression, organization_id):
+    """Whether the organization has few enough matches to rank them; stops counting past the limit"""
+    # bm25 is computed for every match before sorting; past a few hundred
+    # hits relevance tells them apart little anyway, so keep id order
+    with connection.cursor() as db:
+        # Matches in every organization bound the organization's from above and cost a fraction to count
+        db.execute(
+            f'SELECT COUNT(*) FROM (SELECT 1 FROM {TABLE} WHERE {TABLE} MATCH %s LIMIT %s)',
+            [expression, MAX_RANKED_MATCHES + 1]
+        )
+        if db.fetchone()[0] <= MAX_RANKED_MATCHES:
+            return True
+        db.execute(
+            f'SELECT COUNT(*) FROM (SELECT 1 {MATCHES_SQL} LIMIT %s)',
+            [expression, organization_id, MAX_RANKED_MATCHES + 1]
+        )
+        return db.fetchone()[0] <= MAX_RANKED_MATCHES
+
+
+def search_users(organization_id, text, cursor=None, limit=20):
+    """
+    Return ``(user_ids, next_cursor)`` for the active employees of an
+    organization matching ``text``, best match first (id order for broad queries).
+
+    Raises ``ValueError`` for a query without words or a bad cursor.
+    """
+    expression = match_expression(text)
+    if not expression:
+        raise ValueError('q must contain at least one letter or digit')
+
+    params = [expression, organization_id]
+    if cursor:
+        # Later pages keep the first page's mode, or their scores wouldn't compare
+        last_id, last_score, ranked = decode_cursor(cursor, 3)
+        if not isinstance(last_score, (int, float)) or not isinstance(last_id, int) or not isinstance(ranked, bool):
+            raise ValueError('Invalid cursor')
+    else:
+        ranked = is_narrow(expression, organization_id)
+    score = SCORE if ranked else '0'
+
+    sql = f'SELECT {TABLE}.rowid, {score} AS score {MATCHES_SQL}'
+    if cursor:
+        sql += f' AND ({score} > %s OR ({score} = %s AND {TABLE}.rowid > %s))'
+        params += [last_score, last_score, last_id]
+    sql += f' ORDER BY score, {TABLE}.rowid LIMIT %s'
+    params.append(limit + 1)
+
+    with connection.cursor() as db:
+        db.execute(sql, params)
+        rows = db.fetchall()
+    next_cursor = encode_cursor([*rows[limit - 1], ranked]) if len(rows) > limit else None
+    return [user_id for user_id, _ in rows[:limit]], next_cursor
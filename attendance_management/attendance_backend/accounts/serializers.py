@@ -1,10 +1,35 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from .authentication import add_claims, check_token_version, current_token_version
+from .thumbnails import picture_url, set_profile_picture
 
 User = get_user_model()
 
-class UserSerializer(serializers.ModelSerializer):
+class ProfilePictureMixin:
+    """Stores an uploaded profile picture with its thumbnails and returns the ``picture_size`` thumbnail URL"""
+    picture_size = 'large'
+    
+    def update(self, instance, validated_data):
+        if 'profile_picture' in validated_data:
+            picture = validated_data.pop('profile_picture')
+            if picture:
+                set_profile_picture(instance, picture)
+            else:
+                instance.profile_picture = None
+                instance.profile_thumbnails = {}
+        return super().update(instance, validated_data)
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if 'profile_picture' in data:
+            data['profile_picture'] = picture_url(self.context.get('request'), instance, self.picture_size)
+        return data
+
+class UserSerializer(ProfilePictureMixin, serializers.ModelSerializer):
     organization_name = serializers.CharField(source='organization.name', read_only=True)
     
     class Meta:
@@ -41,7 +66,31 @@ class UserCreateSerializer(serializers.ModelSerializer):
         )
         return user
 
-class ProfileUpdateSerializer(serializers.ModelSerializer):
+class ProfileUpdateSerializer(ProfilePictureMixin, serializers.ModelSerializer):
     class Meta:
         model = User
-        fields = ['first_name', 'last_name', 'phone', 'profile_picture']
\ No newline at end of file
+        fields = ['first_name', 'last_name', 'phone', 'profile_picture']
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Login: tokens carry the user's claims and the response includes the user, already loaded by authenticate()"""
+    
+    @classmethod
+    def get_token(cls, user):
+        return add_claims(super().get_token(user), user)
+    
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        data['user'] = UserSerializer(self.user, context=self.context).data
+        return data
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh: refuses refresh tokens revoked by a token version bump"""
+    
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        try:
+            check_token_version(refresh, current_token_version(refresh[jwt_settings.USER_ID_CLAIM]))
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+        return super().validate(attrs)
+
@@ -0,0 +1,34 @@
+"""
+Keeps derived user state in step with the models it comes from.
+
+Cached users are dropped when their organization changes; organizations are
+only edited through the Django admin and management commands, so there is no
+view to hang the invalidation on. The directory search index follows every
+saved or deleted user.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from organizations.models import Organization
+from .authentication import forget_organization
+from .search import COLUMNS, index_users, unindex_users
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Organization)
+@receiver(pre_delete, sender=Organization)
+def organization_changed(sender, instance, **kwargs):
+    forget_organization(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    # Logins save last_login alone; only searchable changes touch the index
+    if update_fields is None or set(update_fields) & set(COLUMNS):
+        index_users([instance])
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    unindex_users([instance.pk])
@@ -1,3 +1,355 @@
-from django.test import TestCase
+import os
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.test import APIClient
+from openpyxl import Workbook
+from PIL import Image
+from rest_framework_simplejwt.tokens import AccessToken
+from organizations.models import Organization
+from .imports import hash_passwords
+from attendance_system.urls import serve_media
 
-# Create your tests here.
+User = get_user_model()
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ClaimsTokenTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.org = Organization.objects.create(name='Demo Company Ltd.', email='demo@company.com')
+        self.admin = User.objects.create_user(username='admin', password='secret-1', role='admin', organization=self.org)
+        self.user = User.objects.create_user(username='employee1', password='secret-1', organization=self.org)
+        self.client = APIClient()
+
+    def login(self, username='employee1', password='secret-1'):
+        response = self.client.post('/api/auth/login/', {'username': username, 'password': password}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def get(self, url, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        return self.client.get(url)
+
+    def test_login_issues_claims(self):
+        data = self.login()
+        token = AccessToken(data['access'])
+        self.assertEqual((token['role'], token['org'], token['active'], token['ver']), ('employee', self.org.pk, True, 0))
+        self.assertEqual(data['user']['organization_name'], 'Demo Company Ltd.')
+
+    def test_claims_endpoints_skip_the_user_query(self):
+        access = self.login()['access']
+        self.get('/api/attendance/notifications/unread-count/', access)
+        # Only the counter read; no accounts_user or organization lookup
+        with self.assertNumQueries(1):
+            response = self.get('/api/attendance/notifications/unread-count/', access)
+        self.assertEqual(response.data, {'unread': 0})
+        with self.assertNumQueries(2):
+            self.get('/api/attendance/leave/balance/', access)
+
+    def test_password_change_revokes_tokens(self):
+        old = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {old['access']}")
+        response = self.client.post('/api/auth/change-password/', {'old_password': 'secret-1', 'new_password': 'secret-2'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.get('/api/attendance/history/', old['access']).status_code, 401)
+        self.assertEqual(self.get('/api/attendance/leave/balance/', old['access']).status_code, 401)
+        self.client.credentials()
+        self.assertEqual(self.client.post('/api/auth/token/refresh/', {'refresh': old['refresh']}, format='json').status_code, 401)
+
+        self.assertEqual(self.get('/api/attendance/history/', response.data['access']).status_code, 200)
+        refreshed = self.client.post('/api/auth/token/refresh/', {'refresh': response.data['refresh']}, format='json')
+        self.assertEqual(refreshed.status_code, 200)
+
+    def test_role_and_active_changes_revoke_tokens(self):
+        access = self.login()['access']
+        admin = APIClient()
+        admin.force_authenticate(self.admin)
+        admin.patch(f'/api/auth/users/{self.user.pk}/', {'phone': '555'}, format='json')
+        self.assertEqual(self.get('/api/attendance/history/', access).status_code, 200)
+
+        admin.patch(f'/api/auth/users/{self.user.pk}/', {'is_active': False}, format='json')
+        self.assertEqual(self.get('/api/attendance/history/', access).status_code, 401)
+
+    def test_tokens_without_claims_are_refused(self):
+        self.assertEqual(self.get('/api/attendance/history/', AccessToken.for_user(self.user)).status_code, 401)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class CachedUserTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.org = Organization.objects.create(name='Demo Company Ltd.', email='demo@company.com')
+        self.admin = User.objects.create_user(username='admin', password='secret-1', role='admin', organization=self.org)
+        self.user = User.objects.create_user(username='employee1', password='secret-1', organization=self.org)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.login('employee1')}")
+
+    def login(self, username):
+        response = APIClient().post('/api/auth/login/', {'username': username, 'password': 'secret-1'}, format='json')
+        return response.data['access']
+
+    def test_attendance_status_skips_user_queries(self):
+        self.client.get('/api/attendance/status/')
+        # User, organization and presence all come from the cache
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/attendance/status/')
+        self.assertFalse(response.data['is_clocked_in'])
+
+    def test_organization_is_preloaded(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.login('admin')}")
+        self.client.get('/api/attendance/leave/calendar/')
+        with self.assertNumQueries(1):
+            self.client.get('/api/attendance/leave/calendar/')
+
+    def test_profile_and_organization_changes_invalidate(self):
+        self.client.get('/api/auth/profile/')
+        self.client.patch('/api/auth/profile/update/', {'first_name': 'Asha'}, format='multipart')
+        self.assertEqual(self.client.get('/api/auth/profile/').data['first_name'], 'Asha')
+
+        self.org.name = 'Renamed Ltd.'
+        self.org.save()
+        self.assertEqual(self.client.get('/api/auth/profile/').data['organization_name'], 'Renamed Ltd.')
+
+    def test_deleted_users_are_refused(self):
+        self.client.get('/api/attendance/status/')
+        admin = APIClient()
+        admin.force_authenticate(self.admin)
+        admin.delete(f'/api/auth/users/{self.user.pk}/')
+        self.assertEqual(self.client.get('/api/attendance/status/').status_code, 401)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class EmployeeImportTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Demo Company Ltd.', email='demo@company.com')
+        self.admin = User.objects.create_user(username='admin', role='admin', organization=self.org)
+        User.objects.create_user(username='taken', organization=self.org, employee_id='E1')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def upload(self, content, name='employees.csv', **params):
+        url = '/api/auth/users/import/' + ('?dry_run=1' if params.get('dry_run') else '')
+        return self.client.post(url, {'file': SimpleUploadedFile(name, content)}, format='multipart')
+
+    def test_valid_rows_are_created_and_bad_rows_reported(self):
+        sheet = (
+            'Username,Password,Email,First Name,Employee ID,Role,Date Joined Company\n'
+            'asha,pw-1,asha@example.com,Asha,E2,,2031-01-05\n'
+            'taken,pw-2,,,,,\n'
+            'ravi,pw-3,not-an-email,,E1,,\n'
+            'asha,pw-4,,,E3,,\n'
+            'mei,,,,E2,boss,05/01/2031\n'
+            'lee,pw-6,,,E4,Admin,\n'
+        ).encode()
+        # Two lookups for the whole sheet, then one INSERT and one search index write (inside a savepoint)
+        with self.assertNumQueries(6):
+            response = self.upload(sheet)
+
+        self.assertEqual((response.data['total'], response.data['created']), (6, 2))
+        errors = {error['row']: error['errors'] for error in response.data['errors']}
+        self.assertEqual(sorted(errors), [3, 4, 5, 6])
+        self.assertIn('username', errors[3])
+        self.assertEqual(sorted(errors[4]), ['email', 'employee_id'])
+        self.assertIn('username', errors[5])
+        self.assertEqual(sorted(errors[6]), ['date_joined_company', 'employee_id', 'password', 'role'])
+
+        asha = User.objects.get(username='asha')
+        self.assertEqual((asha.organization, asha.role, asha.employee_id, str(asha.date_joined_company)), (self.org, 'employee', 'E2', '2031-01-05'))
+        self.assertTrue(asha.check_password('pw-1'))
+        self.assertEqual(User.objects.get(username='lee').role, 'admin')
+
+    def test_xlsx_and_dry_run(self):
+        workbook = Workbook()
+        workbook.active.append(['username', 'password', 'employee_id'])
+        workbook.active.append(['asha', 'pw-1', 101])
+        workbook.active.append(['ravi', 'pw-2', None])
+        content = BytesIO()
+        workbook.save(content)
+
+        response = self.upload(content.getvalue(), 'employees.xlsx', dry_run=True)
+        self.assertEqual((response.data['created'], response.data['dry_run']), (2, True))
+        self.assertFalse(User.objects.filter(username='asha').exists())
+        self.upload(content.getvalue(), 'employees.xlsx')
+        self.assertEqual(User.objects.get(username='asha').employee_id, '101')
+        self.assertIsNone(User.objects.get(username='ravi').employee_id)
+
+    def test_rejects_bad_uploads(self):
+        self.assertEqual(self.upload(b'username\nasha\n').status_code, 400)
+        self.assertEqual(self.upload(b'data', 'employees.txt').status_code, 400)
+        self.client.force_authenticate(User.objects.get(username='taken'))
+        self.assertEqual(self.upload(b'username,password\nasha,pw\n').status_code, 403)
+
+    def test_passwords_hash_across_processes(self):
+        passwords = [f'pw-{n}' for n in range(40)]
+        hashes = hash_passwords(passwords, workers=2)
+        self.assertTrue(all(check_password(password, hashed) for password, hashed in zip(passwords, hashes)))
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile(suffix='.csv') as sheet:
+            sheet.write(b'username,password\nasha,pw-1\ntaken,pw-2\n')
+            sheet.flush()
+            out = StringIO()
+            call_command('import_employees', sheet.name, '--organization', str(self.org.pk), stdout=out)
+        self.assertIn('Created 1 of 2 employees', out.getvalue())
+        self.assertIn('Row 3 (taken)', out.getvalue())
+
+
+class EmployeeSearchTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Demo Company Ltd.', email='demo@company.com')
+        other = Organization.objects.create(name='Other Ltd.', email='other@company.com')
+        self.admin = User.objects.create_user(username='admin', role='admin', organization=self.org)
+        self.asha = User.objects.create_user(username='asha', first_name='Asha', last_name='Rao', employee_id='E-101', project='Payroll', organization=self.org)
+        self.ravi = User.objects.create_user(username='ravi', first_name='Ravi', last_name='Payroller', designation='Lead', organization=self.org)
+        User.objects.create_user(username='ashok', first_name='Ashok', organization=other)
+        User.objects.create_user(username='ashwin', first_name='Ashwin', organization=self.org, is_active=False)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def search(self, q, **params):
+        return self.client.get('/api/auth/users/search/', {'q': q, **params})
+
+    def usernames(self, response):
+        return [user['username'] for user in response.data['results']]
+
+    def test_prefix_matches_are_scoped_and_ranked(self):
+        self.assertEqual(self.usernames(self.search('ash')), ['asha'])
+        self.assertEqual(self.usernames(self.search('asha ra')), ['asha'])
+        self.assertEqual(self.usernames(self.search('e-101')), ['asha'])
+        # A name hit outranks a project hit
+        self.assertEqual(self.usernames(self.search('payroll')), ['ravi', 'asha'])
+
+        page = self.search('payroll', limit=1)
+        self.assertEqual(self.usernames(page), ['ravi'])
+        page = self.search('payroll', limit=1, cursor=page.data['next_cursor'])
+        self.assertEqual((self.usernames(page), page.data['next_cursor']), (['asha'], None))
+
+    def test_broad_queries_fall_back_to_id_order(self):
+        with mock.patch('accounts.search.MAX_RANKED_MATCHES', 1):
+            self.assertEqual(self.usernames(self.search('payroll')), ['asha', 'ravi'])
+            page = self.search('payroll', limit=1)
+        # The next page keeps id order even though the query would now be ranked
+        page = self.search('payroll', limit=1, cursor=page.data['next_cursor'])
+        self.assertEqual(self.usernames(page), ['ravi'])
+
+    def test_other_organizations_do_not_decide_ranking(self):
+        other = Organization.objects.get(name='Other Ltd.')
+        for n in range(3):
+            User.objects.create_user(username=f'payroll{n}', organization=other)
+        with mock.patch('accounts.search.MAX_RANKED_MATCHES', 2):
+            self.assertEqual(self.usernames(self.search('payroll')), ['ravi', 'asha'])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.ravi.last_name = 'Menon'
+        self.ravi.save()
+        self.assertEqual(self.usernames(self.search('menon')), ['ravi'])
+        self.assertEqual(self.usernames(self.search('payroll')), ['asha'])
+        self.asha.delete()
+        self.assertEqual(self.usernames(self.search('payroll')), [])
+
+    def test_bad_queries(self):
+        self.assertEqual(self.search('').status_code, 400)
+        self.assertEqual(self.search('"*').status_code, 400)
+        self.assertEqual(self.search('asha', cursor='nope').status_code, 400)
+        self.client.force_authenticate(self.asha)
+        self.assertEqual(self.search('asha').status_code, 403)
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM accounts_user_search')
+        out = StringIO()
+        call_command('rebuild_user_search', stdout=out)
+        self.assertIn('Indexed 5 users', out.getvalue())
+        self.assertEqual(self.usernames(self.search('ravi')), ['ravi'])
+
+
+def jpeg(width=1200, height=800):
+    content = BytesIO()
+    Image.new('RGB', (width, height), (200, 40, 40)).save(content, 'JPEG')
+    return content.getvalue()
+
+
+class ProfileThumbnailTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        media = override_settings(MEDIA_ROOT=self.media.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        cache.clear()
+        self.org = Organization.objects.create(name='Demo Company Ltd.', email='demo@company.com')
+        self.admin = User.objects.create_user(username='admin', role='admin', organization=self.org)
+        self.user = User.objects.create_user(username='employee1', organization=self.org)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, content):
+        return self.client.patch(
+            '/api/auth/profile/update/', {'profile_picture': SimpleUploadedFile('IMG_0001.jpg', content)}, format='multipart'
+        )
+
+    def test_upload_stores_hashed_thumbnails(self):
+        response = self.upload(jpeg())
+        self.user.refresh_from_db()
+        self.assertEqual(sorted(self.user.profile_thumbnails), ['large', 'small'])
+        self.assertRegex(self.user.profile_picture.name, r'^profiles/[0-9a-f]{20}\.jpg$')
+        with default_storage.open(self.user.profile_thumbnails['small']) as thumbnail, Image.open(thumbnail) as image:
+            self.assertEqual((image.format, image.size), ('WEBP', (160, 160)))
+        self.assertTrue(response.data['profile_picture'].endswith(self.user.profile_thumbnails['large']))
+
+        # The same photo again is the same files, not a copy
+        before = self.user.profile_thumbnails
+        self.upload(jpeg())
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.profile_thumbnails, before)
+        self.assertEqual(len(os.listdir(os.path.join(self.media.name, 'profiles', 'thumbs'))), 2)
+
+    def test_names_chosen_by_the_storage_are_kept(self):
+        save = default_storage.save
+        with mock.patch.object(default_storage, 'save', side_effect=lambda name, content: save(name.replace('.', '_x.'), content)):
+            self.upload(jpeg())
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.profile_picture.name.endswith('_x.jpg'))
+        for name in [self.user.profile_picture.name, *self.user.profile_thumbnails.values()]:
+            self.assertTrue(default_storage.exists(name), name)
+
+    def test_admin_lists_return_small_thumbnails(self):
+        self.upload(jpeg())
+        self.user.refresh_from_db()
+        self.client.force_authenticate(self.admin)
+        employees = self.client.get('/api/attendance/employees/leave-management/').data
+        self.assertTrue(employees[0]['profile_picture'].endswith(self.user.profile_thumbnails['small']))
+        history = self.client.get(f'/api/attendance/employee/{self.user.pk}/leaves/').data
+        self.assertTrue(history['employee']['profile_picture'].endswith(self.user.profile_thumbnails['small']))
+
+    def test_hashed_files_are_served_immutable(self):
+        self.upload(jpeg())
+        self.user.refresh_from_db()
+        request = RequestFactory().get('/media/')
+        response = serve_media(request, self.user.profile_thumbnails['small'])
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        default_storage.save('profiles/legacy.jpg', BytesIO(jpeg()))
+        self.assertNotIn('Cache-Control', serve_media(request, 'profiles/legacy.jpg'))
+
+    def test_backfill_command(self):
+        legacy = default_storage.save('profiles/legacy.jpg', BytesIO(jpeg(3000, 2000)))
+        User.objects.filter(pk=self.user.pk).update(profile_picture=legacy)
+        User.objects.filter(pk=self.admin.pk).update(profile_picture=default_storage.save('profiles/broken.jpg', BytesIO(b'not a photo')))
+
+        out, err = StringIO(), StringIO()
+        call_command('generate_thumbnails', '--workers', '2', stdout=out, stderr=err)
+        self.assertIn('Generated thumbnails for 1 pictures (1 users, 1 skipped)', out.getvalue())
+        self.assertIn('Skipped profiles/broken.jpg', err.getvalue())
+        self.user.refresh_from_db()
+        self.assertRegex(self.user.profile_picture.name, r'^profiles/[0-9a-f]{20}\.jpg$')
+        self.assertEqual(sorted(self.user.profile_thumbnails), ['large', 'small'])
@@ -0,0 +1,106 @@
+"""
+Profile picture thumbnails.
+
+An uploaded picture is stored under a name derived from its content hash,
+next to square WebP thumbnails in the ``SIZES`` the frontend draws (twice the
+CSS size, for high-density screens), which are named after their own content
+hash. ``User.profile_thumbnails`` maps each size to its file. Because a file
+name changes whenever its bytes do, the files never change in place and can
+be served with a year-long ``immutable`` ``Cache-Control``; ``is_immutable``
+tells which media paths qualify.
+
+Thumbnails are rendered once, at upload time, so list endpoints hand out a
+few-KB image where they used to hand out the phone photo.
+``manage.py generate_thumbnails`` backfills pictures uploaded before this.
+"""
+import hashlib
+import io
+import os
+import re
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+SIZES = {'small': 160, 'large': 320}
+PICTURE_DIR = 'profiles'
+THUMBNAIL_DIR = 'profiles/thumbs'
+WEBP_QUALITY = 80
+
+HASH_LENGTH = 20
+HASHED_NAME = re.compile(rf'^{PICTURE_DIR}/(thumbs/)?[0-9a-f]{{{HASH_LENGTH}}}\.\w+$')
+
+
+def hashed_name(directory, content, extension):
+    return f'{directory}/{hashlib.sha256(content).hexdigest()[:HASH_LENGTH]}{extension}'
+
+
+def is_immutable(path):
+    """Whether a media path is a content-hashed picture that can be cached forever"""
+    return bool(HASHED_NAME.match(path))
+
+
+def save_once(name, content):
+    """Store ``content`` as ``name`` unless it already is; returns the name the storage actually used"""
+    # Same name, same bytes: an upload already stored is not written twice
+    if default_storage.exists(name):
+        return name
+    # The storage may still pick another name (a collision suffix, normalization)
+    return default_storage.save(name, ContentFile(content))
+
+
+def render_thumbnails(content):
+    """``{size: WebP bytes}`` of square, center-cropped thumbnails of an image"""
+    thumbnails = {}
+    with Image.open(io.BytesIO(content)) as image:
+        # JPEGs decode straight at a fraction of their size; the largest thumbnail is all that's needed
+        largest = max(SIZES.values())
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+        for size, pixels in SIZES.items():
+            buffer = io.BytesIO()
+            ImageOps.fit(image, (pixels, pixels), Image.Resampling.LANCZOS).save(buffer, 'WEBP', quality=WEBP_QUALITY)
+            thumbnails[size] = buffer.getvalue()
+    return thumbnails
+
+
+def store_picture(content, filename):
+    """Store a picture and its thumbnails; returns ``(picture_name, {size: thumbnail_name})``"""
+    # Rendered first, so a file Pillow can't read leaves nothing behind
+    rendered = render_thumbnails(content)
+    extension = os.path.splitext(filename)[1].lower() or '.jpg'
+    picture = save_once(hashed_name(PICTURE_DIR, content, extension), content)
+    thumbnails = {size: save_once(hashed_name(THUMBNAIL_DIR, data, '.webp'), data) for size, data in rendered.items()}
+    return picture, thumbnails
+
+
+def thumbnail_file(name):
+    """
+    Backfill worker: ``(name, picture_name, thumbnails)`` for a stored picture,
+    or ``(name, None, error)`` if it is missing or not an image.
+    """
+    try:
+        with default_storage.open(name) as picture:
+            content = picture.read()
+        return (name, *store_picture(content, name))
+    # Pillow raises several unrelated types for broken files; one bad file must not stop the batch
+    except Exception as e:
+        return name, None, str(e)
+
+
+def set_profile_picture(user, upload):
+    """Point ``user`` (unsaved) at the stored ``upload`` and its thumbnails"""
+    upload.seek(0)
+    user.profile_picture, user.profile_thumbnails = store_picture(upload.read(), upload.name)
+
+
+def picture_url(request, user, size='small'):
+    """
+    Absolute URL of the user's picture in ``size`` (``'original'`` for the
+    upload itself), falling back to the original while no thumbnail exists.
+    """
+    if not user.profile_picture:
+        return None
+    name = user.profile_thumbnails.get(size)
+    url = default_storage.url(name) if name else user.profile_picture.url
+    return request.build_absolute_uri(url) if request is not None else url
@@ -1,14 +1,15 @@
 from django.urls import path
-from rest_framework_simplejwt.views import TokenRefreshView
 from . import views
 
 urlpatterns = [
     path('login/', views.CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('token/refresh/', views.ClaimsTokenRefreshView.as_view(), name='token_refresh'),
     path('create-user/', views.UserCreateView.as_view(), name='create_user'),
     path('profile/', views.ProfileView.as_view(), name='profile'),
     path('profile/update/', views.ProfileUpdateView.as_view(), name='profile_update'),
     path('users/', views.user_list, name='user_list'),
+    path('users/search/', views.search_user_list, name='search_user_list'),
+    path('users/import/', views.import_users, name='import_users'),
     path('users/<int:user_id>/', views.UserUpdateDeleteView.as_view(), name='user_update_delete'),  # Add this line
     path('change-password/', views.change_password, name='change_password'),
 ]
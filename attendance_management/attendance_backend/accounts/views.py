@@ -1,19 +1,23 @@
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from django.contrib.auth import get_user_model
-from .serializers import UserSerializer, UserCreateSerializer, ProfileUpdateSerializer
+from django.db import IntegrityError
+from attendance.pagination import paginate, parse_fields, parse_limit, serialize
+from .authentication import forget_user, revoke_tokens
+from .imports import import_employees, read_rows
+from .search import search_users
+from .serializers import ClaimsTokenObtainPairSerializer, ClaimsTokenRefreshSerializer, UserSerializer, UserCreateSerializer, ProfileUpdateSerializer
 
 User = get_user_model()
 
 class CustomTokenObtainPairView(TokenObtainPairView):
-    def post(self, request, *args, **kwargs):
-        response = super().post(request, *args, **kwargs)
-        if response.status_code == 200:
-            user = User.objects.get(username=request.data['username'])
-            response.data['user'] = UserSerializer(user).data
-        return response
+    # Adds the user to the response without fetching them a second time
+    serializer_class = ClaimsTokenObtainPairSerializer
+
+class ClaimsTokenRefreshView(TokenRefreshView):
+    serializer_class = ClaimsTokenRefreshSerializer
 
 class UserCreateView(generics.CreateAPIView):
     queryset = User.objects.all()
@@ -28,19 +32,33 @@ class UserCreateView(generics.CreateAPIView):
         employee = serializer.save(organization=self.request.user.organization)
         print(f"[DEBUG] Created employee: username={employee.username}, org={employee.organization}, id={employee.id}")
 
+def fresh_user(request):
+    """The request user re-read from the database, for writes; request.user may come from the cache"""
+    return User.objects.select_related('organization').get(pk=request.user.pk)
+
 class ProfileView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_object(self):
-        return self.request.user
+        if self.request.method in permissions.SAFE_METHODS:
+            return self.request.user
+        return fresh_user(self.request)
+    
+    def perform_update(self, serializer):
+        serializer.save()
+        forget_user(serializer.instance.pk)
 
 class ProfileUpdateView(generics.UpdateAPIView):
     serializer_class = ProfileUpdateSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_object(self):
-        return self.request.user
+        return fresh_user(self.request)
+    
+    def perform_update(self, serializer):
+        serializer.save()
+        forget_user(serializer.instance.pk)
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
@@ -55,15 +73,70 @@ def user_list(request):
         role='employee', 
         organization=request.user.organization,
         is_active=True
-    )
-    print(f"[DEBUG] user_list for org={request.user.organization}: {[u.username for u in users]}")
-    serializer = UserSerializer(users, many=True)
-    return Response(serializer.data)
+    ).select_related('organization')
+    try:
+        return Response(paginate(request, users, UserSerializer, ('username',), {
+            'organization_name': ['organization__name'], 'profile_picture': ['profile_picture', 'profile_thumbnails']
+        }))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def search_user_list(request):
+    """Active employees of the organization matching ``?q=``, best match first"""
+    if request.user.role != 'admin':
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    if not request.user.organization:
+        return Response({'error': 'No organization assigned'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        fields = parse_fields(request.query_params, UserSerializer)
+        user_ids, next_cursor = search_users(
+            request.user.organization_id, request.query_params.get('q', ''),
+            request.query_params.get('cursor'), parse_limit(request.query_params, 20)
+        )
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    users = User.objects.select_related('organization').in_bulk(user_ids)
+    return Response({
+        'results': serialize(UserSerializer, [users[user_id] for user_id in user_ids if user_id in users], fields),
+        'next_cursor': next_cursor
+    })
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def import_users(request):
+    """Create employees in bulk from an uploaded CSV or XLSX sheet; returns a per-row error report"""
+    if request.user.role != 'admin':
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    if not request.user.organization:
+        return Response({'error': 'No organization assigned'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'error': 'Upload the sheet as "file"'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        records = read_rows(upload, upload.name)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    dry_run = request.query_params.get('dry_run') in ('1', 'true')
+    try:
+        report = import_employees(records, request.user.organization, dry_run=dry_run)
+    except IntegrityError:
+        # Someone took a username or employee id between validation and insert
+        return Response({'error': 'The import clashed with users created meanwhile; run it again'}, status=status.HTTP_409_CONFLICT)
+    return Response({'dry_run': dry_run, **report})
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def change_password(request):
-    user = request.user
+    user = fresh_user(request)
     old_password = request.data.get('old_password')
     new_password = request.data.get('new_password')
     
@@ -72,7 +145,14 @@ def change_password(request):
     
     user.set_password(new_password)
     user.save()
-    return Response({'message': 'Password changed successfully'})
+    # Log out every session, then hand this one a fresh pair of tokens
+    revoke_tokens(user)
+    refresh = ClaimsTokenObtainPairSerializer.get_token(user)
+    return Response({
+        'message': 'Password changed successfully',
+        'access': str(refresh.access_token),
+        'refresh': str(refresh)
+    })
 
 
 class UserUpdateDeleteView(generics.RetrieveUpdateDestroyAPIView):
@@ -88,6 +168,20 @@ class UserUpdateDeleteView(generics.RetrieveUpdateDestroyAPIView):
         user_id = self.kwargs.get('user_id')
         return self.get_queryset().get(id=user_id)
     
+    def perform_update(self, serializer):
+        before = (serializer.instance.role, serializer.instance.organization_id, serializer.instance.is_active)
+        user = serializer.save()
+        # Tokens carry these as claims, so changing one revokes the user's tokens
+        if (user.role, user.organization_id, user.is_active) != before:
+            revoke_tokens(user)
+        else:
+            forget_user(user.pk)
+    
+    def perform_destroy(self, instance):
+        user_id = instance.pk
+        instance.delete()
+        forget_user(user_id)
+    
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         if instance == request.user:
@@ -0,0 +1,97 @@
+"""
+Per-user event broker behind the ``/api/attendance/events/`` stream.
+
+Writers publish after their transaction commits; each open stream holds one
+bounded ``asyncio.Queue``, so idle connections cost a few hundred bytes and no
+thread. The default broker is in-process; set ``ATTENDANCE_EVENT_BROKER`` to
+the dotted path of another ``EventBroker`` (e.g. Redis pub/sub) when running
+several ASGI workers.
+"""
+import asyncio
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class EventBroker(ABC):
+    @abstractmethod
+    def publish(self, user_id, event, data):
+        ...
+
+    @abstractmethod
+    def subscribe(self, user_id):
+        """Return a subscription whose ``get()`` coroutine yields ``(event, data)`` pairs"""
+
+    @abstractmethod
+    def unsubscribe(self, user_id, subscription):
+        ...
+
+
+class InProcessBroker(EventBroker):
+    queue_size = 100
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def publish(self, user_id, event, data):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, (event, data))
+            except RuntimeError:
+                # The subscriber's loop has shut down; it unsubscribes itself
+                pass
+
+    @staticmethod
+    def _deliver(queue, item):
+        try:
+            queue.put_nowait(item)
+        except asyncio.QueueFull:
+            logger.warning('Dropping %s event for a slow event stream', item[0])
+
+    def subscribe(self, user_id):
+        subscription = (asyncio.get_running_loop(), asyncio.Queue(self.queue_size))
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription[1]
+
+    def unsubscribe(self, user_id, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id, set())
+            subscribers.discard(next((s for s in subscribers if s[1] is subscription), None))
+            if not subscribers:
+                self._subscribers.pop(user_id, None)
+
+    def subscriber_count(self, user_id):
+        with self._lock:
+            return len(self._subscribers.get(user_id, ()))
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(getattr(settings, 'ATTENDANCE_EVENT_BROKER', 'attendance.events.InProcessBroker'))()
+    return _broker
+
+
+def publish(user_id, event, data):
+    try:
+        get_broker().publish(user_id, event, data)
+    except Exception:
+        logger.exception('Failed to publish %s event for user %s', event, user_id)
+
+
+def publish_on_commit(user_id, event, data):
+    """Publish once the surrounding transaction commits, so listeners never see rolled-back state"""
+    transaction.on_commit(lambda: publish(user_id, event, data))
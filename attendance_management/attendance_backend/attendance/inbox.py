@@ -0,0 +1,52 @@
+"""
+Read state of a user's notifications.
+
+Each user's unread count lives in a ``NotificationCounter`` row that moves
+with ``F()`` updates in the same transaction as the notifications it counts:
+delivery increments it, marking read decrements it only when the conditional
+UPDATE actually flipped a row, and mark-all-read zeroes it. The bell icon
+therefore reads one primary-key row instead of counting a growing history,
+and mark-all-read is a single UPDATE on the partial index of unread rows.
+"""
+from collections import Counter, defaultdict
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from .models import Notification, NotificationCounter
+
+CHUNK_SIZE = 500
+
+
+def add_unread(user_ids):
+    """Count one new unread notification per occurrence of a user id"""
+    per_user = Counter(user_ids)
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=user_id) for user_id in per_user], batch_size=CHUNK_SIZE, ignore_conflicts=True
+    )
+    # One UPDATE per distinct increment rather than per user
+    by_increment = defaultdict(list)
+    for user_id, count in per_user.items():
+        by_increment[count].append(user_id)
+    for count, users in by_increment.items():
+        NotificationCounter.objects.filter(user_id__in=users).update(unread=F('unread') + count)
+
+
+def unread_count(user_id):
+    return NotificationCounter.objects.filter(user_id=user_id).values_list('unread', flat=True).first() or 0
+
+
+def mark_read(user, notification_id):
+    """Mark one notification read; returns ``False`` if the user has no such notification"""
+    with transaction.atomic():
+        if Notification.objects.filter(id=notification_id, user=user, is_read=False).update(is_read=True):
+            NotificationCounter.objects.filter(user=user).update(unread=Greatest(F('unread') - 1, Value(0)))
+            return True
+    return Notification.objects.filter(id=notification_id, user=user).exists()
+
+
+def mark_all_read(user):
+    """Mark every unread notification read with one UPDATE; returns how many were"""
+    with transaction.atomic():
+        marked = Notification.objects.filter(user=user, is_read=False).update(is_read=True)
+        NotificationCounter.objects.filter(user=user).update(unread=0)
+    return marked
@@ -0,0 +1,139 @@
+"""
+Batch ingestion of clock events replayed by badge terminals and offline kiosks.
+
+Events for many employees are validated, paired into ``AttendanceRecord``
+sessions in memory and written with ``bulk_create``/``bulk_update`` in a single
+transaction. Reads are a fixed handful of set-based queries per chunk of
+employees, however many events the batch holds.
+"""
+from collections import defaultdict
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import AttendanceRecord
+from .presence import invalidate_presence_many
+from .rollup import refresh_daily_summaries
+
+User = get_user_model()
+
+EVENT_TYPES = ('in', 'out')
+CHUNK_SIZE = 500
+
+
+def chunked(items, size=CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def hours_between(start, end, break_seconds=0):
+    return (Decimal((end - start).total_seconds() - break_seconds) / 3600).quantize(Decimal('0.01'))
+
+
+def parse_event(raw):
+    """Return ``(employee_id, type, timestamp)`` or raise ``ValueError`` with the reason"""
+    if not isinstance(raw, dict):
+        raise ValueError('Event must be an object')
+    employee_id = raw.get('employee_id')
+    if not employee_id:
+        raise ValueError('employee_id is required')
+    event_type = raw.get('type')
+    if event_type not in EVENT_TYPES:
+        raise ValueError("type must be 'in' or 'out'")
+    timestamp = parse_datetime(str(raw.get('timestamp') or ''))
+    if timestamp is None:
+        raise ValueError('timestamp must be an ISO 8601 datetime')
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+    # Sessions are dated in UTC, like timezone.now().date() in the punch engine
+    return str(employee_id), event_type, timestamp.astimezone(dt_timezone.utc)
+
+
+def ingest_events(organization, raw_events):
+    """
+    Pair and store a batch of clock events for ``organization``.
+
+    Returns one result per event, in input order, with a ``status`` of
+    ``created``, ``closed``, ``duplicate``, ``rejected`` or ``invalid``.
+    """
+    results = [None] * len(raw_events)
+    parsed = []
+    for index, raw in enumerate(raw_events):
+        try:
+            parsed.append((index, *parse_event(raw)))
+        except ValueError as e:
+            results[index] = {'index': index, 'status': 'invalid', 'error': str(e)}
+
+    # Resolve employee_id -> user id within the organization
+    user_ids = {}
+    for chunk in chunked({event[1] for event in parsed}):
+        user_ids.update(User.objects.filter(
+            organization=organization, is_active=True, employee_id__in=chunk
+        ).values_list('employee_id', 'id'))
+
+    events_by_user = defaultdict(list)
+    for index, employee_id, event_type, timestamp in parsed:
+        if employee_id not in user_ids:
+            results[index] = {'index': index, 'status': 'rejected', 'error': 'Unknown employee_id'}
+        else:
+            events_by_user[user_ids[employee_id]].append((timestamp, event_type, index))
+
+    if not events_by_user:
+        return results
+
+    # Existing sessions on the affected days, to pair against and to spot replays
+    timestamps = [event[0] for events in events_by_user.values() for event in events]
+    first_day, last_day = min(timestamps).date(), max(timestamps).date()
+    sessions = defaultdict(list)
+    for chunk in chunked(events_by_user):
+        for record in AttendanceRecord.objects.filter(
+            user_id__in=chunk, date__gte=first_day, date__lte=last_day, clock_in__isnull=False
+        ).order_by('clock_in'):
+            sessions[(record.user_id, record.date)].append(record)
+
+    new_records = []
+    closed_records = {}
+    for user_id, events in events_by_user.items():
+        events.sort()
+        for timestamp, event_type, index in events:
+            day_sessions = sessions[(user_id, timestamp.date())]
+            open_session = next((s for s in reversed(day_sessions) if s.clock_out is None), None)
+
+            if event_type == 'in':
+                if any(s.clock_in == timestamp for s in day_sessions):
+                    results[index] = {'index': index, 'status': 'duplicate'}
+                elif open_session is not None:
+                    results[index] = {'index': index, 'status': 'rejected', 'error': 'Already clocked in'}
+                else:
+                    record = AttendanceRecord(
+                        user_id=user_id, date=timestamp.date(), clock_in=timestamp, is_present=True
+                    )
+                    day_sessions.append(record)
+                    new_records.append(record)
+                    results[index] = {'index': index, 'status': 'created'}
+            else:
+                if any(s.clock_out == timestamp for s in day_sessions):
+                    results[index] = {'index': index, 'status': 'duplicate'}
+                elif open_session is None or open_session.clock_in > timestamp:
+                    results[index] = {'index': index, 'status': 'rejected', 'error': 'No active clock-in session found'}
+                else:
+                    open_session.clock_out = timestamp
+                    if open_session.pk:
+                        closed_records[open_session.pk] = open_session
+                    results[index] = {'index': index, 'status': 'closed'}
+
+    for record in [*new_records, *closed_records.values()]:
+        if record.clock_out:
+            record.total_hours = hours_between(record.clock_in, record.clock_out, record.break_seconds)
+
+    with transaction.atomic():
+        AttendanceRecord.objects.bulk_create(new_records, batch_size=CHUNK_SIZE)
+        AttendanceRecord.objects.bulk_update(closed_records.values(), ['clock_out', 'total_hours'], batch_size=CHUNK_SIZE)
+        refresh_daily_summaries({(record.user_id, record.date) for record in [*new_records, *closed_records.values()]})
+        touched = list(events_by_user)
+        transaction.on_commit(lambda: invalidate_presence_many(touched))
+
+    return results
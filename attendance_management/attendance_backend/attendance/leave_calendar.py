@@ -0,0 +1,85 @@
+"""
+Leave calendar backed by the ``LeaveDay`` expansion table.
+
+Approving a leave writes one ``LeaveDay`` row per calendar day it covers and
+rejecting an approved leave deletes them, so "who is off between X and Y" is
+a single range read on the ``(organization, date)`` index rather than an
+expansion of every leave request's date range.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from django.utils import timezone
+from .models import LeaveDay
+
+CHUNK_SIZE = 500
+MAX_CALENDAR_DAYS = 366
+
+CALENDAR_FIELDS = (
+    'date', 'leave_type', 'leave_request_id',
+    'user_id', 'user__username', 'user__first_name', 'user__last_name', 'user__employee_id',
+)
+
+
+def expand_leave(leave, organization_id):
+    """Unsaved ``LeaveDay`` rows for every day of ``leave``"""
+    return [
+        LeaveDay(
+            leave_request=leave, user_id=leave.user_id, organization_id=organization_id,
+            date=leave.start_date + timedelta(days=offset), leave_type=leave.leave_type
+        )
+        for offset in range((leave.end_date - leave.start_date).days + 1)
+    ]
+
+
+def add_leave_days(leaves, organization_id):
+    """Put approved ``leaves`` on the calendar"""
+    days = [day for leave in leaves for day in expand_leave(leave, organization_id)]
+    LeaveDay.objects.bulk_create(days, batch_size=CHUNK_SIZE, ignore_conflicts=True)
+
+
+def remove_leave_days(leave_ids):
+    """Take leaves off the calendar"""
+    LeaveDay.objects.filter(leave_request_id__in=list(leave_ids)).delete()
+
+
+def parse_calendar_range(params):
+    """Read ``from``/``to`` from query params, defaulting to the current week (Monday to Sunday)"""
+    today = timezone.now().date()
+    try:
+        date_from = date.fromisoformat(params['from']) if params.get('from') else today - timedelta(days=today.weekday())
+        date_to = date.fromisoformat(params['to']) if params.get('to') else date_from + timedelta(days=6)
+    except ValueError:
+        raise ValueError('from and to must be dates in YYYY-MM-DD format')
+    if date_from > date_to:
+        raise ValueError('from must not be after to')
+    if (date_to - date_from).days >= MAX_CALENDAR_DAYS:
+        raise ValueError(f'The range can span at most {MAX_CALENDAR_DAYS} days')
+    return date_from, date_to
+
+
+def calendar_queryset(organization, date_from, date_to, employee=None):
+    """Flat rows of an organization's days off in a range, by date"""
+    days = LeaveDay.objects.filter(
+        organization=organization, date__gte=date_from, date__lte=date_to, user__is_active=True
+    )
+    if employee:
+        days = days.filter(user_id=employee)
+    return days.order_by('date', 'user__username').values(*CALENDAR_FIELDS)
+
+
+def calendar_days(rows):
+    """Group calendar rows as ``{date: [who is off]}``"""
+    days = defaultdict(list)
+    for row in rows:
+        days[str(row['date'])].append({
+            'leave_id': row['leave_request_id'],
+            'leave_type': row['leave_type'],
+            'user': {
+                'id': row['user_id'],
+                'username': row['user__username'],
+                'first_name': row['user__first_name'],
+                'last_name': row['user__last_name'],
+                'employee_id': row['user__employee_id'],
+            },
+        })
+    return dict(days)
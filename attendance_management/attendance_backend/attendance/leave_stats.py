@@ -0,0 +1,85 @@
+"""
+Cached per-employee leave statistics for the admin leave profile.
+
+The counts and day totals come from one conditional-aggregation query over
+the employee's leave requests and are cached until a leave is created,
+approved or rejected, which invalidates the entry once the write commits.
+"""
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+from .models import LeaveRequest
+
+logger = logging.getLogger(__name__)
+
+LEAVE_STATS_TTL = getattr(settings, 'ATTENDANCE_LEAVE_STATS_TTL', 60 * 60)
+
+
+def leave_stats_key(user_id):
+    return f'attendance:leave-stats:{user_id}'
+
+
+def compute_leave_stats(user_id):
+    """A user's leave statistics in a single aggregate query"""
+    approved = Q(status='approved')
+    span = ExpressionWrapper(F('end_date') - F('start_date'), output_field=DurationField())
+    aggregates = {
+        'total_requests': Count('id'),
+        'approved_requests': Count('id', filter=approved),
+        'pending_requests': Count('id', filter=Q(status='pending')),
+        'approved_span': Sum(span, filter=approved),
+    }
+    for leave_type, _ in LeaveRequest.LEAVE_TYPES:
+        of_type = approved & Q(leave_type=leave_type)
+        aggregates[f'{leave_type}_count'] = Count('id', filter=of_type)
+        aggregates[f'{leave_type}_span'] = Sum(span, filter=of_type)
+    row = LeaveRequest.objects.filter(user_id=user_id).aggregate(**aggregates)
+
+    # Leave days are inclusive: end - start + 1 for each leave
+    def days(span, count):
+        return (span or timedelta()).days + count
+
+    return {
+        'total_days_taken': days(row['approved_span'], row['approved_requests']),
+        'leave_by_type': {
+            leave_type: days(row[f'{leave_type}_span'], row[f'{leave_type}_count'])
+            for leave_type, _ in LeaveRequest.LEAVE_TYPES if row[f'{leave_type}_count']
+        },
+        'total_requests': row['total_requests'],
+        'approved_requests': row['approved_requests'],
+        'pending_requests': row['pending_requests'],
+    }
+
+
+def get_leave_stats(user_id):
+    """Return the user's leave statistics, computing and caching them on a miss"""
+    try:
+        stats = cache.get(leave_stats_key(user_id))
+    except Exception:
+        logger.exception('Leave stats cache read failed for user %s', user_id)
+        stats = None
+    if stats is not None:
+        return stats
+
+    stats = compute_leave_stats(user_id)
+    try:
+        cache.set(leave_stats_key(user_id), stats, LEAVE_STATS_TTL)
+    except Exception:
+        logger.exception('Leave stats cache write failed for user %s', user_id)
+    return stats
+
+
+def invalidate_leave_stats(user_ids):
+    try:
+        cache.delete_many([leave_stats_key(user_id) for user_id in user_ids])
+    except Exception:
+        logger.exception('Leave stats cache delete failed for %s users', len(user_ids))
+
+
+def invalidate_leave_stats_on_commit(user_ids):
+    """Drop the users' cached statistics once the surrounding transaction commits"""
+    user_ids = set(user_ids)
+    transaction.on_commit(lambda: invalidate_leave_stats(user_ids))
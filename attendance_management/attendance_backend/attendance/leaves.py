@@ -0,0 +1,282 @@
+"""
+Monthly leave balances, the leave ledger, and the batched loader behind the
+admin leave screens.
+
+Balances are provisioned ahead of each month by the
+``provision_leave_balances`` command with one ``INSERT ... SELECT``, so the
+read paths are plain SELECTs: a balance that isn't there yet reads as the
+monthly default and is never created on a GET.
+
+Approving or rejecting a leave appends ``LeaveLedgerEntry`` rows, one per
+month the leave spans, applies them to the materialized balances with ``F()``
+increments, and adds or removes the leave's calendar days. The status change
+is a conditional UPDATE, so a leave is charged or refunded at most once
+however many admins click at the same time, and ``rebuild_balances`` can
+recompute any balance from the ledger.
+
+The employee list comes back in a fixed number of queries whatever the
+organization's size: clock-in state is an ``Exists`` annotation on the employee
+query, and the current month's balances and each employee's five most recent
+leave requests are single prefetch queries, the latter cut per employee with a
+``ROW_NUMBER()`` window.
+"""
+from calendar import monthrange
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Exists, F, FloatField, OuterRef, Prefetch, Subquery, Sum, Value, Window
+from django.db.models.constants import OnConflict
+from django.db.models.functions import Coalesce, RowNumber
+from .models import AttendanceRecord, LeaveLedgerEntry, LeaveRequest, MonthlyLeaveBalance, NotificationOutbox
+from .leave_calendar import add_leave_days, remove_leave_days
+from .leave_stats import invalidate_leave_stats_on_commit
+from .outbox import enqueue
+
+User = get_user_model()
+
+RECENT_LEAVES = 5
+BALANCE_DEFAULTS = {'total_allowed': 4, 'used_leaves': 0, 'remaining_leaves': 4}
+CHUNK_SIZE = 500
+MAX_BULK_DECISIONS = 1000
+DECISIONS = {'approve': 'approved', 'reject': 'rejected'}
+
+
+def parse_month(value):
+    """``YYYY-MM`` as the first day of that month"""
+    try:
+        year, month = (int(part) for part in value.split('-'))
+        return date(year, month, 1)
+    except ValueError:
+        raise ValueError('Month must be in YYYY-MM format')
+
+
+def default_balance(user, year, month):
+    """An unsaved balance with the monthly defaults, for months not provisioned yet"""
+    return MonthlyLeaveBalance(user=user, year=year, month=month, **BALANCE_DEFAULTS)
+
+
+def month_balance(user, year, month):
+    """The user's balance for ``year``/``month``; a single SELECT that never writes"""
+    balance = MonthlyLeaveBalance.objects.filter(user=user, year=year, month=month).first()
+    return balance or default_balance(user, year, month)
+
+
+def provision_balances(year, month, users=None):
+    """
+    Create the missing ``year``/``month`` balances for ``users`` (default: every
+    active user of every organization) with a single ``INSERT ... SELECT``.
+
+    Existing balances are left alone, so this is safe to re-run. Returns the
+    number of balances created.
+    """
+    if users is None:
+        users = User.objects.filter(is_active=True, organization__isnull=False)
+    select_sql, select_params = users.order_by().values(provisioned_user=F('pk')).query.sql_with_params()
+
+    table = MonthlyLeaveBalance._meta.db_table
+    fields = [MonthlyLeaveBalance._meta.get_field(name) for name in ('user', 'year', 'month', *BALANCE_DEFAULTS)]
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    sql = (
+        f'{connection.ops.insert_statement(on_conflict=OnConflict.IGNORE)} {connection.ops.quote_name(table)} ({columns}) '
+        f'SELECT provisioned.provisioned_user, %s, %s, %s, %s, %s FROM ({select_sql}) provisioned '
+        f'{connection.ops.on_conflict_suffix_sql(fields, OnConflict.IGNORE, None, None)}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, (*select_params, year, month, *BALANCE_DEFAULTS.values()))
+        return cursor.rowcount
+
+
+def leave_days_by_month(leave):
+    """``[(year, month, days)]`` a leave uses, split at month boundaries"""
+    if leave.leave_type == 'half_day':
+        return [(leave.start_date.year, leave.start_date.month, Decimal('0.5'))]
+    months = []
+    day = leave.start_date
+    while day <= leave.end_date:
+        end = min(date(day.year, day.month, monthrange(day.year, day.month)[1]), leave.end_date)
+        months.append((day.year, day.month, Decimal((end - day).days + 1)))
+        day = end + timedelta(days=1)
+    return months
+
+
+def ledger_entries(leave, sign):
+    """Unsaved entries charging (``sign=1``) or refunding (``sign=-1``) a leave"""
+    return [
+        LeaveLedgerEntry(leave_request=leave, user_id=leave.user_id, year=year, month=month, days=sign * days)
+        for year, month, days in leave_days_by_month(leave)
+    ]
+
+
+def post_entries(entries):
+    """Append ledger entries and apply them with one ``F()`` increment per user-month"""
+    totals = defaultdict(Decimal)
+    for entry in entries:
+        totals[(entry.user_id, entry.year, entry.month)] += entry.days
+    LeaveLedgerEntry.objects.bulk_create(entries, batch_size=CHUNK_SIZE)
+    MonthlyLeaveBalance.objects.bulk_create(
+        [MonthlyLeaveBalance(user_id=user_id, year=year, month=month, **BALANCE_DEFAULTS) for user_id, year, month in totals],
+        batch_size=CHUNK_SIZE,
+        ignore_conflicts=True
+    )
+    for (user_id, year, month), days in totals.items():
+        days = float(days)
+        MonthlyLeaveBalance.objects.filter(user_id=user_id, year=year, month=month).update(
+            used_leaves=F('used_leaves') + days,
+            remaining_leaves=F('total_allowed') - F('used_leaves') - days
+        )
+
+
+def post_to_ledger(leave, sign):
+    """Charge (``sign=1``) or refund (``sign=-1``) a leave: append ledger entries and bump the balances"""
+    post_entries(ledger_entries(leave, sign))
+
+
+def decision_notification(leave):
+    """Unsaved outbox message telling the employee their leave was approved or rejected"""
+    return NotificationOutbox(
+        user_id=leave.user_id,
+        title=f'Leave Request {leave.status.title()}',
+        message=f'Your {leave.leave_type} leave request from {leave.start_date} to {leave.end_date} has been {leave.status}.',
+        notification_type=f'leave_{leave.status}'
+    )
+
+
+def approve_leave_request(leave, admin):
+    """Approve ``leave``, charging it to the ledger unless it already was approved, and queue the employee's notification"""
+    with transaction.atomic():
+        changed = LeaveRequest.objects.filter(pk=leave.pk).exclude(status='approved').update(
+            status='approved', approved_by=admin
+        )
+        if changed:
+            post_to_ledger(leave, 1)
+            add_leave_days([leave], leave.user.organization_id)
+            invalidate_leave_stats_on_commit([leave.user_id])
+        leave.status, leave.approved_by = 'approved', admin
+        enqueue([decision_notification(leave)])
+    return bool(changed)
+
+
+def reject_leave_request(leave, admin):
+    """Reject ``leave``, refunding it through the ledger if it had been approved, and queue the employee's notification"""
+    with transaction.atomic():
+        refunded = LeaveRequest.objects.filter(pk=leave.pk, status='approved').update(
+            status='rejected', approved_by=admin
+        )
+        if refunded:
+            post_to_ledger(leave, -1)
+            remove_leave_days([leave.pk])
+        else:
+            LeaveRequest.objects.filter(pk=leave.pk).update(status='rejected', approved_by=admin)
+        invalidate_leave_stats_on_commit([leave.user_id])
+        leave.status, leave.approved_by = 'rejected', admin
+        enqueue([decision_notification(leave)])
+    return bool(refunded)
+
+
+def decide_leave_requests(organization, admin, leave_ids, action):
+    """
+    Approve or reject many of ``organization``'s leave requests in one transaction.
+
+    Statuses are written with a single UPDATE, the ledger charges or refunds
+    with one balance increment per user-month, and the notifications are
+    queued in the outbox with one ``bulk_create``. Returns one ``{'id', 'status'}`` result per id, in input
+    order: the new status, ``unchanged`` if the leave already had it, or
+    ``not_found``.
+    """
+    new_status = DECISIONS[action]
+    with transaction.atomic():
+        leaves = LeaveRequest.objects.select_for_update(of=('self',)).filter(
+            pk__in=leave_ids, user__organization=organization
+        ).in_bulk()
+        results, changed, entries, refunded = [], [], [], []
+        for leave_id in leave_ids:
+            leave = leaves.get(leave_id)
+            if leave is None:
+                results.append({'id': leave_id, 'status': 'not_found'})
+                continue
+            if leave.status == new_status:
+                results.append({'id': leave_id, 'status': 'unchanged'})
+                continue
+            if new_status == 'approved':
+                entries.extend(ledger_entries(leave, 1))
+            elif leave.status == 'approved':
+                entries.extend(ledger_entries(leave, -1))
+                refunded.append(leave.pk)
+            leave.status, leave.approved_by = new_status, admin
+            changed.append(leave)
+            results.append({'id': leave_id, 'status': new_status})
+
+        # Every changed row gets the same values, so one UPDATE ... WHERE id IN does what bulk_update would
+        LeaveRequest.objects.filter(pk__in=[leave.pk for leave in changed]).update(status=new_status, approved_by=admin)
+        post_entries(entries)
+        if new_status == 'approved':
+            add_leave_days(changed, organization.pk)
+        remove_leave_days(refunded)
+        enqueue([decision_notification(leave) for leave in changed])
+        invalidate_leave_stats_on_commit(leave.user_id for leave in changed)
+    return results
+
+
+def rebuild_balances(balances=None, entries=None):
+    """
+    Recompute ``used_leaves``/``remaining_leaves`` from the ledger.
+
+    ``entries`` limits which ledger rows create missing balances and
+    ``balances`` which balances are recomputed (default: all of them). The
+    recompute is a single UPDATE with a correlated ``SUM`` over the
+    ``(user, year, month)`` ledger index. Returns the number of balances updated.
+    """
+    entries = LeaveLedgerEntry.objects.all() if entries is None else entries
+    balances = MonthlyLeaveBalance.objects.all() if balances is None else balances
+    months = entries.order_by().values_list('user', 'year', 'month').distinct()
+    with transaction.atomic():
+        MonthlyLeaveBalance.objects.bulk_create(
+            [MonthlyLeaveBalance(user_id=user_id, year=year, month=month, **BALANCE_DEFAULTS) for user_id, year, month in months],
+            batch_size=CHUNK_SIZE,
+            ignore_conflicts=True
+        )
+        used = Coalesce(Subquery(
+            LeaveLedgerEntry.objects.filter(
+                user=OuterRef('user'), year=OuterRef('year'), month=OuterRef('month')
+            ).order_by().values('user').annotate(total=Sum('days')).values('total'),
+            output_field=FloatField()
+        ), Value(0.0))
+        return balances.update(used_leaves=used, remaining_leaves=F('total_allowed') - used)
+
+
+def recent_leaves_queryset(limit=RECENT_LEAVES):
+    """Each user's ``limit`` most recent leave requests"""
+    return LeaveRequest.objects.annotate(
+        recent_rank=Window(RowNumber(), partition_by=F('user'), order_by=F('applied_on').desc())
+    ).filter(recent_rank__lte=limit).order_by('user', '-applied_on')
+
+
+def employees_with_leave_info(organization, today):
+    """
+    Active employees of ``organization`` with ``is_clocked_in``, ``current_balance``
+    (for ``today``'s month) and ``recent_leaves`` loaded.
+    """
+    clocked_in = AttendanceRecord.objects.filter(
+        user=OuterRef('pk'), date=today, clock_in__isnull=False, clock_out__isnull=True
+    )
+    employees = list(User.objects.filter(
+        organization=organization,
+        role='employee',
+        is_active=True
+    ).annotate(is_clocked_in=Exists(clocked_in)).prefetch_related(
+        Prefetch(
+            'monthlyleavebalance_set',
+            queryset=MonthlyLeaveBalance.objects.filter(year=today.year, month=today.month),
+            to_attr='month_balances'
+        ),
+        Prefetch('leaverequest_set', queryset=recent_leaves_queryset(), to_attr='recent_leaves'),
+    ))
+
+    for employee in employees:
+        employee.current_balance = (
+            employee.month_balances[0] if employee.month_balances
+            else default_balance(employee, today.year, today.month)
+        )
+    return employees
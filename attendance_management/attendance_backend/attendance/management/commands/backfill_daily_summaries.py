@@ -0,0 +1,41 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from attendance.models import AttendanceRecord
+from attendance.rollup import CHUNK_SIZE, aggregate_days, summary_from_row, upsert_summaries
+
+class Command(BaseCommand):
+    help = 'Build or rebuild DailyAttendanceSummary rows from existing attendance sessions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', type=date.fromisoformat, help='First day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', type=date.fromisoformat, help='Last day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--organization', type=int, help='Only rebuild this organization id')
+
+    def handle(self, *args, **options):
+        records = AttendanceRecord.objects.all()
+        if options['date_from']:
+            records = records.filter(date__gte=options['date_from'])
+        if options['date_to']:
+            records = records.filter(date__lte=options['date_to'])
+        if options['date_from'] and options['date_to'] and options['date_from'] > options['date_to']:
+            raise CommandError('--from must not be after --to')
+        if options['organization']:
+            records = records.filter(user__organization_id=options['organization'])
+
+        # Stream the grouped rows and upsert them in fixed-size batches
+        total = 0
+        batch = []
+        for row in aggregate_days(records).iterator(chunk_size=CHUNK_SIZE):
+            batch.append(summary_from_row(row))
+            if len(batch) == CHUNK_SIZE:
+                with transaction.atomic():
+                    upsert_summaries(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            with transaction.atomic():
+                upsert_summaries(batch)
+            total += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Built {total} daily attendance summaries'))
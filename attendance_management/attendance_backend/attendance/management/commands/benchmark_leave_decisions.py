@@ -0,0 +1,70 @@
+import time
+from datetime import date, timedelta
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+from attendance import views
+from attendance.leaves import MAX_BULK_DECISIONS
+from attendance.models import LeaveRequest
+from organizations.models import Organization
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Benchmark approving leave requests one PATCH at a time against the bulk endpoint (all data is rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--leaves', type=int, default=1000, help='Leave requests to approve on each path')
+        parser.add_argument('--employees', type=int, default=100, help='Employees the leave requests are spread over')
+
+    def seed(self, employees, count, offset):
+        start = date(2031, 1, 1)
+        return LeaveRequest.objects.bulk_create([
+            LeaveRequest(
+                user=employees[n % len(employees)], organization_id=employees[n % len(employees)].organization_id,
+                leave_type='full_day', reason='Benchmark',
+                start_date=start + timedelta(days=n % 300), end_date=start + timedelta(days=n % 300 + 1)
+            )
+            for n in range(offset, offset + count)
+        ])
+
+    def handle(self, *args, **options):
+        count = options['leaves']
+        factory = APIRequestFactory()
+
+        with transaction.atomic():
+            organization = Organization.objects.create(name='Benchmark', email='benchmark@example.invalid')
+            admin = User.objects.create(username='benchmark-admin', role='admin', organization=organization)
+            employees = User.objects.bulk_create([
+                User(username=f'benchmark-{n}', role='employee', organization=organization)
+                for n in range(options['employees'])
+            ])
+            single = self.seed(employees, count, 0)
+            bulk = self.seed(employees, count, count)
+
+            started = time.perf_counter()
+            for leave in single:
+                request = factory.patch(f'/api/attendance/leave/{leave.pk}/approve/')
+                force_authenticate(request, admin)
+                views.approve_leave(request, leave_id=leave.pk)
+            single_elapsed = time.perf_counter() - started
+
+            started = time.perf_counter()
+            ids = [leave.pk for leave in bulk]
+            for chunk in range(0, len(ids), MAX_BULK_DECISIONS):
+                request = factory.post(
+                    '/api/attendance/leave/bulk/',
+                    {'action': 'approve', 'ids': ids[chunk:chunk + MAX_BULK_DECISIONS]},
+                    format='json'
+                )
+                force_authenticate(request, admin)
+                views.bulk_leave_decision(request)
+            bulk_elapsed = time.perf_counter() - started
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'Leave requests per path: {count}')
+        self.stdout.write(f'Single PATCH: {single_elapsed:.2f}s ({count / single_elapsed:,.0f} leaves/sec)')
+        self.stdout.write(f'Bulk endpoint: {bulk_elapsed:.2f}s ({count / bulk_elapsed:,.0f} leaves/sec)')
+        self.stdout.write(self.style.SUCCESS(f'Bulk is {single_elapsed / bulk_elapsed:.1f}x faster'))
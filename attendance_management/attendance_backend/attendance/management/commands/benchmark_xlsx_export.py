@@ -0,0 +1,70 @@
+import resource
+import time
+from datetime import date, datetime, timedelta
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from openpyxl import LXML
+from attendance.exports import report_xlsx_rows, write_xlsx
+from attendance.models import DailyAttendanceSummary
+from attendance.reports import REPORT_HEADER, report_queryset
+from organizations.models import Organization
+
+User = get_user_model()
+
+SEED_BATCH_SIZE = 10000
+
+class Command(BaseCommand):
+    help = 'Benchmark the XLSX attendance export end to end: rows/sec and peak RSS over seeded daily summaries (all data is rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500000, help='Daily summary rows to seed and export')
+        parser.add_argument('--employees', type=int, default=1000, help='Employees the rows are spread over')
+
+    def seed(self, organization, employees, count):
+        """Bulk-create ``count`` summaries, one employee-day each, a batch at a time; returns the last day"""
+        start = date(2031, 1, 1)
+        batch = []
+        for n in range(count):
+            day = start + timedelta(days=n // len(employees))
+            first_in = timezone.make_aware(datetime.combine(day, datetime.min.time()) + timedelta(hours=9, minutes=n % 60))
+            batch.append(DailyAttendanceSummary(
+                user=employees[n % len(employees)], organization=organization, date=day,
+                first_in=first_in, last_out=first_in + timedelta(hours=8), worked_seconds=8 * 3600, sessions=1, present=True
+            ))
+            if len(batch) == SEED_BATCH_SIZE:
+                DailyAttendanceSummary.objects.bulk_create(batch)
+                batch = []
+        DailyAttendanceSummary.objects.bulk_create(batch)
+        return start, start + timedelta(days=(count - 1) // len(employees))
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+
+        with transaction.atomic():
+            organization = Organization.objects.create(name='Benchmark', email='benchmark@example.invalid')
+            employees = User.objects.bulk_create([
+                User(username=f'benchmark-{n}', role='employee', organization=organization, employee_id=f'BENCH{n:05d}')
+                for n in range(options['employees'])
+            ])
+            date_from, date_to = self.seed(organization, employees, rows)
+            rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+            # The same path as admin_attendance_report_xlsx: chunked queryset into a spooled workbook
+            started = time.perf_counter()
+            workbook = write_xlsx('Attendance', REPORT_HEADER, report_xlsx_rows(report_queryset(organization, date_from, date_to)))
+            elapsed = time.perf_counter() - started
+
+            size = workbook.seek(0, 2)
+            workbook.close()
+            # ru_maxrss is reported in kilobytes on Linux
+            peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'XML writer: {"lxml" if LXML else "et_xmlfile (install lxml for faster exports)"}')
+        self.stdout.write(f'Rows exported: {rows} ({date_from} to {date_to})')
+        self.stdout.write(f'Elapsed: {elapsed:.2f}s ({rows / elapsed:,.0f} rows/sec)')
+        self.stdout.write(f'Workbook size: {size / 1024 / 1024:.1f} MB')
+        self.stdout.write(f'Peak RSS: {peak_rss / 1024:.1f} MB (was {rss_before / 1024:.1f} MB before export)')
@@ -0,0 +1,27 @@
+import time
+from django.core.management.base import BaseCommand
+from attendance.outbox import BATCH_SIZE, MAX_ATTEMPTS, drain_outbox, requeue_dead
+
+class Command(BaseCommand):
+    help = 'Deliver queued notifications from the outbox in batches, retrying failures and dead-lettering the ones that keep failing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Messages delivered per transaction')
+        parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS, help='Attempts before a message is dead-lettered')
+        parser.add_argument('--follow', action='store_true', help='Keep polling the outbox instead of exiting once it is drained')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between polls with --follow')
+        parser.add_argument('--requeue-dead', action='store_true', help='Queue dead-lettered messages again before draining')
+
+    def handle(self, *args, **options):
+        if options['requeue_dead']:
+            self.stdout.write(f'Requeued {requeue_dead()} dead-lettered notifications')
+
+        while True:
+            claimed, delivered, dead = drain_outbox(options['batch_size'], options['max_attempts'])
+            if claimed or not options['follow']:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Delivered {delivered} of {claimed} notifications ({claimed - delivered - dead} to retry, {dead} dead-lettered)'
+                ))
+            if not options['follow']:
+                return
+            time.sleep(options['interval'])
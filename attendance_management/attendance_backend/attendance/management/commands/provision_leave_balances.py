@@ -0,0 +1,20 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from attendance.leaves import parse_month, provision_balances
+
+
+class Command(BaseCommand):
+    help = "Create every active user's MonthlyLeaveBalance for a month ahead of time (run before each month starts)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', type=parse_month, help='Month to provision (YYYY-MM); defaults to next month')
+
+    def handle(self, *args, **options):
+        month = options['month']
+        if month is None:
+            today = timezone.now().date()
+            month = (today.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+        created = provision_balances(month.year, month.month)
+        self.stdout.write(self.style.SUCCESS(f'Provisioned {created} leave balances for {month:%Y-%m}'))
@@ -0,0 +1,39 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from attendance.retention import BATCH_SIZE, expired_notifications, purge_batches
+
+class Command(BaseCommand):
+    help = 'Delete (or archive) read notifications older than the retention period, in short primary-key batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ATTENDANCE_NOTIFICATION_RETENTION_DAYS, help='Keep read notifications newer than this many days')
+        parser.add_argument('--archive', action='store_true', default=settings.ATTENDANCE_NOTIFICATION_ARCHIVE, help='Copy notifications to NotificationArchive before deleting them')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows removed per transaction')
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between batches to leave room for other writers')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the notifications that would be removed')
+
+    def handle(self, *args, **options):
+        if options['days'] < 0 or options['batch_size'] < 1:
+            raise CommandError('--days must be at least 0 and --batch-size at least 1')
+
+        expired = expired_notifications(options['days'])
+        if options['dry_run']:
+            self.stdout.write(f'{expired.count()} read notifications are older than {options["days"]} days')
+            return
+
+        verb = 'Archived' if options['archive'] else 'Deleted'
+        total = 0
+        started = time.perf_counter()
+        for removed in purge_batches(expired, options['batch_size'], options['archive']):
+            total += removed
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{verb} {total} so far')
+            if options['pause']:
+                time.sleep(options['pause'])
+        elapsed = time.perf_counter() - started
+
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {total} read notifications older than {options["days"]} days in {elapsed:.2f}s ({rate:,.0f} rows/sec)'
+        ))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from attendance.leaves import parse_month, rebuild_balances
+from attendance.models import LeaveLedgerEntry, MonthlyLeaveBalance
+
+class Command(BaseCommand):
+    help = 'Recompute MonthlyLeaveBalance used/remaining leaves from the leave ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only rebuild this user id')
+        parser.add_argument('--month', type=parse_month, help='Only rebuild this month (YYYY-MM)')
+
+    def handle(self, *args, **options):
+        balances = MonthlyLeaveBalance.objects.all()
+        entries = LeaveLedgerEntry.objects.all()
+        if options['user']:
+            balances = balances.filter(user_id=options['user'])
+            entries = entries.filter(user_id=options['user'])
+        if options['month']:
+            balances = balances.filter(year=options['month'].year, month=options['month'].month)
+            entries = entries.filter(year=options['month'].year, month=options['month'].month)
+
+        rebuilt = rebuild_balances(balances, entries)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rebuilt} leave balances from the ledger'))
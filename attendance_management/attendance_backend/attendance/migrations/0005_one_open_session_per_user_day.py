@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def close_duplicate_open_sessions(apps, schema_editor):
+    # Older clock-ins could race and leave several open sessions for the same
+    # user and day. Keep the latest one open and close the rest at their
+    # clock-in time so the constraint can be created.
+    AttendanceRecord = apps.get_model('attendance', 'AttendanceRecord')
+    open_sessions = AttendanceRecord.objects.filter(
+        clock_in__isnull=False, clock_out__isnull=True
+    ).order_by('user_id', 'date', '-clock_in')
+    seen = set()
+    for record in open_sessions.iterator():
+        key = (record.user_id, record.date)
+        if key in seen:
+            AttendanceRecord.objects.filter(pk=record.pk).update(clock_out=record.clock_in, total_hours=0)
+        else:
+            seen.add(key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0004_alter_attendancerecord_options_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(close_duplicate_open_sessions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='attendancerecord',
+            constraint=models.UniqueConstraint(condition=models.Q(('clock_in__isnull', False), ('clock_out__isnull', True)), fields=('user', 'date'), name='one_open_session_per_user_day'),
+        ),
+    ]
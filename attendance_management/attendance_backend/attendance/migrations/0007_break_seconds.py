@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:00
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_break_seconds(apps, schema_editor):
+    AttendanceRecord = apps.get_model('attendance', 'AttendanceRecord')
+    BreakRecord = apps.get_model('attendance', 'BreakRecord')
+    totals = BreakRecord.objects.values('attendance').annotate(hours=Sum('break_duration'))
+    for row in totals.iterator():
+        AttendanceRecord.objects.filter(pk=row['attendance']).update(break_seconds=round((row['hours'] or 0) * 3600))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0006_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancerecord',
+            name='break_seconds',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_break_seconds, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='breakrecord',
+            constraint=models.UniqueConstraint(condition=models.Q(('break_end__isnull', True)), fields=('attendance',), name='one_open_break_per_session'),
+        ),
+    ]
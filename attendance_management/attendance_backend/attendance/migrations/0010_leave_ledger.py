@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:13
+
+import django.db.models.deletion
+from calendar import monthrange
+from datetime import date, timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_ledger(apps, schema_editor):
+    """Charge every approved leave to the months it falls in; 0015 recomputes the balances from it"""
+    LeaveRequest = apps.get_model('attendance', 'LeaveRequest')
+    LeaveLedgerEntry = apps.get_model('attendance', 'LeaveLedgerEntry')
+    entries = []
+    for leave in LeaveRequest.objects.filter(status='approved').iterator():
+        if leave.leave_type == 'half_day':
+            entries.append(LeaveLedgerEntry(
+                leave_request=leave, user_id=leave.user_id, year=leave.start_date.year,
+                month=leave.start_date.month, days=Decimal('0.5')
+            ))
+            continue
+        day = leave.start_date
+        while day <= leave.end_date:
+            end = min(date(day.year, day.month, monthrange(day.year, day.month)[1]), leave.end_date)
+            entries.append(LeaveLedgerEntry(
+                leave_request=leave, user_id=leave.user_id, year=day.year, month=day.month,
+                days=Decimal((end - day).days + 1)
+            ))
+            day = end + timedelta(days=1)
+    LeaveLedgerEntry.objects.bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0009_list_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='monthlyleavebalance',
+            name='remaining_leaves',
+            field=models.FloatField(default=4),
+        ),
+        migrations.AlterField(
+            model_name='monthlyleavebalance',
+            name='used_leaves',
+            field=models.FloatField(default=0),
+        ),
+        migrations.CreateModel(
+            name='LeaveLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('days', models.DecimalField(decimal_places=1, max_digits=5)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('leave_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='attendance.leaverequest')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'year', 'month'], name='ledger_user_month_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
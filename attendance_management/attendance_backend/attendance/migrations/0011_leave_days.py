@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:18
+
+import django.db.models.deletion
+from django.conf import settings
+from datetime import timedelta
+from django.db import migrations, models
+
+
+def backfill_leave_days(apps, schema_editor):
+    LeaveRequest = apps.get_model('attendance', 'LeaveRequest')
+    LeaveDay = apps.get_model('attendance', 'LeaveDay')
+    days = []
+    for leave in LeaveRequest.objects.filter(status='approved').select_related('user').iterator():
+        for offset in range((leave.end_date - leave.start_date).days + 1):
+            days.append(LeaveDay(
+                leave_request=leave, user_id=leave.user_id, organization_id=leave.user.organization_id,
+                date=leave.start_date + timedelta(days=offset), leave_type=leave.leave_type
+            ))
+    LeaveDay.objects.bulk_create(days, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0010_leave_ledger'),
+        ('organizations', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaveDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('leave_type', models.CharField(choices=[('sick', 'Sick Leave'), ('half_day', 'Half Day'), ('full_day', 'Full Day')], max_length=10)),
+                ('leave_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leave_days', to='attendance.leaverequest')),
+                ('organization', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='organizations.organization')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['organization', 'date'], name='leaveday_org_date_idx')],
+                'unique_together': {('leave_request', 'date')},
+            },
+        ),
+        migrations.RunPython(backfill_leave_days, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:10
+
+from django.db import migrations
+from django.db.models import F, FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def rebuild_balances(apps, schema_editor):
+    """
+    Recompute every balance from the ledger 0010 backfilled.
+
+    Balances from before the ledger charged leaves to the month they were
+    approved in, the ledger to the months they fall in; left alone, a later
+    rejection would refund a month that was never charged.
+    """
+    LeaveLedgerEntry = apps.get_model('attendance', 'LeaveLedgerEntry')
+    MonthlyLeaveBalance = apps.get_model('attendance', 'MonthlyLeaveBalance')
+    months = LeaveLedgerEntry.objects.order_by().values_list('user', 'year', 'month').distinct()
+    MonthlyLeaveBalance.objects.bulk_create(
+        [MonthlyLeaveBalance(user_id=user_id, year=year, month=month, total_allowed=4, used_leaves=0, remaining_leaves=4)
+         for user_id, year, month in months],
+        batch_size=500,
+        ignore_conflicts=True
+    )
+    used = Coalesce(Subquery(
+        LeaveLedgerEntry.objects.filter(
+            user=OuterRef('user'), year=OuterRef('year'), month=OuterRef('month')
+        ).order_by().values('user').annotate(total=Sum('days')).values('total'),
+        output_field=FloatField()
+    ), Value(0.0))
+    MonthlyLeaveBalance.objects.update(used_leaves=used, remaining_leaves=F('total_allowed') - used)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0014_notification_archive'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_balances, migrations.RunPython.noop),
+    ]
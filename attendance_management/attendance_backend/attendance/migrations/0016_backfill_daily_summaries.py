@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:40
+
+from django.db import migrations
+from django.db.models import Count, Max, Min, Q, Sum
+
+CHUNK_SIZE = 500
+
+
+def backfill_summaries(apps, schema_editor):
+    """
+    Build a DailyAttendanceSummary for every user-day with sessions.
+
+    0008 only created the table, and the admin report reads nothing else, so
+    without this every day before the rollup went live reports empty. The
+    upsert makes rerunning it (or running it after backfill_daily_summaries)
+    harmless.
+    """
+    AttendanceRecord = apps.get_model('attendance', 'AttendanceRecord')
+    DailyAttendanceSummary = apps.get_model('attendance', 'DailyAttendanceSummary')
+    rows = AttendanceRecord.objects.filter(clock_in__isnull=False).values('user', 'date').annotate(
+        organization=Max('user__organization'),
+        first_in=Min('clock_in'),
+        last_out=Max('clock_out'),
+        worked_hours=Sum('total_hours'),
+        session_count=Count('id'),
+        present_count=Count('id', filter=Q(is_present=True)),
+    ).order_by()
+
+    batch = []
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        batch.append(DailyAttendanceSummary(
+            user_id=row['user'],
+            organization_id=row['organization'],
+            date=row['date'],
+            first_in=row['first_in'],
+            last_out=row['last_out'],
+            worked_seconds=max(round((row['worked_hours'] or 0) * 3600), 0),
+            sessions=row['session_count'],
+            present=row['present_count'] > 0,
+        ))
+        if len(batch) == CHUNK_SIZE:
+            upsert(DailyAttendanceSummary, batch)
+            batch = []
+    if batch:
+        upsert(DailyAttendanceSummary, batch)
+
+
+def upsert(model, summaries):
+    model.objects.bulk_create(
+        summaries,
+        batch_size=CHUNK_SIZE,
+        update_conflicts=True,
+        unique_fields=['user', 'date'],
+        update_fields=['organization', 'first_in', 'last_out', 'worked_seconds', 'sessions', 'present'],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0015_rebuild_leave_balances'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_organizations(apps, schema_editor):
+    """Give every existing request its requester's organization, in one UPDATE"""
+    LeaveRequest = apps.get_model('attendance', 'LeaveRequest')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    LeaveRequest.objects.update(
+        organization=Subquery(User.objects.filter(pk=OuterRef('user')).values('organization')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0016_backfill_daily_summaries'),
+        ('organizations', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='leaverequest',
+            name='leave_applied_idx',
+        ),
+        migrations.AddField(
+            model_name='leaverequest',
+            name='organization',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='organizations.organization'),
+        ),
+        migrations.RunPython(copy_organizations, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(fields=['organization', '-applied_on', '-id'], name='leave_org_applied_idx'),
+        ),
+    ]
@@ -10,10 +10,47 @@ class AttendanceRecord(models.Model):
     clock_in = models.DateTimeField(null=True, blank=True)
     clock_out = models.DateTimeField(null=True, blank=True)
     total_hours = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    # Running total of closed breaks, kept in step by the break-end endpoint
+    break_seconds = models.PositiveIntegerField(default=0)
     is_present = models.BooleanField(default=False)
     
     class Meta:
         ordering = ['-date', '-clock_in']
+        constraints = [
+            # At most one open (clocked in, not yet clocked out) session per user per day
+            models.UniqueConstraint(
+                fields=['user', 'date'],
+                condition=models.Q(clock_in__isnull=False, clock_out__isnull=True),
+                name='one_open_session_per_user_day'
+            ),
+        ]
+        indexes = [
+            # attendance_history / attendance_today: a user's sessions newest first
+            models.Index(fields=['user', '-date', '-clock_in'], name='attendance_user_date_idx'),
+            # admin_attendance_report: an organization's sessions within a date range
+            models.Index(fields=['date', 'user'], name='attendance_date_user_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.date}"
+
+class DailyAttendanceSummary(models.Model):
+    """One row per user-day, rolled up from that day's sessions for reporting"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_summaries')
+    organization = models.ForeignKey('organizations.Organization', on_delete=models.CASCADE, null=True, blank=True)
+    date = models.DateField()
+    first_in = models.DateTimeField(null=True, blank=True)
+    last_out = models.DateTimeField(null=True, blank=True)
+    worked_seconds = models.PositiveIntegerField(default=0)
+    sessions = models.PositiveIntegerField(default=0)
+    present = models.BooleanField(default=False)
+    
+    class Meta:
+        unique_together = ['user', 'date']
+        indexes = [
+            # admin_attendance_report: an organization's days newest first
+            models.Index(fields=['organization', '-date'], name='summary_org_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.date}"
@@ -24,6 +61,15 @@ class BreakRecord(models.Model):
     break_end = models.DateTimeField(null=True, blank=True)
     break_duration = models.DecimalField(max_digits=5, decimal_places=2, default=0)
     
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['attendance'],
+                condition=models.Q(break_end__isnull=True),
+                name='one_open_break_per_session'
+            ),
+        ]
+    
     def __str__(self):
         return f"{self.attendance.user.username} - Break on {self.attendance.date}"
 
@@ -41,6 +87,8 @@ class LeaveRequest(models.Model):
     ]
     
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # The requester's organization, copied so the admin list is one index range
+    organization = models.ForeignKey('organizations.Organization', on_delete=models.CASCADE, null=True, blank=True)
     leave_type = models.CharField(max_length=10, choices=LEAVE_TYPES)
     start_date = models.DateField()
     end_date = models.DateField()
@@ -49,6 +97,21 @@ class LeaveRequest(models.Model):
     applied_on = models.DateTimeField(auto_now_add=True)
     approved_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='approved_leaves')
     
+    class Meta:
+        indexes = [
+            # leave_requests / employee_leave_history: a user's requests newest first
+            models.Index(fields=['user', '-applied_on'], name='leave_user_applied_idx'),
+            # admin leave_requests: the organization's requests newest first, paged on (applied_on, id)
+            models.Index(fields=['organization', '-applied_on', '-id'], name='leave_org_applied_idx'),
+            # pending queue and per-status counts
+            models.Index(fields=['status', 'user'], name='leave_status_user_idx'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        if self.organization_id is None and self.user_id is not None:
+            self.organization_id = self.user.organization_id
+        super().save(*args, **kwargs)
+    
     def __str__(self):
         return f"{self.user.username} - {self.leave_type} ({self.start_date})"
 
@@ -57,8 +120,9 @@ class MonthlyLeaveBalance(models.Model):
     year = models.IntegerField()
     month = models.IntegerField()
     total_allowed = models.IntegerField(default=4)
-    used_leaves = models.IntegerField(default=0)
-    remaining_leaves = models.IntegerField(default=4)
+    # Materialized from LeaveLedgerEntry; floats so half days add up
+    used_leaves = models.FloatField(default=0)
+    remaining_leaves = models.FloatField(default=4)
     
     class Meta:
         unique_together = ['user', 'year', 'month']
@@ -66,6 +130,42 @@ class MonthlyLeaveBalance(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.month}/{self.year}"
 
+class LeaveDay(models.Model):
+    """One row per calendar day of an approved leave, for who's-off range queries"""
+    leave_request = models.ForeignKey(LeaveRequest, on_delete=models.CASCADE, related_name='leave_days')
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    organization = models.ForeignKey('organizations.Organization', on_delete=models.CASCADE, null=True, blank=True)
+    date = models.DateField()
+    leave_type = models.CharField(max_length=10, choices=LeaveRequest.LEAVE_TYPES)
+    
+    class Meta:
+        unique_together = ['leave_request', 'date']
+        indexes = [
+            # leave_calendar: an organization's days off in a date range
+            models.Index(fields=['organization', 'date'], name='leaveday_org_date_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.date} ({self.leave_type})"
+
+class LeaveLedgerEntry(models.Model):
+    """Append-only record of leave days charged (positive) or refunded (negative) to a month"""
+    leave_request = models.ForeignKey(LeaveRequest, on_delete=models.CASCADE, related_name='ledger_entries')
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    year = models.IntegerField()
+    month = models.IntegerField()
+    days = models.DecimalField(max_digits=5, decimal_places=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            # balance rebuilds: one user-month's entries
+            models.Index(fields=['user', 'year', 'month'], name='ledger_user_month_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.month}/{self.year}: {self.days}"
+
 class Notification(models.Model):
     NOTIFICATION_TYPES = [
         ('leave_approved', 'Leave Approved'),
@@ -82,6 +182,70 @@ class Notification(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # notifications: a user's feed newest first
+            models.Index(fields=['user', '-created_at'], name='notification_user_created_idx'),
+            # ?unread=1 and mark-all-read: only the unread rows, which stay few as history grows
+            models.Index(
+                fields=['user', '-created_at', '-id'], name='notification_unread_idx', condition=models.Q(is_read=False)
+            ),
+        ]
     
     def __str__(self):
-        return f"{self.user.username} - {self.title}"
\ No newline at end of file
+        return f"{self.user.username} - {self.title}"
+
+class NotificationArchive(models.Model):
+    """A read notification moved out of the live table by ``purge_notifications``; keeps its original id"""
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    notification_type = models.CharField(max_length=20, choices=Notification.NOTIFICATION_TYPES, default='general')
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.title} (archived)"
+
+class NotificationCounter(models.Model):
+    """A user's unread notification count, kept in step with their notifications"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='notification_counter')
+    unread = models.IntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.user.username}: {self.unread} unread"
+
+class NotificationOutbox(models.Model):
+    """A notification waiting to be delivered, written in the same transaction as the change it reports"""
+    CHANNELS = [
+        ('in_app', 'In-app'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('delivered', 'Delivered'),
+        ('dead', 'Dead'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    channel = models.CharField(max_length=20, choices=CHANNELS, default='in_app')
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    notification_type = models.CharField(max_length=20, choices=Notification.NOTIFICATION_TYPES, default='general')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            # deliver_notifications: the next due pending messages
+            models.Index(
+                fields=['available_at', 'id'], name='outbox_pending_idx', condition=models.Q(status='pending')
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.title} ({self.status})"
+
@@ -0,0 +1,143 @@
+"""
+Transactional outbox for notifications.
+
+Leave decisions write a ``NotificationOutbox`` row in the same transaction as
+the status change, so a notification goes out if and only if the decision
+committed, and the admin's request does no delivery work of its own. The
+``deliver_notifications`` worker drains due messages in batches: each channel
+delivers a batch at once (in-app is a single ``bulk_create``), a batch that
+fails is retried one message at a time to isolate the bad one, and failed
+messages back off exponentially until ``MAX_ATTEMPTS``, after which they are
+dead-lettered for inspection and ``requeue_dead`` can send them again.
+The recipient's open event streams hear of a notification once its batch
+commits, with the notification's and the outbox message's ids; a message that
+fails or is dead-lettered is never announced. The worker runs in its own
+process, so the default in-process event broker can't reach the ASGI server's
+streams from it: live notifications need a cross-process
+``ATTENDANCE_EVENT_BROKER`` (clients still see them on the next notifications
+poll without one).
+
+New channels (e-mail, push) plug in through ``CHANNELS``.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .events import publish_on_commit
+from .inbox import add_unread
+from .models import Notification, NotificationOutbox
+from .serializers import NotificationSerializer
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+MAX_ATTEMPTS = 5
+RETRY_BACKOFF = timedelta(seconds=30)
+
+
+def enqueue(messages):
+    """Queue unsaved ``NotificationOutbox`` rows; call inside the transaction that warrants them"""
+    NotificationOutbox.objects.bulk_create(messages, batch_size=BATCH_SIZE)
+
+
+def deliver_in_app(messages):
+    """Create the notifications, count them as unread and announce them once the batch commits"""
+    notifications = Notification.objects.bulk_create([
+        Notification(
+            user_id=message.user_id, title=message.title, message=message.message,
+            notification_type=message.notification_type
+        )
+        for message in messages
+    ], batch_size=BATCH_SIZE)
+    add_unread(notification.user_id for notification in notifications)
+    # Registered inside deliver()'s savepoint, so a batch that fails is never announced
+    for message, notification in zip(messages, notifications):
+        publish_on_commit(notification.user_id, 'notification', {
+            **NotificationSerializer(notification).data, 'outbox_id': message.pk
+        })
+
+
+CHANNELS = {
+    'in_app': deliver_in_app,
+}
+
+
+def deliver(channel, messages):
+    """Deliver ``messages`` in a savepoint; returns the exception if the channel failed"""
+    try:
+        with transaction.atomic():
+            CHANNELS[channel](messages)
+    except Exception as e:
+        return e
+    return None
+
+
+def retry_at(attempts, now):
+    return now + RETRY_BACKOFF * 2 ** (attempts - 1)
+
+
+def drain_batch(batch_size=BATCH_SIZE, max_attempts=MAX_ATTEMPTS):
+    """
+    Deliver up to ``batch_size`` due messages in one transaction.
+
+    Returns ``(claimed, delivered, dead)`` counts; the messages neither
+    delivered nor dead were rescheduled.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # skip_locked lets several workers drain in parallel where the database supports it
+        batch = list(NotificationOutbox.objects.select_for_update(skip_locked=True).filter(
+            status='pending', available_at__lte=now
+        ).order_by('available_at', 'id')[:batch_size])
+
+        by_channel = defaultdict(list)
+        for message in batch:
+            by_channel[message.channel].append(message)
+
+        delivered, failed = [], []
+        for channel, messages in by_channel.items():
+            if deliver(channel, messages) is None:
+                delivered.extend(messages)
+                continue
+            # Retry one at a time so one bad message doesn't hold back the rest
+            for message in messages:
+                error = deliver(channel, [message])
+                if error is None:
+                    delivered.append(message)
+                else:
+                    message.last_error = repr(error)
+                    failed.append(message)
+
+        NotificationOutbox.objects.filter(pk__in=[message.pk for message in delivered]).update(
+            status='delivered', delivered_at=now, attempts=F('attempts') + 1
+        )
+        dead = 0
+        for message in failed:
+            message.attempts += 1
+            if message.attempts >= max_attempts:
+                message.status = 'dead'
+                dead += 1
+                logger.error('Dead-lettered notification %s after %s attempts: %s', message.pk, message.attempts, message.last_error)
+            else:
+                message.available_at = retry_at(message.attempts, now)
+        NotificationOutbox.objects.bulk_update(failed, ['attempts', 'status', 'available_at', 'last_error'])
+    return len(batch), len(delivered), dead
+
+
+def drain_outbox(batch_size=BATCH_SIZE, max_attempts=MAX_ATTEMPTS):
+    """Deliver batches until no message is due; returns ``(claimed, delivered, dead)`` totals"""
+    totals = [0, 0, 0]
+    while True:
+        counts = drain_batch(batch_size, max_attempts)
+        totals = [total + count for total, count in zip(totals, counts)]
+        if counts[0] < batch_size:
+            return tuple(totals)
+
+
+def requeue_dead():
+    """Put dead-lettered messages back in the queue with a fresh set of attempts"""
+    return NotificationOutbox.objects.filter(status='dead').update(
+        status='pending', attempts=0, available_at=timezone.now()
+    )
@@ -0,0 +1,133 @@
+"""
+Keyset pagination and sparse fieldsets shared by the list endpoints.
+
+Pages are cut with an opaque cursor holding the last row's sort key rather
+than an OFFSET, so each page is one range read on the endpoint's index however
+deep the client pages. ``?fields=`` trims the payload at both ends: the
+serializer drops the other fields and the queryset is narrowed with
+``only()``, so the unneeded columns never leave the database.
+"""
+import base64
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def parse_limit(params, default=DEFAULT_PAGE_SIZE):
+    """Page size from ``?limit=``, clamped to ``1..MAX_PAGE_SIZE``"""
+    try:
+        limit = int(params.get('limit', default))
+    except ValueError:
+        raise ValueError('limit must be a number')
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def encode_cursor(values):
+    values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor, size):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def sort_value(row, field):
+    """Value of an ordering field (``-`` stripped, ``__`` paths allowed) on a row or ``values()`` dict"""
+    if isinstance(row, dict):
+        return row[field]
+    for attr in field.split('__'):
+        row = getattr(row, attr)
+    return row
+
+
+def after(ordering, values):
+    """Rows strictly after ``values`` in ``ordering``"""
+    query = Q()
+    for position, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        ties = {other.lstrip('-'): value for other, value in zip(ordering[:position], values)}
+        query |= Q(**ties, **{f'{name}__{lookup}': values[position]})
+    return query
+
+
+def keyset_page(queryset, ordering, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Return ``(rows, next_cursor)`` for the page after ``cursor``.
+
+    ``ordering`` must be a unique, non-null sort key, ideally backed by an
+    index; ``next_cursor`` is ``None`` on the last page.
+    """
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        try:
+            queryset = queryset.filter(after(ordering, decode_cursor(cursor, len(ordering))))
+        except (TypeError, ValueError, ValidationError):
+            raise ValueError('Invalid cursor')
+    page = list(queryset[:limit + 1])
+    fields = [field.lstrip('-') for field in ordering]
+    next_cursor = encode_cursor([sort_value(page[limit - 1], field) for field in fields]) if len(page) > limit else None
+    return page[:limit], next_cursor
+
+
+def parse_fields(params, serializer_class):
+    """Field names requested with ``?fields=``, or ``None`` for all of them"""
+    if not params.get('fields'):
+        return None
+    fields = [name.strip() for name in params['fields'].split(',') if name.strip()]
+    unknown = [name for name in fields if name not in serializer_class().fields]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def only_columns(queryset, fields, ordering=(), sources=None):
+    """
+    Narrow ``queryset`` to the columns behind ``fields``.
+
+    ``sources`` maps a serializer field to the model fields it reads when that
+    isn't the field of the same name; the ordering fields and any
+    ``select_related()`` relations are always kept.
+    """
+    sources = sources or {}
+    columns = {field.lstrip('-') for field in ordering}
+    # Relations joined with select_related() can't be deferred
+    if isinstance(queryset.query.select_related, dict):
+        columns.update(queryset.query.select_related)
+    for name in fields:
+        columns.update(sources.get(name, [name]))
+    return queryset.only(*columns)
+
+
+def serialize(serializer_class, rows, fields=None, **kwargs):
+    serializer = serializer_class(rows, many=True, **kwargs)
+    if fields is not None:
+        for name in set(serializer.child.fields) - set(fields):
+            serializer.child.fields.pop(name)
+    return serializer.data
+
+
+def paginate(request, queryset, serializer_class, ordering, sources=None, default_limit=DEFAULT_PAGE_SIZE):
+    """
+    One page of ``queryset`` serialized for ``request`` as ``{results, next_cursor}``.
+
+    Reads ``?cursor=``, ``?limit=`` and ``?fields=``; raises ``ValueError`` for bad values.
+    """
+    params = request.query_params
+    fields = parse_fields(params, serializer_class)
+    if fields is not None:
+        queryset = only_columns(queryset, fields, ordering, sources)
+    rows, next_cursor = keyset_page(queryset, ordering, params.get('cursor'), parse_limit(params, default_limit))
+    return {
+        'results': serialize(serializer_class, rows, fields),
+        'next_cursor': next_cursor
+    }
@@ -0,0 +1,93 @@
+"""
+Write-through presence cache for the attendance status endpoint.
+
+The punch engine writes each user's current state to Django's cache framework
+once the punch commits, so ``attendance_status`` polls are answered without
+touching the database. On a miss (cold cache, eviction, new day or an
+unavailable backend) the state is rebuilt from the open-session index and
+stored with ``cache.add``: a punch that commits between the rebuild's read
+and its write has already cached the newer state, which must win.
+"""
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from .models import AttendanceRecord, BreakRecord
+from .serializers import AttendanceRecordSerializer
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_TTL = getattr(settings, 'ATTENDANCE_PRESENCE_TTL', 60 * 60 * 24)
+
+
+def presence_key(user_id):
+    return f'attendance:presence:{user_id}'
+
+
+def build_state(day, active_session=None, break_start=None):
+    return {
+        'date': str(day),
+        'active_session': dict(AttendanceRecordSerializer(active_session).data) if active_session else None,
+        'break_start': break_start.isoformat() if break_start else None,
+    }
+
+
+def store_state(user_id, state, rebuilt=False):
+    """Cache ``state``; a ``rebuilt`` one never replaces a state already cached"""
+    write = cache.add if rebuilt else cache.set
+    try:
+        write(presence_key(user_id), state, PRESENCE_TTL)
+    except Exception:
+        logger.exception('Presence cache write failed for user %s', user_id)
+        invalidate_presence(user_id)
+
+
+def store_on_commit(user_id, state):
+    """Write the new state once the surrounding transaction commits"""
+    transaction.on_commit(lambda: store_state(user_id, state))
+
+
+def invalidate_presence(user_id):
+    try:
+        cache.delete(presence_key(user_id))
+    except Exception:
+        logger.exception('Presence cache delete failed for user %s', user_id)
+
+
+def invalidate_presence_many(user_ids):
+    try:
+        cache.delete_many([presence_key(user_id) for user_id in user_ids])
+    except Exception:
+        logger.exception('Presence cache delete failed for %s users', len(user_ids))
+
+
+def get_presence(user_id):
+    """Return the user's presence state for today, rebuilding it on a cache miss"""
+    today = timezone.now().date()
+    try:
+        state = cache.get(presence_key(user_id))
+    except Exception:
+        logger.exception('Presence cache read failed for user %s', user_id)
+        state = None
+
+    if state is not None:
+        if state['date'] == str(today):
+            return state
+        # Yesterday's state would keep the rebuilt one from being added
+        invalidate_presence(user_id)
+
+    active_session = AttendanceRecord.objects.filter(
+        user_id=user_id,
+        date=today,
+        clock_in__isnull=False,
+        clock_out__isnull=True
+    ).annotate(
+        open_break_start=Subquery(BreakRecord.objects.filter(
+            attendance=OuterRef('pk'), break_end__isnull=True
+        ).values('break_start'))
+    ).first()
+    state = build_state(today, active_session, active_session.open_break_start if active_session else None)
+    store_state(user_id, state, rebuilt=True)
+    return state
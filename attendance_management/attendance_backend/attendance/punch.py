@@ -0,0 +1,176 @@
+"""
+Punch engine behind the clock-in/clock-out and break endpoints.
+
+Clock-in is a single INSERT guarded by the ``one_open_session_per_user_day``
+constraint, so two concurrent taps can never open two sessions. Clock-out is a
+single UPDATE that closes the open session and computes ``total_hours`` in SQL
+from the running ``break_seconds`` total, which break-end maintains with an
+atomic increment, so no path ever aggregates ``BreakRecord`` rows. Both punches
+refresh the user's ``DailyAttendanceSummary`` in the same transaction.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import DateTimeField, DecimalField, Exists, F, Func, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, Round
+from django.utils import timezone
+from .models import AttendanceRecord, BreakRecord
+from .events import publish_on_commit
+from .presence import build_state, store_on_commit
+from .rollup import refresh_daily_summaries
+
+
+class SecondsBetween(Func):
+    """Elapsed seconds between two datetime expressions, computed by the database"""
+    arity = 2
+    divisor = 1
+    output_field = DecimalField(max_digits=12, decimal_places=2)
+
+    def _compile(self, compiler, connection, template, reverse=False):
+        start, end = self.get_source_expressions()
+        start_sql, start_params = compiler.compile(start)
+        end_sql, end_params = compiler.compile(end)
+        sql = template.format(start=start_sql, end=end_sql)
+        if self.divisor != 1:
+            sql = f'({sql} / {self.divisor:.1f})'
+        if reverse:
+            return sql, (*start_params, *end_params)
+        return sql, (*end_params, *start_params)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        return self._compile(compiler, connection, 'EXTRACT(EPOCH FROM ({end} - {start}))')
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self._compile(compiler, connection, '((julianday({end}) - julianday({start})) * 86400.0)')
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self._compile(compiler, connection, '(TIMESTAMPDIFF(MICROSECOND, {start}, {end}) / 1000000.0)', reverse=True)
+
+
+class HoursBetween(SecondsBetween):
+    """Elapsed hours between two datetime expressions, computed by the database"""
+    divisor = 3600
+    output_field = DecimalField(max_digits=5, decimal_places=2)
+
+
+def whole_seconds_since(field, now):
+    return Cast(Round(SecondsBetween(field, Value(now, output_field=DateTimeField()))), IntegerField())
+
+
+def open_session_filter(user, day):
+    """Lookup kwargs for a user's open session on ``day``"""
+    return {'user': user, 'date': day, 'clock_in__isnull': False, 'clock_out__isnull': True}
+
+
+def announce(user_id, state):
+    """Refresh the presence cache and notify event streams once the punch commits"""
+    store_on_commit(user_id, state)
+    publish_on_commit(user_id, 'attendance', state)
+
+
+def punch_in(user, now=None):
+    """
+    Open a new session with a single INSERT.
+
+    Returns the new record, or ``None`` if the user already has an open session today.
+    """
+    now = now or timezone.now()
+    try:
+        with transaction.atomic():
+            attendance = AttendanceRecord.objects.create(
+                user=user,
+                date=now.date(),
+                clock_in=now,
+                is_present=True
+            )
+            refresh_daily_summaries([(user.pk, attendance.date)])
+            announce(user.pk, build_state(attendance.date, attendance))
+            return attendance
+    except IntegrityError:
+        return None
+
+
+def punch_out(user, now=None):
+    """
+    Close the user's open session with a single UPDATE.
+
+    A break still running at clock-out is counted up to the clock-out time and
+    then closed. Returns ``(clock_out, total_hours)`` or ``None`` if there was
+    no open session.
+    """
+    now = now or timezone.now()
+    open_break = BreakRecord.objects.filter(attendance=OuterRef('pk'), break_end__isnull=True)
+    break_seconds = F('break_seconds') + Coalesce(
+        Subquery(open_break.values(seconds=whole_seconds_since('break_start', now))), Value(0)
+    )
+
+    with transaction.atomic():
+        updated = AttendanceRecord.objects.filter(**open_session_filter(user, now.date())).update(
+            clock_out=now,
+            break_seconds=break_seconds,
+            total_hours=Round(
+                HoursBetween('clock_in', Value(now, output_field=DateTimeField()))
+                - Cast(break_seconds, DecimalField()) / Value(3600.0),
+                2
+            )
+        )
+        if not updated:
+            return None
+        closed = AttendanceRecord.objects.filter(user=user, date=now.date(), clock_out=now).values(
+            'pk', 'total_hours', on_break=Exists(open_break)
+        ).first()
+        if closed['on_break']:
+            close_open_break(closed['pk'], now)
+        refresh_daily_summaries([(user.pk, now.date())])
+        announce(user.pk, build_state(now.date()))
+
+    return now, closed['total_hours']
+
+
+def close_open_break(attendance_id, now):
+    return BreakRecord.objects.filter(attendance_id=attendance_id, break_end__isnull=True).update(
+        break_end=now,
+        break_duration=HoursBetween('break_start', Value(now, output_field=DateTimeField()))
+    )
+
+
+def start_break(user, now=None):
+    """
+    Open a break on the user's open session.
+
+    Returns the new ``BreakRecord``, ``None`` if the user is not clocked in, or
+    ``False`` if a break is already running.
+    """
+    now = now or timezone.now()
+    attendance = AttendanceRecord.objects.filter(**open_session_filter(user, now.date())).first()
+    if attendance is None:
+        return None
+    try:
+        with transaction.atomic():
+            break_record = BreakRecord.objects.create(attendance=attendance, break_start=now)
+            announce(user.pk, build_state(attendance.date, attendance, break_record.break_start))
+            return break_record
+    except IntegrityError:
+        return False
+
+
+def end_break(user, now=None):
+    """
+    Close the running break and add it to the session's ``break_seconds``.
+
+    The running total is bumped with an atomic increment in a single UPDATE.
+    Returns the updated session, or ``None`` if no break was running.
+    """
+    now = now or timezone.now()
+    open_break = BreakRecord.objects.filter(attendance=OuterRef('pk'), break_end__isnull=True)
+    session = AttendanceRecord.objects.filter(Exists(open_break), **open_session_filter(user, now.date()))
+
+    with transaction.atomic():
+        updated = session.update(
+            break_seconds=F('break_seconds') + Subquery(open_break.values(seconds=whole_seconds_since('break_start', now)))
+        )
+        if not updated:
+            return None
+        attendance = AttendanceRecord.objects.filter(**open_session_filter(user, now.date())).first()
+        close_open_break(attendance.pk, now)
+        announce(user.pk, build_state(attendance.date, attendance))
+
+    return attendance
@@ -0,0 +1,49 @@
+"""
+Retention for read notifications.
+
+Expired rows are removed in primary-key batches. Each batch reads the next
+``batch_size`` ids after the previous batch, so no batch rescans what earlier
+ones covered. It then archives and deletes exactly those ids in its own short
+transaction. The SQLite write lock is held for one batch at a time, so
+clock-ins and leave decisions keep going while a large purge runs. Unread
+notifications are never touched, so the unread counters stay correct.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import Notification, NotificationArchive
+
+BATCH_SIZE = 1000
+ARCHIVE_FIELDS = ('id', 'user_id', 'title', 'message', 'notification_type', 'created_at')
+
+
+def expired_notifications(days=None):
+    """Read notifications older than ``days`` (default: ``ATTENDANCE_NOTIFICATION_RETENTION_DAYS``)"""
+    if days is None:
+        days = settings.ATTENDANCE_NOTIFICATION_RETENTION_DAYS
+    return Notification.objects.filter(is_read=True, created_at__lt=timezone.now() - timedelta(days=days))
+
+
+def purge_batch(ids, archive=False):
+    """Delete (after archiving, if asked) the notifications ``ids`` in one transaction"""
+    with transaction.atomic():
+        if archive:
+            NotificationArchive.objects.bulk_create(
+                [NotificationArchive(**row) for row in Notification.objects.filter(pk__in=ids).values(*ARCHIVE_FIELDS)],
+                ignore_conflicts=True
+            )
+        # No cascades or signals on Notification, so this is a single DELETE ... WHERE id IN
+        deleted, _ = Notification.objects.filter(pk__in=ids).delete()
+    return deleted
+
+
+def purge_batches(queryset, batch_size=BATCH_SIZE, archive=False):
+    """Purge ``queryset`` batch by batch, yielding the rows removed by each batch"""
+    last_pk = 0
+    while True:
+        ids = list(queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return
+        yield purge_batch(ids, archive)
+        last_pk = ids[-1]
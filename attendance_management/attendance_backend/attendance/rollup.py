@@ -0,0 +1,74 @@
+"""
+Maintenance of the ``DailyAttendanceSummary`` rollup.
+
+Every path that writes sessions refreshes the affected user-days in the same
+transaction: one grouped aggregate over the day's (indexed) sessions and one
+upsert. Recomputing from the sessions rather than applying deltas keeps the
+rollup correct for corrections and replays as well as live punches.
+"""
+from django.db.models import Count, Max, Min, Q, Sum
+from .models import AttendanceRecord, DailyAttendanceSummary
+
+CHUNK_SIZE = 500
+SUMMARY_FIELDS = ['organization', 'first_in', 'last_out', 'worked_seconds', 'sessions', 'present']
+
+
+def aggregate_days(records):
+    """Group a session queryset into one row of summary values per user-day"""
+    return records.filter(clock_in__isnull=False).values('user', 'date').annotate(
+        organization=Max('user__organization'),
+        first_in=Min('clock_in'),
+        last_out=Max('clock_out'),
+        worked_hours=Sum('total_hours'),
+        session_count=Count('id'),
+        present_count=Count('id', filter=Q(is_present=True)),
+    ).order_by()
+
+
+def summary_from_row(row):
+    return DailyAttendanceSummary(
+        user_id=row['user'],
+        organization_id=row['organization'],
+        date=row['date'],
+        first_in=row['first_in'],
+        last_out=row['last_out'],
+        worked_seconds=max(round((row['worked_hours'] or 0) * 3600), 0),
+        sessions=row['session_count'],
+        present=row['present_count'] > 0,
+    )
+
+
+def upsert_summaries(summaries):
+    DailyAttendanceSummary.objects.bulk_create(
+        summaries,
+        batch_size=CHUNK_SIZE,
+        update_conflicts=True,
+        unique_fields=['user', 'date'],
+        update_fields=SUMMARY_FIELDS,
+    )
+
+
+def refresh_daily_summaries(user_days):
+    """
+    Recompute the summaries for the given ``(user_id, date)`` pairs.
+
+    Call inside the transaction that changed the sessions. Days left without
+    any session lose their summary row.
+    """
+    user_days = list(set(user_days))
+    for start in range(0, len(user_days), CHUNK_SIZE):
+        chunk = user_days[start:start + CHUNK_SIZE]
+        user_ids = {user_id for user_id, _ in chunk}
+        dates = {day for _, day in chunk}
+        wanted = set(chunk)
+
+        rows = aggregate_days(AttendanceRecord.objects.filter(user_id__in=user_ids, date__in=dates))
+        summaries = [summary_from_row(row) for row in rows if (row['user'], row['date']) in wanted]
+        upsert_summaries(summaries)
+
+        emptied = wanted - {(summary.user_id, summary.date) for summary in summaries}
+        if emptied:
+            query = Q()
+            for user_id, day in emptied:
+                query |= Q(user_id=user_id, date=day)
+            DailyAttendanceSummary.objects.filter(query).delete()
@@ -6,7 +6,7 @@ class AttendanceRecordSerializer(serializers.ModelSerializer):
     class Meta:
         model = AttendanceRecord
         fields = '__all__'
-        read_only_fields = ['user', 'total_hours']
+        read_only_fields = ['user', 'total_hours', 'break_seconds']
 
 class BreakRecordSerializer(serializers.ModelSerializer):
     class Meta:
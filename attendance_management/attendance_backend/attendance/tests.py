@@ -1,3 +1,1219 @@
-from django.test import TestCase
+import re
+import threading
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
+from importlib import import_module
+from io import BytesIO, StringIO
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from openpyxl import load_workbook
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from accounts.authentication import add_claims, revoke_tokens
+from organizations.models import Organization
+from .models import AttendanceRecord, BreakRecord, DailyAttendanceSummary, LeaveDay, LeaveLedgerEntry, LeaveRequest, MonthlyLeaveBalance, Notification, NotificationArchive, NotificationCounter, NotificationOutbox
+from . import presence
+from .events import EventBroker, publish
+from .leave_calendar import add_leave_days
+from .leaves import approve_leave_request
+from .outbox import CHANNELS, drain_outbox, requeue_dead
+from .punch import end_break, punch_in, punch_out, start_break
 
-# Create your tests here.
+User = get_user_model()
+
+
+def make_employee(organization, username='employee1', **extra):
+    extra.setdefault('role', 'employee')
+    return User.objects.create_user(
+        username=username,
+        organization=organization,
+        **extra
+    )
+
+
+class PunchEngineTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.org = Organization.objects.create(name='Demo Company Ltd.', email='demo@company.com')
+        self.user = make_employee(self.org)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_second_clock_in_is_rejected(self):
+        self.assertEqual(self.client.post('/api/attendance/clock-in/').status_code, 200)
+        response = self.client.post('/api/attendance/clock-in/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(AttendanceRecord.objects.filter(user=self.user).count(), 1)
+
+    def test_clock_out_without_session(self):
+        response = self.client.post('/api/attendance/clock-out/')
+        self.assertEqual(response.status_code, 400)
+
+    def test_clock_out_computes_hours_in_sql(self):
+        start = timezone.now().replace(hour=9, minute=0, second=0, microsecond=0)
+        record = punch_in(self.user, now=start)
+        start_break(self.user, now=start + timedelta(hours=4))
+        end_break(self.user, now=start + timedelta(hours=4, minutes=30))
+
+        clock_out, total_hours = punch_out(self.user, now=start + timedelta(hours=8, minutes=15))
+
+        record.refresh_from_db()
+        self.assertEqual(record.clock_out, clock_out)
+        self.assertEqual(record.total_hours, Decimal('7.75'))
+        self.assertEqual(total_hours, Decimal('7.75'))
+
+    def test_clock_out_during_break_counts_the_break(self):
+        start = timezone.now().replace(hour=9, minute=0, second=0, microsecond=0)
+        record = punch_in(self.user, now=start)
+        start_break(self.user, now=start + timedelta(hours=7))
+
+        _, total_hours = punch_out(self.user, now=start + timedelta(hours=8))
+
+        record.refresh_from_db()
+        self.assertEqual(total_hours, Decimal('7.00'))
+        self.assertEqual(record.break_seconds, 3600)
+        self.assertFalse(BreakRecord.objects.filter(break_end__isnull=True).exists())
+
+    def test_break_endpoints(self):
+        def post(path):
+            with self.captureOnCommitCallbacks(execute=True):
+                return self.client.post(path).status_code
+
+        self.assertEqual(post('/api/attendance/break/start/'), 400)
+        post('/api/attendance/clock-in/')
+        self.assertEqual(post('/api/attendance/break/start/'), 200)
+        self.assertEqual(post('/api/attendance/break/start/'), 400)
+        self.assertTrue(self.client.get('/api/attendance/status/').data['is_on_break'])
+        self.assertEqual(post('/api/attendance/break/end/'), 200)
+        self.assertEqual(post('/api/attendance/break/end/'), 400)
+        self.assertFalse(self.client.get('/api/attendance/status/').data['is_on_break'])
+
+    def test_clock_in_again_after_clock_out(self):
+        start = timezone.now().replace(hour=9, minute=0, second=0, microsecond=0)
+        punch_in(self.user, now=start)
+        punch_out(self.user, now=start + timedelta(hours=1))
+        self.assertIsNotNone(punch_in(self.user, now=start + timedelta(hours=2)))
+
+    def test_punches_are_single_statement_writes(self):
+        with CaptureQueriesContext(connection) as ctx:
+            punch_in(self.user)
+            punch_out(self.user)
+        session_writes = [
+            q['sql'].split()[0] for q in ctx.captured_queries
+            if re.match(r'(INSERT INTO|UPDATE) "attendance_attendancerecord"', q['sql'])
+        ]
+        self.assertEqual(session_writes, ['INSERT', 'UPDATE'])
+        self.assertFalse(any('SUM("attendance_breakrecord"' in q['sql'] for q in ctx.captured_queries))
+
+
+class ConcurrentPunchTests(TransactionTestCase):
+    workers = 8
+
+    def setUp(self):
+        self.org = Organization.objects.create(name='Demo Company Ltd.', email='demo@company.com')
+        self.user = make_employee(self.org)
+
+    def fire(self, path):
+        barrier = threading.Barrier(self.workers)
+        codes, errors = [], []
+
+        def punch():
+            client = APIClient()
+            client.force_authenticate(self.user)
+            try:
+                barrier.wait()
+                codes.append(client.post(path).status_code)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=punch) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        return Counter(codes)
+
+    def test_parallel_clock_ins_open_one_session(self):
+        codes = self.fire('/api/attendance/clock-in/')
+        self.assertEqual(codes, Counter({200: 1, 400: self.workers - 1}))
+        self.assertEqual(
+            AttendanceRecord.objects.filter(user=self.user, clock_out__isnull=True).count(), 1
+        )
+
+    def test_parallel_clock_outs_close_one_session(self):
+        punch_in(self.user)
+        codes = self.fire('/api/attendance/clock-out/')
+        self.assertEqual(codes, Counter({200: 1, 400: self.workers - 1}))
+        self.assertFalse(AttendanceRecord.objects.filter(user=self.user, clock_out__isnull=True).exists())
+
+
+class QueryPlanTests(TestCase):
+    """Every hot view query must be answered from an index, never a full table scan"""
+
+    @classmethod
+    def setUpTestData(cls):
+        orgs = [
+            Organization.objects.create(name=f'Org {n}', email=f'org{n}@company.com')
+            for n in range(3)
+        ]
+        cls.org = orgs[0]
+        today = timezone.now().date()
+        for org in orgs:
+            for n in range(20):
+                user = make_employee(org, username=f'{org.pk}-employee{n}', employee_id=f'EMP{n:03d}')
+                for days_ago in range(10):
+                    day = today - timedelta(days=days_ago)
+                    clock_in = timezone.now() - timedelta(days=days_ago, hours=8)
+                    AttendanceRecord.objects.create(
+                        user=user, date=day, clock_in=clock_in,
+                        clock_out=None if days_ago == 0 else clock_in + timedelta(hours=8),
+                        total_hours=8, is_present=True
+                    )
+                for status in ('pending', 'approved'):
+                    leave = LeaveRequest.objects.create(
+                        user=user, leave_type='full_day', start_date=today, end_date=today + timedelta(days=1),
+                        reason='Personal', status=status
+                    )
+                    Notification.objects.create(user=user, title='Leave Request Approved', message='Approved')
+                add_leave_days([leave], org.pk)
+        call_command('backfill_daily_summaries', stdout=StringIO())
+        cls.user = User.objects.filter(organization=cls.org).first()
+        cls.admin = make_employee(cls.org, username='plan-admin', role='admin')
+
+    # A full table scan, or a sort of every matching row before the LIMIT applies
+    # (``RIGHT PART OF ORDER BY`` only orders ties within one index key)
+    BAD_PLAN = re.compile(r'\bSCAN (?!CONSTANT ROW)|USE TEMP B-TREE FOR ORDER BY')
+
+    def view_requests(self):
+        """``(name, client, url, params)`` for every hot list and lookup view"""
+        employee, admin = APIClient(), APIClient()
+        employee.force_authenticate(self.user)
+        admin.force_authenticate(self.admin)
+        return [
+            ('attendance_status', employee, '/api/attendance/status/', {}),
+            ('attendance_today', employee, '/api/attendance/today/', {}),
+            ('attendance_history', employee, '/api/attendance/history/', {'limit': 3}),
+            ('admin_attendance_report', admin, '/api/attendance/admin/report/', {'limit': 5}),
+            ('leave_requests (employee)', employee, '/api/attendance/leave/requests/', {'limit': 1}),
+            ('leave_requests (admin)', admin, '/api/attendance/leave/requests/', {'limit': 5}),
+            ('employee_leave_history', admin, f'/api/attendance/employee/{self.user.pk}/leaves/', {'limit': 1}),
+            ('notifications', employee, '/api/attendance/notifications/', {'limit': 1}),
+            ('notifications (unread)', employee, '/api/attendance/notifications/', {'limit': 1, 'unread': '1'}),
+            ('leave_calendar', admin, '/api/attendance/leave/calendar/', {}),
+        ]
+
+    def view_queries(self, client, url, params):
+        """SQL the view runs for its first page and, if there is one, the next"""
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            cursor = response.data.get('next_cursor') if isinstance(response.data, dict) else None
+            if cursor:
+                self.assertEqual(client.get(url, {**params, 'cursor': cursor}).status_code, 200)
+        return [query['sql'] for query in queries.captured_queries if query['sql'].startswith('SELECT')]
+
+    def test_no_full_table_scans_or_sorts(self):
+        for name, client, url, params in self.view_requests():
+            with self.subTest(name):
+                queries = self.view_queries(client, url, params)
+                self.assertTrue(queries)
+                for sql in queries:
+                    with connection.cursor() as cursor:
+                        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                        plan = '\n'.join(row[-1] for row in cursor.fetchall())
+                    self.assertIsNone(self.BAD_PLAN.search(plan), f'{name} scans or sorts the whole table:\n{sql}\n{plan}')
+
+
+class PresenceCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.org = Organization.objects.create(name='Demo Company Ltd.', email='demo@company.com')
+        self.user = make_employee(self.org)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_status_polls_hit_cache_after_punches(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/attendance/clock-in/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/attendance/status/')
+        self.assertTrue(response.data['is_clocked_in'])
+        self.assertNotIn('debug_info', response.data)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/attendance/clock-out/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/attendance/status/')
+        self.assertFalse(response.data['is_clocked_in'])
+
+    def test_cache_miss_rebuilds_from_database(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            punch_in(self.user)
+        cache.clear()
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/attendance/status/')
+        self.assertTrue(response.data['is_clocked_in'])
+        with self.assertNumQueries(0):
+            self.client.get('/api/attendance/status/')
+
+    def test_rebuild_never_overwrites_a_punch_committed_meanwhile(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            punch_in(self.user)
+        cache.clear()
+        rebuild = presence.build_state
+
+        def clock_out_meanwhile(*args):
+            # The rebuild has read the open session; the clock-out commits and writes through
+            with self.captureOnCommitCallbacks(execute=True):
+                punch_out(self.user)
+            return rebuild(*args)
+
+        with mock.patch('attendance.presence.build_state', side_effect=clock_out_meanwhile):
+            self.assertIsNotNone(presence.get_presence(self.user.pk)['active_session'])
+        with self.assertNumQueries(0):
+            self.assertFalse(self.client.get('/api/attendance/status/').data['is_clocked_in'])
+
+    def test_stale_day_is_replaced_on_rebuild(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            punch_in(self.user)
+        cache.set(presence.presence_key(self.user.pk), presence.build_state(date(2020, 1, 1)))
+        self.assertTrue(self.client.get('/api/attendance/status/').data['is_clocked_in'])
+        with self.assertNumQueries(0):
+            self.assertTrue(self.client.get('/api/attendance/status/').data['is_clocked_in'])
+
+    def test_debug_info_is_opt_in(self):
+        response = self.client.get('/api/attendance/status/?debug=1')
+        self.assertEqual(response.data['debug_info']['total_records_today'], 0)
+
+
+class EventStreamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.org = Organization.objects.create(name='Demo Company Ltd.', email='demo@company.com')
+        self.admin = make_employee(self.org, username='admin', role='admin')
+        self.user = make_employee(self.org)
+        self.token = str(add_claims(AccessToken.for_user(self.user), self.user))
+
+    async def test_stream_pushes_current_state_then_events(self):
+        response = await self.async_client.get(f'/api/attendance/events/?token={self.token}')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = aiter(response.streaming_content)
+
+        first = await anext(chunks)
+        self.assertIn(b'event: attendance', first)
+        self.assertIn(b'"active_session": null', first)
+
+        publish(self.user.pk, 'notification', {'title': 'Leave Request Approved'})
+        second = await anext(chunks)
+        self.assertIn(b'event: notification', second)
+        self.assertIn(b'Leave Request Approved', second)
+        await chunks.aclose()
+
+    async def test_leave_decisions_reach_open_streams(self):
+        response = await self.async_client.get(f'/api/attendance/events/?token={self.token}')
+        chunks = aiter(response.streaming_content)
+        await anext(chunks)
+
+        def approve_and_deliver():
+            leave = LeaveRequest.objects.create(
+                user=self.user, leave_type='sick', start_date=timezone.now().date(),
+                end_date=timezone.now().date(), reason='Flu'
+            )
+            with self.captureOnCommitCallbacks(execute=True):
+                approve_leave_request(leave, self.admin)
+            with self.captureOnCommitCallbacks(execute=True):
+                drain_outbox()
+            return Notification.objects.get(user=self.user), NotificationOutbox.objects.get(user=self.user)
+        # The worker shares this process, so the in-process broker reaches the stream
+        notification, message = await sync_to_async(approve_and_deliver)()
+        event = await anext(chunks)
+        self.assertIn(b'event: notification', event)
+        self.assertIn(b'Leave Request Approved', event)
+        self.assertIn(f'"id": {notification.pk},'.encode(), event)
+        self.assertIn(f'"outbox_id": {message.pk}'.encode(), event)
+        await chunks.aclose()
+
+    def test_incomplete_brokers_fail_on_creation(self):
+        class PublishOnly(EventBroker):
+            def publish(self, user_id, event, data):
+                pass
+
+        with self.assertRaises(TypeError):
+            PublishOnly()
+
+    async def test_stream_requires_token(self):
+        response = await self.async_client.get('/api/attendance/events/')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_stream_refuses_inactive_users(self):
+        self.user.is_active = False
+        await self.user.asave()
+        response = await self.async_client.get(f'/api/attendance/events/?token={self.token}')
+        self.assertEqual(response.status_code, 401)
+
+        # A token issued while the account was inactive
+        token = add_claims(AccessToken.for_user(self.admin), self.admin)
+        token['active'] = False
+        response = await self.async_client.get(f'/api/attendance/events/?token={token}')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_stream_refuses_revoked_tokens(self):
+        await sync_to_async(revoke_tokens)(self.user)
+        response = await self.async_client.get(f'/api/attendance/events/?token={self.token}')
+        self.assertEqual(response.status_code, 401)
+
+    def test_writers_publish_on_commit(self):
+        leave = LeaveRequest.objects.create(
+            user=self.user, leave_type='sick', start_date=timezone.now().date(),
+            end_date=timezone.now().date(), reason='Flu'
+        )
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        with mock.patch('attendance.events.publish') as publish_event:
+            with self.captureOnCommitCallbacks(execute=True):
+                client.patch(f'/api/attendance/leave/{leave.pk}/approve/')
+            # Queued, not delivered: there is no notification to announce yet
+            self.assertEqual(publish_event.call_args_list, [])
+            with self.captureOnCommitCallbacks(execute=True):
+                drain_outbox()
+            with self.captureOnCommitCallbacks(execute=True):
+                punch_in(self.user)
+        events = [call.args[1] for call in publish_event.call_args_list]
+        self.assertEqual(events, ['notification', 'attendance'])
+        self.assertEqual(publish_event.call_args_list[0].args[2]['id'], Notification.objects.get(user=self.user).pk)
+
+
+class BatchIngestionTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Demo Company Ltd.', email='demo@company.com')
+        self.admin = make_employee(self.org, username='admin', role='admin')
+        self.employees = [
+            make_employee(self.org, username=f'employee{n}', employee_id=f'EMP{n:03d}') for n in range(5)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.day = (timezone.now() - timedelta(days=1)).replace(hour=9, minute=0, second=0, microsecond=0)
+
+    def shift_events(self, employee_id, start, hours=8):
+        return [
+            {'employee_id': employee_id, 'type': 'in', 'timestamp': start.isoformat()},
+            {'employee_id': employee_id, 'type': 'out', 'timestamp': (start + timedelta(hours=hours)).isoformat()},
+        ]
+
+    def test_pairs_events_into_sessions(self):
+        events = []
+        for n in range(5):
+            events += self.shift_events(f'EMP{n:03d}', self.day + timedelta(minutes=n))
+        events.append({'employee_id': 'EMP999', 'type': 'in', 'timestamp': self.day.isoformat()})
+        events.append({'employee_id': 'EMP000', 'type': 'lunch', 'timestamp': self.day.isoformat()})
+
+        response = self.client.post('/api/attendance/events/batch/', {'events': events}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['summary'], {'created': 5, 'closed': 5, 'rejected': 1, 'invalid': 1})
+        records = AttendanceRecord.objects.filter(user__in=self.employees)
+        self.assertEqual(records.count(), 5)
+        self.assertEqual({r.total_hours for r in records}, {Decimal('8.00')})
+
+    def test_replayed_batch_is_idempotent(self):
+        events = self.shift_events('EMP000', self.day)
+        self.client.post('/api/attendance/events/batch/', events, format='json')
+        response = self.client.post('/api/attendance/events/batch/', events, format='json')
+        self.assertEqual([r['status'] for r in response.data['results']], ['duplicate', 'duplicate'])
+
+    def test_closes_session_opened_online(self):
+        punch_in(self.employees[0], now=self.day)
+        response = self.client.post('/api/attendance/events/batch/', [
+            {'employee_id': 'EMP000', 'type': 'out', 'timestamp': (self.day + timedelta(hours=4)).isoformat()}
+        ], format='json')
+        self.assertEqual(response.data['results'][0]['status'], 'closed')
+        self.assertEqual(AttendanceRecord.objects.get(user=self.employees[0]).total_hours, Decimal('4.00'))
+
+    def test_query_count_does_not_grow_with_events(self):
+        events = []
+        for n in range(5):
+            for day in range(20):
+                events += self.shift_events(f'EMP{n:03d}', self.day - timedelta(days=day))
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post('/api/attendance/events/batch/', events, format='json')
+        self.assertLessEqual(len(ctx.captured_queries), 8)
+        self.assertEqual(AttendanceRecord.objects.count(), 100)
+
+    def test_employee_cannot_ingest(self):
+        self.client.force_authenticate(self.employees[0])
+        response = self.client.post('/api/attendance/events/batch/', [], format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class DailySummaryTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Demo Company Ltd.', email='demo@company.com')
+        self.admin = make_employee(self.org, username='admin', role='admin')
+        self.user = make_employee(self.org, employee_id='EMP001')
+        self.start = timezone.now().replace(hour=9, minute=0, second=0, microsecond=0)
+
+    def test_punches_maintain_summary(self):
+        punch_in(self.user, now=self.start)
+        summary = DailyAttendanceSummary.objects.get(user=self.user, date=self.start.date())
+        self.assertEqual((summary.sessions, summary.last_out, summary.organization_id), (1, None, self.org.pk))
+
+        punch_out(self.user, now=self.start + timedelta(hours=3))
+        punch_in(self.user, now=self.start + timedelta(hours=4))
+        punch_out(self.user, now=self.start + timedelta(hours=8))
+
+        summary.refresh_from_db()
+        self.assertEqual(summary.first_in, self.start)
+        self.assertEqual(summary.last_out, self.start + timedelta(hours=8))
+        self.assertEqual(summary.worked_seconds, 7 * 3600)
+        self.assertEqual(summary.sessions, 2)
+        self.assertTrue(summary.present)
+
+    def test_backfill_command_and_report(self):
+        for days_ago in range(3):
+            day = self.start - timedelta(days=days_ago)
+            AttendanceRecord.objects.create(
+                user=self.user, date=day.date(), clock_in=day, clock_out=day + timedelta(hours=8),
+                total_hours=8, is_present=True
+            )
+        call_command('backfill_daily_summaries', stdout=StringIO())
+        self.assertEqual(DailyAttendanceSummary.objects.filter(user=self.user).count(), 3)
+
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        with self.assertNumQueries(1):
+            response = client.get('/api/attendance/admin/report/')
+        this_month = [day for day in range(3) if (self.start - timedelta(days=day)).month == self.start.month]
+        self.assertEqual(len(response.data['results']), len(this_month))
+        self.assertEqual(response.data['results'][0]['total_hours'], 8.0)
+        self.assertEqual(response.data['results'][0]['date'], self.start.date())
+
+    def test_migration_builds_summaries_for_existing_sessions(self):
+        AttendanceRecord.objects.bulk_create([
+            AttendanceRecord(
+                user=self.user, date=self.start.date(), clock_in=self.start + timedelta(hours=hours),
+                clock_out=self.start + timedelta(hours=hours + 2), total_hours=2, is_present=True
+            )
+            for hours in (0, 4)
+        ])
+        self.assertFalse(DailyAttendanceSummary.objects.exists())
+        migration = import_module('attendance.migrations.0016_backfill_daily_summaries')
+        migration.backfill_summaries(apps, None)
+        migration.backfill_summaries(apps, None)
+
+        summary = DailyAttendanceSummary.objects.get()
+        self.assertEqual((summary.organization, summary.sessions, summary.worked_seconds), (self.org, 2, 4 * 3600))
+        self.assertEqual(summary.last_out, self.start + timedelta(hours=6))
+
+    def test_report_range_filters_and_keyset_pages(self):
+        other = make_employee(self.org, username='employee2', employee_id='EMP002', project='Payroll')
+        for days_ago in range(5):
+            day = self.start - timedelta(days=days_ago)
+            for user in (self.user, other):
+                punch_in(user, now=day)
+                punch_out(user, now=day + timedelta(hours=8))
+
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        params = {'from': str((self.start - timedelta(days=4)).date()), 'to': str(self.start.date()), 'limit': 3}
+        seen, cursor = [], None
+        while True:
+            response = client.get('/api/attendance/admin/report/', {**params, **({'cursor': cursor} if cursor else {})})
+            self.assertLessEqual(len(response.data['results']), 3)
+            seen += [row['id'] for row in response.data['results']]
+            cursor = response.data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(len(seen), 10)
+        self.assertEqual(len(set(seen)), 10)
+
+        response = client.get('/api/attendance/admin/report/', {**params, 'project': 'Payroll', 'limit': 100})
+        self.assertEqual({row['user']['id'] for row in response.data['results']}, {other.pk})
+        self.assertEqual(client.get('/api/attendance/admin/report/', {'from': 'soon'}).status_code, 400)
+
+    def test_csv_export_streams_rows(self):
+        punch_in(self.user, now=self.start)
+        punch_out(self.user, now=self.start + timedelta(hours=8))
+        client = APIClient()
+        client.force_authenticate(self.admin)
+
+        response = client.get('/api/attendance/admin/report/export/')
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:2], ['Employee ID', 'Username'])
+        self.assertEqual(len(lines), 2)
+        self.assertIn('EMP001,employee1', lines[1])
+        self.assertIn(',8.00,1,Present', lines[1])
+
+    def test_xlsx_exports(self):
+        punch_in(self.user, now=self.start)
+        punch_out(self.user, now=self.start + timedelta(hours=8))
+        LeaveRequest.objects.create(
+            user=self.user, leave_type='full_day', start_date=self.start.date(),
+            end_date=self.start.date() + timedelta(days=1), reason='Family'
+        )
+        client = APIClient()
+        client.force_authenticate(self.admin)
+
+        report = client.get('/api/attendance/admin/report/export/xlsx/')
+        sheet = load_workbook(BytesIO(b''.join(report.streaming_content)), read_only=True).active
+        rows = list(sheet.values)
+        self.assertEqual(rows[0][0], 'Employee ID')
+        self.assertEqual(rows[1][:2], ('EMP001', 'employee1'))
+        self.assertEqual(rows[1][7], 8)
+
+        leaves = client.get('/api/attendance/admin/leave/export/xlsx/')
+        rows = list(load_workbook(BytesIO(b''.join(leaves.streaming_content)), read_only=True).active.values)
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][7], 2)
+
+
+class LeaveManagementTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Demo Company Ltd.', email='demo@company.com')
+        self.admin = make_employee(self.org, username='admin', role='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def add_employees(self, start, stop):
+        User.objects.bulk_create([
+            User(username=f'employee{i}', employee_id=f'EMP{i:05}', organization=self.org, role='employee')
+            for i in range(start, stop)
+        ])
+
+    def load(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/attendance/employees/leave-management/')
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+
+    def test_payload(self):
+        employee = make_employee(self.org, employee_id='EMP001')
+        base = timezone.now() - timedelta(days=10)
+        for days in range(7):
+            leave = LeaveRequest.objects.create(
+                user=employee, leave_type='sick', start_date=base.date(), end_date=base.date(), reason=f'#{days}'
+            )
+            LeaveRequest.objects.filter(pk=leave.pk).update(applied_on=base + timedelta(days=days))
+        punch_in(employee)
+
+        data, _ = self.load()
+        self.assertEqual(len(data), 1)
+        self.assertTrue(data[0]['is_clocked_in'])
+        self.assertEqual(data[0]['status'], 'Active')
+        self.assertEqual(data[0]['leave_balance'], {'total_allowed': 4, 'used_leaves': 0, 'remaining_leaves': 4})
+        self.assertEqual([leave['reason'] for leave in data[0]['recent_leave_requests']], ['#6', '#5', '#4', '#3', '#2'])
+        self.assertEqual(data[0]['recent_leave_requests'][0]['employee_id'], 'EMP001')
+
+    def test_constant_query_count(self):
+        self.add_employees(0, 10)
+        with CaptureQueriesContext(connection) as queries:
+            data, small = self.load()
+        self.assertEqual(len(data), 10)
+        self.assertTrue(all(query['sql'].startswith('SELECT') for query in queries.captured_queries))
+
+        self.add_employees(10, 5000)
+        data, large = self.load()
+        self.assertEqual(len(data), 5000)
+        self.assertEqual(large, small)
+
+
+class LeaveBalanceProvisioningTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Demo Company Ltd.', email='demo@company.com')
+        self.user = make_employee(self.org)
+        make_employee(self.org, username='left', is_active=False)
+        User.objects.create_user(username='unassigned')
+
+    def test_command_provisions_next_month_once(self):
+        out = StringIO()
+        call_command('provision_leave_balances', '--month', '2031-01', stdout=out)
+        self.assertIn('Provisioned 1 leave balances for 2031-01', out.getvalue())
+        balance = MonthlyLeaveBalance.objects.get(year=2031, month=1)
+        self.assertEqual((balance.user, balance.total_allowed, balance.remaining_leaves), (self.user, 4, 4))
+
+        MonthlyLeaveBalance.objects.filter(pk=balance.pk).update(used_leaves=1, remaining_leaves=3)
+        call_command('provision_leave_balances', '--month', '2031-01', stdout=out)
+        self.assertEqual(MonthlyLeaveBalance.objects.get(year=2031, month=1).used_leaves, 1)
+
+        call_command('provision_leave_balances', stdout=StringIO())
+        self.assertEqual(MonthlyLeaveBalance.objects.exclude(year=2031).count(), 1)
+
+    def test_balance_read_never_writes(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/attendance/leave/balance/')
+        self.assertEqual(response.data['remaining_leaves'], 4)
+        self.assertEqual(len(queries), 1)
+        self.assertFalse(MonthlyLeaveBalance.objects.exists())
+
+
+class ListPaginationTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Demo Company Ltd.', email='demo@company.com')
+        self.admin = make_employee(self.org, username='admin', role='admin')
+        self.user = make_employee(self.org, employee_id='EMP001', first_name='Asha')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        base = timezone.now() - timedelta(days=30)
+        for days in range(7):
+            leave = LeaveRequest.objects.create(
+                user=self.user, leave_type='sick', start_date=base.date(), end_date=base.date(), reason=f'#{days}'
+            )
+            # Two requests share each timestamp, so paging has to break ties on id
+            LeaveRequest.objects.filter(pk=leave.pk).update(applied_on=base + timedelta(days=days // 2))
+
+    def collect(self, url, params, client=None):
+        client = client or self.client
+        seen, cursor = [], None
+        while True:
+            response = client.get(url, {**params, **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            seen.extend(response.data['results'])
+            cursor = response.data['next_cursor']
+            if not cursor:
+                return seen
+
+    def test_keyset_pages_cover_every_row_once(self):
+        leaves = self.collect('/api/attendance/leave/requests/', {'limit': 2})
+        expected = list(LeaveRequest.objects.order_by('-applied_on', '-id').values_list('id', flat=True))
+        self.assertEqual([leave['id'] for leave in leaves], expected)
+
+        debug = self.client.get('/api/attendance/debug/organization-users/', {'limit': 5}).data
+        self.assertEqual([leave['id'] for leave in debug['leave_requests_in_org']], expected[:5])
+        rest = self.client.get('/api/attendance/debug/organization-users/', {'limit': 5, 'leaves_cursor': debug['leaves_next_cursor']}).data
+        self.assertEqual([leave['id'] for leave in rest['leave_requests_in_org']], expected[5:])
+        self.assertEqual(len(debug['all_users_in_org']), 2)
+
+    def test_admin_list_reads_the_organization_index_in_page_order(self):
+        other = Organization.objects.create(name='Other', email='other@company.com')
+        outsider = make_employee(other, username='outsider')
+        LeaveRequest.objects.create(user=outsider, leave_type='sick', start_date=date(2031, 1, 1), end_date=date(2031, 1, 1), reason='Other org')
+        self.assertFalse(LeaveRequest.objects.filter(organization__isnull=True).exists())
+
+        leaves = self.collect('/api/attendance/leave/requests/', {'limit': 3})
+        self.assertNotIn('Other org', [leave['reason'] for leave in leaves])
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/attendance/leave/requests/', {'limit': 3})
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {queries.captured_queries[-1]['sql']}")
+            plan = '\n'.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('leave_org_applied_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_migration_copies_the_requesters_organization(self):
+        LeaveRequest.objects.update(organization=None)
+        import_module('attendance.migrations.0017_leave_request_organization').copy_organizations(apps, None)
+        self.assertEqual(set(LeaveRequest.objects.values_list('organization', flat=True)), {self.org.pk})
+
+    def test_fields_trim_the_select(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/attendance/leave/requests/', {'fields': 'id,status,employee_name'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'status', 'employee_name'})
+        self.assertEqual(response.data['results'][0]['employee_name'], 'Asha ')
+        sql = queries.captured_queries[-1]['sql']
+        self.assertIn('"first_name"', sql)
+        self.assertNotIn('"reason"', sql)
+        self.assertNotIn('"email"', sql)
+
+        users = self.client.get('/api/auth/users/', {'fields': 'username,organization_name'})
+        self.assertEqual(users.data['results'], [{'username': 'employee1', 'organization_name': 'Demo Company Ltd.'}])
+
+    def test_bad_params(self):
+        self.assertEqual(self.client.get('/api/attendance/leave/requests/', {'fields': 'id,password'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/attendance/leave/requests/', {'cursor': 'bm90IGpzb24'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/attendance/notifications/', {'limit': 'ten'}).status_code, 400)
+
+    def test_default_page_sizes(self):
+        Notification.objects.bulk_create([
+            Notification(user=self.user, title=f'#{i}', message='') for i in range(25)
+        ])
+        client = APIClient()
+        client.force_authenticate(self.user)
+        page = client.get('/api/attendance/notifications/').data
+        self.assertEqual(len(page['results']), 20)
+        self.assertEqual(len(self.collect('/api/attendance/notifications/', {}, client)), 25)
+
+        orgs = self.client.get('/api/organizations/list/', {'fields': 'id,name'}).data
+        self.assertEqual(orgs, {'results': [{'id': self.org.pk, 'name': 'Demo Company Ltd.'}], 'next_cursor': None})
+
+
+class LeaveLedgerTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Demo Company Ltd.', email='demo@company.com')
+        self.admin = make_employee(self.org, username='admin', role='admin')
+        self.user = make_employee(self.org)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def leave(self, start, end, leave_type='full_day'):
+        return LeaveRequest.objects.create(
+            user=self.user, leave_type=leave_type, start_date=date.fromisoformat(start),
+            end_date=date.fromisoformat(end), reason='Family'
+        )
+
+    def balances(self):
+        return {
+            (b.year, b.month): (b.used_leaves, b.remaining_leaves)
+            for b in MonthlyLeaveBalance.objects.filter(user=self.user)
+        }
+
+    def test_leave_is_charged_to_the_months_it_spans(self):
+        leave = self.leave('2031-01-30', '2031-02-02')
+        self.client.patch(f'/api/attendance/leave/{leave.pk}/approve/')
+        self.client.patch(f'/api/attendance/leave/{leave.pk}/approve/')
+
+        self.assertEqual(
+            list(leave.ledger_entries.order_by('month').values_list('year', 'month', 'days')),
+            [(2031, 1, Decimal('2')), (2031, 2, Decimal('2'))]
+        )
+        self.assertEqual(self.balances(), {(2031, 1): (2, 2), (2031, 2): (2, 2)})
+
+        self.client.patch(f'/api/attendance/leave/{leave.pk}/reject/')
+        self.assertEqual(leave.ledger_entries.count(), 4)
+        self.assertEqual(self.balances(), {(2031, 1): (0, 4), (2031, 2): (0, 4)})
+
+    def test_half_day_and_rejecting_a_pending_leave(self):
+        half = self.leave('2031-03-03', '2031-03-03', 'half_day')
+        pending = self.leave('2031-03-10', '2031-03-11')
+        self.client.patch(f'/api/attendance/leave/{half.pk}/approve/')
+        self.client.patch(f'/api/attendance/leave/{pending.pk}/reject/')
+
+        self.assertEqual(self.balances(), {(2031, 3): (0.5, 3.5)})
+        self.assertFalse(pending.ledger_entries.exists())
+        pending.refresh_from_db()
+        self.assertEqual((pending.status, pending.approved_by), ('rejected', self.admin))
+
+    def test_rebuild_command_recomputes_from_the_ledger(self):
+        leave = self.leave('2031-04-01', '2031-04-03')
+        self.client.patch(f'/api/attendance/leave/{leave.pk}/approve/')
+        MonthlyLeaveBalance.objects.update(used_leaves=9, remaining_leaves=-5)
+        MonthlyLeaveBalance.objects.create(user=self.user, year=2031, month=5, used_leaves=2, remaining_leaves=2)
+        LeaveLedgerEntry.objects.filter(month=4).delete()
+        LeaveLedgerEntry.objects.create(leave_request=leave, user=self.user, year=2031, month=6, days=1)
+
+        out = StringIO()
+        call_command('rebuild_leave_balances', stdout=out)
+        self.assertIn('Rebuilt 3 leave balances', out.getvalue())
+        self.assertEqual(self.balances(), {(2031, 4): (0, 4), (2031, 5): (0, 4), (2031, 6): (1, 3)})
+
+    def test_migration_moves_pre_ledger_charges_to_the_leave_month(self):
+        # Before the ledger, a January leave approved in March was charged to March
+        leave = self.leave('2031-01-06', '2031-01-07')
+        LeaveRequest.objects.filter(pk=leave.pk).update(status='approved')
+        LeaveLedgerEntry.objects.create(leave_request=leave, user=self.user, year=2031, month=1, days=2)
+        MonthlyLeaveBalance.objects.create(user=self.user, year=2031, month=3, used_leaves=2, remaining_leaves=2)
+
+        import_module('attendance.migrations.0015_rebuild_leave_balances').rebuild_balances(apps, None)
+        self.assertEqual(self.balances(), {(2031, 1): (2, 2), (2031, 3): (0, 4)})
+        self.client.patch(f'/api/attendance/leave/{leave.pk}/reject/')
+        self.assertEqual(self.balances(), {(2031, 1): (0, 4), (2031, 3): (0, 4)})
+
+
+class ConcurrentLeaveApprovalTests(TransactionTestCase):
+    workers = 8
+
+    def test_parallel_approvals_do_not_lose_updates(self):
+        org = Organization.objects.create(name='Demo Company Ltd.', email='demo@company.com')
+        admin = make_employee(org, username='admin', role='admin')
+        user = make_employee(org)
+        leaves = [
+            LeaveRequest.objects.create(
+                user=user, leave_type='half_day', start_date=date(2031, 1, day), end_date=date(2031, 1, day), reason='Errand'
+            )
+            for day in range(1, self.workers + 1)
+        ]
+        barrier = threading.Barrier(self.workers)
+        codes, errors = [], []
+
+        def approve(leave):
+            client = APIClient()
+            client.force_authenticate(admin)
+            try:
+                barrier.wait()
+                codes.append(client.patch(f'/api/attendance/leave/{leave.pk}/approve/').status_code)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=approve, args=(leave,)) for leave in leaves]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(codes, [200] * self.workers)
+        balance = MonthlyLeaveBalance.objects.get(user=user, year=2031, month=1)
+        self.assertEqual((balance.used_leaves, balance.remaining_leaves), (4, 0))
+
+
+class BulkLeaveDecisionTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Demo Company Ltd.', email='demo@company.com')
+        self.admin = make_employee(self.org, username='admin', role='admin')
+        self.user = make_employee(self.org)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def leaves(self, count, user=None):
+        return [
+            LeaveRequest.objects.create(
+                user=user or self.user, leave_type='full_day', start_date=date(2031, 1, 2 * n + 1),
+                end_date=date(2031, 1, 2 * n + 1), reason='Family'
+            )
+            for n in range(count)
+        ]
+
+    def decide(self, action, ids):
+        return self.client.post('/api/attendance/leave/bulk/', {'action': action, 'ids': ids}, format='json')
+
+    def test_per_item_results(self):
+        pending = self.leaves(3)
+        approved = self.leaves(1)[0]
+        approve_leave_request(approved, self.admin)
+        other_org = Organization.objects.create(name='Other', email='other@company.com')
+        foreign = self.leaves(1, make_employee(other_org, username='outsider'))[0]
+
+        ids = [pending[0].pk, pending[1].pk, approved.pk, foreign.pk, 999999, pending[2].pk, pending[0].pk]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.decide('approve', ids)
+
+        self.assertEqual([result['status'] for result in response.data['results']], [
+            'approved', 'approved', 'unchanged', 'not_found', 'not_found', 'approved', 'unchanged'
+        ])
+        self.assertEqual(LeaveRequest.objects.filter(status='approved', approved_by=self.admin).count(), 4)
+        balance = MonthlyLeaveBalance.objects.get(user=self.user, year=2031, month=1)
+        self.assertEqual((balance.used_leaves, balance.remaining_leaves), (4, 0))
+        self.assertEqual(NotificationOutbox.objects.filter(user=self.user, notification_type='leave_approved').count(), 4)
+        foreign.refresh_from_db()
+        self.assertEqual(foreign.status, 'pending')
+
+    def test_reject_refunds_approved_leaves(self):
+        leaves = self.leaves(3)
+        self.decide('approve', [leaves[0].pk, leaves[1].pk])
+        response = self.decide('reject', [leave.pk for leave in leaves])
+
+        self.assertEqual([result['status'] for result in response.data['results']], ['rejected'] * 3)
+        balance = MonthlyLeaveBalance.objects.get(user=self.user, year=2031, month=1)
+        self.assertEqual((balance.used_leaves, balance.remaining_leaves), (0, 4))
+        self.assertEqual(LeaveLedgerEntry.objects.count(), 4)
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        def queries_for(leaves):
+            with CaptureQueriesContext(connection) as queries:
+                self.decide('approve', [leave.pk for leave in leaves])
+            return len(queries)
+
+        small = queries_for(self.leaves(2))
+        LeaveRequest.objects.all().delete()
+        self.assertEqual(queries_for(self.leaves(15)), small)
+
+    def test_validation(self):
+        self.assertEqual(self.decide('archive', [1]).status_code, 400)
+        self.assertEqual(self.decide('approve', []).status_code, 400)
+        self.assertEqual(self.decide('approve', ['1']).status_code, 400)
+        self.assertEqual(self.decide('approve', list(range(1, 1002))).status_code, 400)
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.decide('approve', [1]).status_code, 403)
+
+
+class LeaveStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.org = Organization.objects.create(name='Demo Company Ltd.', email='demo@company.com')
+        self.admin = make_employee(self.org, username='admin', role='admin')
+        self.user = make_employee(self.org)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.url = f'/api/attendance/employee/{self.user.pk}/leaves/'
+        for leave_type, start, end, leave_status in [
+            ('full_day', '2031-01-05', '2031-01-07', 'approved'),
+            ('sick', '2031-02-01', '2031-02-01', 'approved'),
+            ('half_day', '2031-02-03', '2031-02-03', 'approved'),
+            ('full_day', '2031-03-01', '2031-03-02', 'pending'),
+            ('sick', '2031-03-09', '2031-03-09', 'rejected'),
+        ]:
+            LeaveRequest.objects.create(
+                user=self.user, leave_type=leave_type, start_date=date.fromisoformat(start),
+                end_date=date.fromisoformat(end), status=leave_status, reason='Family'
+            )
+
+    def test_statistics_and_cache(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['statistics'], {
+            'total_days_taken': 5,
+            'leave_by_type': {'full_day': 3, 'sick': 1, 'half_day': 1},
+            'total_requests': 5,
+            'approved_requests': 3,
+            'pending_requests': 1,
+        })
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries.captured_queries))
+
+    def test_leave_writes_invalidate_the_cache(self):
+        self.client.get(self.url)
+        pending = LeaveRequest.objects.get(status='pending')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/attendance/leave/{pending.pk}/approve/')
+        self.assertEqual(self.client.get(self.url).data['statistics']['total_days_taken'], 7)
+
+        employee = APIClient()
+        employee.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            employee.post('/api/attendance/leave/request/', {
+                'leave_type': 'sick', 'start_date': '2031-04-01', 'end_date': '2031-04-01', 'reason': 'Flu'
+            })
+        self.assertEqual(self.client.get(self.url).data['statistics']['pending_requests'], 1)
+        self.assertEqual(self.client.get(self.url).data['statistics']['total_requests'], 6)
+
+    def test_history_is_paginated(self):
+        first = self.client.get(self.url, {'limit': 3}).data
+        second = self.client.get(self.url, {'limit': 3, 'cursor': first['next_cursor']}).data
+        self.assertEqual(len(first['leave_history']), 3)
+        self.assertEqual(len(second['leave_history']), 2)
+        self.assertIsNone(second['next_cursor'])
+
+
+class LeaveCalendarTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Demo Company Ltd.', email='demo@company.com')
+        self.admin = make_employee(self.org, username='admin', role='admin')
+        self.user = make_employee(self.org)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def leave(self, start, end, user=None):
+        return LeaveRequest.objects.create(
+            user=user or self.user, leave_type='full_day', start_date=date.fromisoformat(start),
+            end_date=date.fromisoformat(end), reason='Family'
+        )
+
+    def calendar(self, **params):
+        return self.client.get('/api/attendance/leave/calendar/', params)
+
+    def test_approve_and_reject_maintain_the_calendar(self):
+        leave = self.leave('2031-01-30', '2031-02-02')
+        self.client.patch(f'/api/attendance/leave/{leave.pk}/approve/')
+        days = self.calendar(**{'from': '2031-01-29', 'to': '2031-02-05'}).data['days']
+        self.assertEqual(sorted(days), ['2031-01-30', '2031-01-31', '2031-02-01', '2031-02-02'])
+        self.assertEqual(days['2031-02-01'][0]['user']['username'], 'employee1')
+
+        self.client.patch(f'/api/attendance/leave/{leave.pk}/reject/')
+        self.assertEqual(LeaveDay.objects.count(), 0)
+
+        others = [self.leave('2031-03-02', '2031-03-03'), self.leave('2031-03-03', '2031-03-03', make_employee(self.org, 'employee2'))]
+        ids = [leave.pk for leave in others]
+        self.client.post('/api/attendance/leave/bulk/', {'action': 'approve', 'ids': ids}, format='json')
+        days = self.calendar(**{'from': '2031-03-01', 'to': '2031-03-31'}).data['days']
+        self.assertEqual([entry['user']['username'] for entry in days['2031-03-03']], ['employee1', 'employee2'])
+        self.client.post('/api/attendance/leave/bulk/', {'action': 'reject', 'ids': ids}, format='json')
+        self.assertEqual(LeaveDay.objects.count(), 0)
+
+    def test_employees_only_see_their_own_leave(self):
+        approve_leave_request(self.leave('2031-01-06', '2031-01-06'), self.admin)
+        approve_leave_request(self.leave('2031-01-06', '2031-01-06', make_employee(self.org, 'employee2')), self.admin)
+        self.assertEqual(len(self.calendar(**{'from': '2031-01-06', 'to': '2031-01-06'}).data['days']['2031-01-06']), 2)
+        self.assertEqual(len(self.calendar(**{'from': '2031-01-06', 'to': '2031-01-06', 'employee': self.user.pk}).data['days']['2031-01-06']), 1)
+        self.client.force_authenticate(self.user)
+        days = self.calendar(**{'from': '2031-01-06', 'to': '2031-01-06', 'employee': self.admin.pk}).data['days']
+        self.assertEqual([entry['user']['id'] for entry in days['2031-01-06']], [self.user.pk])
+
+    def test_validation(self):
+        self.assertEqual(self.calendar(**{'from': '2031-13-01'}).status_code, 400)
+        self.assertEqual(self.calendar(**{'from': '2031-02-01', 'to': '2031-01-01'}).status_code, 400)
+        self.assertEqual(self.calendar(**{'from': '2031-01-01', 'to': '2032-01-02'}).status_code, 400)
+        self.assertEqual(self.calendar(employee='someone').status_code, 400)
+        response = self.calendar()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['to'] - response.data['from']).days, 6)
+
+    def test_range_reads_use_the_org_date_index(self):
+        employees = User.objects.bulk_create([
+            User(username=f'calendar-{n}', role='employee', organization=self.org) for n in range(5000)
+        ])
+        leaves = LeaveRequest.objects.bulk_create([
+            LeaveRequest(
+                user=employee, leave_type='full_day', status='approved', reason='Family',
+                start_date=date(2031, 1, 1) + timedelta(days=n % 360), end_date=date(2031, 1, 1) + timedelta(days=n % 360 + 2)
+            )
+            for n, employee in enumerate(employees)
+        ])
+        LeaveDay.objects.bulk_create([
+            LeaveDay(leave_request=leave, user=leave.user, organization=self.org, date=leave.start_date + timedelta(days=offset), leave_type='full_day')
+            for leave in leaves for offset in range(3)
+        ])
+
+        plan = LeaveDay.objects.filter(
+            organization=self.org, date__gte=date(2031, 3, 3), date__lte=date(2031, 3, 9)
+        ).explain()
+        self.assertIn('leaveday_org_date_idx', plan)
+        with self.assertNumQueries(1):
+            response = self.calendar(**{'from': '2031-03-03', 'to': '2031-03-09'})
+        self.assertEqual(sum(len(day) for day in response.data['days'].values()), 7 * 3 * 14)
+
+
+class NotificationOutboxTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Demo Company Ltd.', email='demo@company.com')
+        self.admin = make_employee(self.org, username='admin', role='admin')
+        self.user = make_employee(self.org)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def leave(self):
+        return LeaveRequest.objects.create(
+            user=self.user, leave_type='sick', start_date=date(2031, 1, 6), end_date=date(2031, 1, 6), reason='Flu'
+        )
+
+    def test_decisions_queue_notifications_for_the_worker(self):
+        leave = self.leave()
+        self.client.patch(f'/api/attendance/leave/{leave.pk}/approve/')
+        self.assertEqual(Notification.objects.count(), 0)
+        self.assertEqual(NotificationOutbox.objects.get().status, 'pending')
+
+        call_command('deliver_notifications', stdout=StringIO())
+        notification = Notification.objects.get()
+        self.assertEqual((notification.user, notification.notification_type), (self.user, 'leave_approved'))
+        self.assertEqual(NotificationOutbox.objects.get().status, 'delivered')
+
+    def test_rolled_back_decisions_send_nothing(self):
+        with transaction.atomic():
+            approve_leave_request(self.leave(), self.admin)
+            transaction.set_rollback(True)
+        self.assertEqual(NotificationOutbox.objects.count(), 0)
+
+    def test_failures_are_retried_then_dead_lettered(self):
+        def flaky(messages):
+            deliver_in_app(messages)
+            if any(message.title == 'poison' for message in messages):
+                raise RuntimeError('channel down')
+
+        deliver_in_app = CHANNELS['in_app']
+        NotificationOutbox.objects.bulk_create([
+            NotificationOutbox(user=self.user, title=title, message='') for title in ('one', 'poison', 'two')
+        ])
+        with mock.patch.dict(CHANNELS, {'in_app': flaky}), mock.patch('attendance.events.publish') as publish_event:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(drain_outbox(max_attempts=2), (3, 2, 0))
+            # Only what was delivered is announced, not the rolled-back attempts
+            self.assertEqual([call.args[2]['title'] for call in publish_event.call_args_list], ['one', 'two'])
+            poison = NotificationOutbox.objects.get(title='poison')
+            self.assertEqual((poison.status, poison.attempts), ('pending', 1))
+            self.assertIn('channel down', poison.last_error)
+            self.assertEqual(drain_outbox(max_attempts=2), (0, 0, 0))
+
+            NotificationOutbox.objects.filter(pk=poison.pk).update(available_at=timezone.now())
+            with self.assertLogs('attendance.outbox', 'ERROR'):
+                self.assertEqual(drain_outbox(max_attempts=2), (1, 0, 1))
+        self.assertEqual(NotificationOutbox.objects.get(title='poison').status, 'dead')
+        self.assertEqual(sorted(Notification.objects.values_list('title', flat=True)), ['one', 'two'])
+
+        self.assertEqual(requeue_dead(), 1)
+        self.assertEqual(drain_outbox(), (1, 1, 0))
+
+
+class NotificationInboxTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Demo Company Ltd.', email='demo@company.com')
+        self.user = make_employee(self.org)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def deliver(self, count):
+        NotificationOutbox.objects.bulk_create([
+            NotificationOutbox(user=self.user, title=f'#{n}', message='') for n in range(count)
+        ])
+        drain_outbox()
+        return list(Notification.objects.filter(user=self.user).order_by('id'))
+
+    def unread(self):
+        with self.assertNumQueries(1):
+            return self.client.get('/api/attendance/notifications/unread-count/').data['unread']
+
+    def test_counter_follows_delivery_and_reads(self):
+        self.assertEqual(self.unread(), 0)
+        notifications = self.deliver(3)
+        self.assertEqual(self.unread(), 3)
+
+        url = f'/api/attendance/notifications/{notifications[0].pk}/read/'
+        self.assertEqual(self.client.patch(url).status_code, 200)
+        self.assertEqual(self.client.patch(url).status_code, 200)
+        self.assertEqual(self.unread(), 2)
+        self.assertEqual(self.client.patch('/api/attendance/notifications/999999/read/').status_code, 404)
+
+        outsider = make_employee(self.org, 'employee2')
+        self.client.force_authenticate(outsider)
+        self.assertEqual(self.client.patch(f'/api/attendance/notifications/{notifications[1].pk}/read/').status_code, 404)
+        self.client.force_authenticate(self.user)
+        self.assertEqual(NotificationCounter.objects.get(user=self.user).unread, 2)
+
+    def test_mark_all_read_is_one_update(self):
+        self.deliver(30)
+        with self.assertNumQueries(4):
+            response = self.client.patch('/api/attendance/notifications/read-all/')
+        self.assertEqual(response.data['marked_read'], 30)
+        self.assertFalse(Notification.objects.filter(user=self.user, is_read=False).exists())
+        self.assertEqual(self.unread(), 0)
+
+    def test_unread_filter_pages_with_a_cursor(self):
+        notifications = self.deliver(5)
+        Notification.objects.filter(pk__in=[notifications[0].pk, notifications[3].pk]).update(is_read=True)
+        first = self.client.get('/api/attendance/notifications/', {'unread': 1, 'limit': 2}).data
+        second = self.client.get('/api/attendance/notifications/', {'unread': 1, 'limit': 2, 'cursor': first['next_cursor']}).data
+        self.assertEqual([row['title'] for row in first['results'] + second['results']], ['#4', '#2', '#1'])
+        self.assertIsNone(second['next_cursor'])
+
+
+class NotificationRetentionTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Demo Company Ltd.', email='demo@company.com')
+        self.user = make_employee(self.org)
+        old = timezone.now() - timedelta(days=120)
+        notifications = Notification.objects.bulk_create(
+            [Notification(user=self.user, title=f'#{n}', message='', is_read=n % 3 != 0) for n in range(30)]
+        )
+        Notification.objects.filter(pk__in=[notification.pk for notification in notifications[:20]]).update(created_at=old)
+
+    def purge(self, *args):
+        out = StringIO()
+        call_command('purge_notifications', '--batch-size', '4', *args, stdout=out)
+        return out.getvalue()
+
+    def test_deletes_old_read_notifications_in_batches(self):
+        with CaptureQueriesContext(connection) as queries:
+            output = self.purge()
+        self.assertIn('Deleted 13 read notifications older than 90 days', output)
+        self.assertIn('rows/sec', output)
+        deletes = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 4)
+        # Old unread notifications and recent ones stay
+        self.assertEqual(Notification.objects.count(), 17)
+        self.assertFalse(Notification.objects.filter(is_read=True, created_at__lt=timezone.now() - timedelta(days=90)).exists())
+        self.assertEqual(NotificationArchive.objects.count(), 0)
+
+    def test_archive_and_dry_run(self):
+        self.assertIn('13 read notifications', self.purge('--dry-run'))
+        self.assertEqual(Notification.objects.count(), 30)
+        self.purge('--archive', '--days', '200')
+        self.assertEqual(Notification.objects.count(), 30)
+        self.purge('--archive')
+        self.assertEqual(NotificationArchive.objects.count(), 13)
+        self.assertEqual(set(NotificationArchive.objects.values_list('user', flat=True)), {self.user.pk})
@@ -4,6 +4,8 @@ from . import views
 urlpatterns = [
     path('clock-in/', views.clock_in, name='clock_in'),
     path('clock-out/', views.clock_out, name='clock_out'),
+    path('break/start/', views.break_start, name='break_start'),
+    path('break/end/', views.break_end, name='break_end'),
     path('status/', views.attendance_status, name='attendance_status'),
     path('today/', views.attendance_today, name='attendance_today'),
     path('history/', views.attendance_history, name='attendance_history'),
@@ -14,9 +16,18 @@ urlpatterns = [
     path('debug/organization-users/', views.debug_organization_users, name='debug_organization_users'),
     path('leave/<int:leave_id>/approve/', views.approve_leave, name='approve_leave'),
     path('leave/<int:leave_id>/reject/', views.reject_leave, name='reject_leave'),
+    path('leave/bulk/', views.bulk_leave_decision, name='bulk_leave_decision'),
+    path('leave/calendar/', views.leave_calendar, name='leave_calendar'),
     path('admin/report/', views.admin_attendance_report, name='admin_report'),
+    path('admin/report/export/', views.admin_attendance_report_export, name='admin_report_export'),
+    path('admin/report/export/xlsx/', views.admin_attendance_report_xlsx, name='admin_report_xlsx'),
+    path('admin/leave/export/xlsx/', views.leave_history_xlsx, name='leave_history_xlsx'),
     path('notifications/', views.notifications, name='notifications'),
+    path('events/', views.event_stream, name='event_stream'),
+    path('events/batch/', views.ingest_clock_events, name='ingest_clock_events'),
     path('notifications/<int:notification_id>/read/', views.mark_notification_read, name='mark_notification_read'),
+    path('notifications/read-all/', views.mark_all_notifications_read, name='mark_all_notifications_read'),
+    path('notifications/unread-count/', views.notification_unread_count, name='notification_unread_count'),
     path('employee/<int:employee_id>/leaves/', views.employee_leave_history, name='employee_leave_history'),
 
 ]
\ No newline at end of file
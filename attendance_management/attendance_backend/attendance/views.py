@@ -1,37 +1,45 @@
+import asyncio
+import json
+from collections import defaultdict
+from asgiref.sync import sync_to_async
 from rest_framework import generics, permissions, status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.response import Response
+from rest_framework_simplejwt.exceptions import InvalidToken
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
-from django.db.models import Sum
-from datetime import datetime, timedelta
-from .models import AttendanceRecord, BreakRecord, LeaveRequest, MonthlyLeaveBalance, Notification
+from datetime import date, datetime, timedelta
+from accounts.authentication import ClaimsJWTAuthentication
+from accounts.thumbnails import picture_url
+from .models import AttendanceRecord, BreakRecord, LeaveRequest, Notification
 from .serializers import AttendanceRecordSerializer, BreakRecordSerializer, LeaveRequestSerializer, MonthlyLeaveBalanceSerializer, NotificationSerializer
+from .punch import end_break, punch_in, punch_out, start_break
+from .presence import get_presence
+from .events import get_broker
+from .ingest import ingest_events
+from .inbox import mark_all_read, mark_read, unread_count
+from .leave_calendar import calendar_days, calendar_queryset, parse_calendar_range
+from .leave_stats import get_leave_stats, invalidate_leave_stats_on_commit
+from .leaves import DECISIONS, MAX_BULK_DECISIONS, approve_leave_request, decide_leave_requests, employees_with_leave_info, month_balance, reject_leave_request
+from .exports import LEAVE_HEADER, XLSX_CONTENT_TYPE, leave_history_queryset, leave_xlsx_rows, report_xlsx_rows, write_xlsx
+from .pagination import keyset_page, paginate, parse_limit
+from .reports import REPORT_HEADER, parse_report_filters, report_csv_lines, report_page, report_queryset
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def clock_in(request):
     try:
-        today = timezone.now().date()
-        
-        # Check if user is already clocked in (no clock out yet)
-        existing_session = AttendanceRecord.objects.filter(
-            user=request.user, 
-            date=today,
-            clock_in__isnull=False,
-            clock_out__isnull=True
-        ).first()
+        # Single INSERT; the open-session constraint rejects a second clock-in
+        attendance = punch_in(request.user)
         
-        if existing_session:
+        if attendance is None:
             return Response({'error': 'Already clocked in. Please clock out first.'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Create new attendance session
-        attendance = AttendanceRecord.objects.create(
-            user=request.user,
-            date=today,
-            clock_in=timezone.now(),
-            is_present=True
-        )
-        
         return Response({'message': 'Clocked in successfully', 'time': attendance.clock_in})
     
     except Exception as e:
@@ -40,48 +48,55 @@ def clock_in(request):
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def clock_out(request):
-    today = timezone.now().date()
+    # Single UPDATE closing the open session, with total hours computed in SQL
+    closed = punch_out(request.user)
     
-    # Find the most recent clock-in without clock-out
-    attendance = AttendanceRecord.objects.filter(
-        user=request.user, 
-        date=today,
-        clock_in__isnull=False,
-        clock_out__isnull=True
-    ).order_by('-clock_in').first()
-    
-    if not attendance:
+    if closed is None:
         return Response({'error': 'No active clock-in session found'}, status=status.HTTP_400_BAD_REQUEST)
     
-    attendance.clock_out = timezone.now()
+    clock_out_time, total_hours = closed
+    return Response({'message': 'Clocked out successfully', 'time': clock_out_time, 'total_hours': total_hours})
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def break_start(request):
+    break_record = start_break(request.user)
+    
+    if break_record is None:
+        return Response({'error': 'No active clock-in session found'}, status=status.HTTP_400_BAD_REQUEST)
+    if break_record is False:
+        return Response({'error': 'Already on a break. Please end it first.'}, status=status.HTTP_400_BAD_REQUEST)
     
-    # Calculate total hours for this session
-    total_time = attendance.clock_out - attendance.clock_in
-    break_time = attendance.breaks.aggregate(Sum('break_duration'))['break_duration__sum'] or 0
-    attendance.total_hours = (total_time.total_seconds() / 3600) - float(break_time)
+    return Response({'message': 'Break started', 'time': break_record.break_start})
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def break_end(request):
+    attendance = end_break(request.user)
     
-    attendance.save()
+    if attendance is None:
+        return Response({'error': 'No active break found'}, status=status.HTTP_400_BAD_REQUEST)
     
-    return Response({'message': 'Clocked out successfully', 'time': attendance.clock_out, 'total_hours': attendance.total_hours})
+    return Response({'message': 'Break ended', 'break_seconds': attendance.break_seconds})
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def attendance_status(request):
     """Get current attendance status to determine which button to show"""
-    today = timezone.now().date()
-    
-    # Check if user has an active session (clocked in but not out)
-    active_session = AttendanceRecord.objects.filter(
-        user=request.user,
-        date=today,
-        clock_in__isnull=False,
-        clock_out__isnull=True
-    ).first()
+    # Answered from the presence cache; the database is only hit on a miss
+    state = get_presence(request.user.pk)
+    
+    data = {
+        'is_clocked_in': state['active_session'] is not None,
+        'is_on_break': state['break_start'] is not None,
+        'break_start': state['break_start'],
+        'active_session': state['active_session'],
+    }
     
-    return Response({
-        'is_clocked_in': bool(active_session),
-        'active_session': AttendanceRecordSerializer(active_session).data if active_session else None,
-        'debug_info': {
+    # Debug counters cost two extra queries, so they are opt-in
+    if request.query_params.get('debug'):
+        today = timezone.now().date()
+        data['debug_info'] = {
             'user_id': request.user.id,
             'today': str(today),
             'total_records_today': AttendanceRecord.objects.filter(user=request.user, date=today).count(),
@@ -89,13 +104,15 @@ def attendance_status(request):
                 user=request.user, date=today, clock_in__isnull=False, clock_out__isnull=True
             ).count()
         }
-    })
+    
+    return Response(data)
 
 @api_view(['GET'])
+@authentication_classes([ClaimsJWTAuthentication])
 @permission_classes([permissions.IsAuthenticated])
 def attendance_today(request):
     today = timezone.now().date()
-    attendance_records = AttendanceRecord.objects.filter(user=request.user, date=today).order_by('clock_in')
+    attendance_records = AttendanceRecord.objects.filter(user_id=request.user.pk, date=today).order_by('clock_in')
     
     if not attendance_records.exists():
         return Response({'message': 'No attendance record for today'})
@@ -104,29 +121,59 @@ def attendance_today(request):
     return Response(serializer.data)
 
 @api_view(['GET'])
+@authentication_classes([ClaimsJWTAuthentication])
 @permission_classes([permissions.IsAuthenticated])
 def attendance_history(request):
-    records = AttendanceRecord.objects.filter(user=request.user).order_by('-date')[:30]
-    serializer = AttendanceRecordSerializer(records, many=True)
-    return Response(serializer.data)
+    records = AttendanceRecord.objects.filter(user_id=request.user.pk)
+    try:
+        return Response(paginate(request, records, AttendanceRecordSerializer, ('-date', '-id'), default_limit=30))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def ingest_clock_events(request):
+    """Store a batch of buffered clock events from badge terminals and kiosks"""
+    if request.user.role != 'admin':
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    if not request.user.organization:
+        return Response({'error': 'No organization assigned'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    events = request.data.get('events') if isinstance(request.data, dict) else request.data
+    if not isinstance(events, list):
+        return Response({'error': 'Expected a list of events'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    max_events = getattr(settings, 'ATTENDANCE_BATCH_MAX_EVENTS', 50000)
+    if len(events) > max_events:
+        return Response({'error': f'At most {max_events} events per batch'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        results = ingest_events(request.user.organization, events)
+    except IntegrityError:
+        # A live punch opened a session while the batch was being paired
+        return Response({'error': 'Conflicting clock-in detected, please retry the batch'}, status=status.HTTP_409_CONFLICT)
+    
+    summary = defaultdict(int)
+    for result in results:
+        summary[result['status']] += 1
+    
+    return Response({'processed': len(results), 'summary': summary, 'results': results})
 
 class LeaveRequestCreateView(generics.CreateAPIView):
     serializer_class = LeaveRequestSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        serializer.save(user=self.request.user, organization=self.request.user.organization)
+        invalidate_leave_stats_on_commit([self.request.user.pk])
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def leave_balance(request):
     now = timezone.now()
-    balance, created = MonthlyLeaveBalance.objects.get_or_create(
-        user=request.user,
-        year=now.year,
-        month=now.month,
-        defaults={'total_allowed': 4, 'used_leaves': 0, 'remaining_leaves': 4}
-    )
+    # Balances are provisioned ahead of the month; reading one never writes
+    balance = month_balance(request.user, now.year, now.month)
     serializer = MonthlyLeaveBalanceSerializer(balance)
     return Response(serializer.data)
 
@@ -140,57 +187,90 @@ def admin_attendance_report(request):
     if not request.user.organization:
         return Response({'error': 'No organization assigned'}, status=status.HTTP_400_BAD_REQUEST)
     
-    from django.db.models import Sum
-    from collections import defaultdict
+    try:
+        filters = parse_report_filters(request.query_params)
+        rows = report_queryset(request.user.organization, **filters)
+        report_data, next_cursor = report_page(rows, request.query_params.get('cursor'), parse_limit(request.query_params))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
-    now = timezone.now()
-    records = AttendanceRecord.objects.filter(
-        date__year=now.year,
-        date__month=now.month,
-        user__organization=request.user.organization,
-        user__is_active=True
-    ).select_related('user').order_by('user', 'date', 'clock_in')
-    
-    # Group records by user and date
-    grouped_data = defaultdict(lambda: defaultdict(list))
-    for record in records:
-        grouped_data[record.user][record.date].append(record)
-    
-    # Create aggregated report
-    report_data = []
-    for user, dates in grouped_data.items():
-        for date, day_records in dates.items():
-            # Calculate total hours for the day
-            total_hours = sum(float(record.total_hours or 0) for record in day_records)
-            
-            # Get first clock in and last clock out of the day
-            first_clock_in = min(record.clock_in for record in day_records if record.clock_in)
-            last_clock_out = max(record.clock_out for record in day_records if record.clock_out) if any(record.clock_out for record in day_records) else None
-            
-            # Check if user is present (any session shows present)
-            is_present = any(record.is_present for record in day_records)
-            
-            report_data.append({
-                'id': f"{user.id}_{date}",
-                'user': {
-                    'id': user.id,
-                    'username': user.username,
-                    'first_name': user.first_name,
-                    'last_name': user.last_name,
-                    'employee_id': user.employee_id
-                },
-                'date': date,
-                'clock_in': first_clock_in,
-                'clock_out': last_clock_out,
-                'total_hours': round(total_hours, 2),
-                'is_present': is_present,
-                'sessions_count': len(day_records)
-            })
+    return Response({
+        'from': filters['date_from'],
+        'to': filters['date_to'],
+        'results': report_data,
+        'next_cursor': next_cursor
+    })
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def admin_attendance_report_export(request):
+    """Stream the attendance report as CSV for the same filters as the report"""
+    if request.user.role != 'admin':
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
     
-    # Sort by date (newest first) then by user
-    report_data.sort(key=lambda x: (x['date'], x['user']['username']), reverse=True)
+    if not request.user.organization:
+        return Response({'error': 'No organization assigned'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        filters = parse_report_filters(request.query_params)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    rows = report_queryset(request.user.organization, **filters)
+    response = StreamingHttpResponse(report_csv_lines(rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="attendance_report_{filters["date_from"]}_{filters["date_to"]}.csv"'
+    return response
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def admin_attendance_report_xlsx(request):
+    """Download the attendance report (current month by default) as an Excel workbook"""
+    if request.user.role != 'admin':
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    if not request.user.organization:
+        return Response({'error': 'No organization assigned'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        filters = parse_report_filters(request.query_params)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    rows = report_queryset(request.user.organization, **filters)
+    workbook = write_xlsx('Attendance', REPORT_HEADER, report_xlsx_rows(rows))
+    return FileResponse(
+        workbook,
+        as_attachment=True,
+        filename=f'attendance_report_{filters["date_from"]}_{filters["date_to"]}.xlsx',
+        content_type=XLSX_CONTENT_TYPE
+    )
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def leave_history_xlsx(request):
+    """Download the organization's leave history as an Excel workbook"""
+    if request.user.role != 'admin':
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    if not request.user.organization:
+        return Response({'error': 'No organization assigned'}, status=status.HTTP_400_BAD_REQUEST)
     
-    return Response(report_data)
+    try:
+        date_from = date.fromisoformat(request.query_params['from']) if request.query_params.get('from') else None
+        date_to = date.fromisoformat(request.query_params['to']) if request.query_params.get('to') else None
+        employee = int(request.query_params['employee']) if request.query_params.get('employee') else None
+    except ValueError:
+        return Response({'error': 'from/to must be YYYY-MM-DD dates and employee a user id'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    leaves = leave_history_queryset(request.user.organization, date_from, date_to, employee)
+    workbook = write_xlsx('Leave History', LEAVE_HEADER, leave_xlsx_rows(leaves))
+    return FileResponse(workbook, as_attachment=True, filename='leave_history.xlsx', content_type=XLSX_CONTENT_TYPE)
+
+LEAVE_ORDERING = ('-applied_on', '-id')
+LEAVE_FIELD_SOURCES = {
+    'employee_name': ['user__first_name', 'user__last_name'],
+    'employee_id': ['user__employee_id'],
+}
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
@@ -199,15 +279,18 @@ def leave_requests(request):
         return Response({'error': 'No organization assigned'}, status=status.HTTP_400_BAD_REQUEST)
     
     if request.user.role == 'admin':
+        # Driven by leave_org_applied_idx in page order; users are joined per row
         requests = LeaveRequest.objects.filter(
-            user__organization=request.user.organization,
+            organization=request.user.organization,
             user__is_active=True
         ).select_related('user')
     else:
-        requests = LeaveRequest.objects.filter(user=request.user)
+        requests = LeaveRequest.objects.filter(user=request.user).select_related('user')
     
-    serializer = LeaveRequestSerializer(requests, many=True)
-    return Response(serializer.data)
+    try:
+        return Response(paginate(request, requests, LeaveRequestSerializer, LEAVE_ORDERING, LEAVE_FIELD_SOURCES))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 # @api_view(['GET'])
 # @permission_classes([permissions.IsAuthenticated])
@@ -281,43 +364,14 @@ def employees_leave_management(request):
     if not request.user.organization:
         return Response({'error': 'No organization assigned'}, status=status.HTTP_400_BAD_REQUEST)
     
-    from django.contrib.auth import get_user_model
-    User = get_user_model()
-    
-    employees = User.objects.filter(
-        organization=request.user.organization,
-        role='employee',
-        is_active=True
-    ).prefetch_related('leaverequest_set')
+    # Fixed number of queries however many employees the organization has
+    employees = employees_with_leave_info(request.user.organization, timezone.now().date())
     
     employee_data = []
-    today = timezone.now().date()
     
     for employee in employees:
-        # Get recent leave requests
-        recent_leaves = employee.leaverequest_set.all()[:5]
-        
-        # Get current month leave balance
-        now = timezone.now()
-        balance, _ = MonthlyLeaveBalance.objects.get_or_create(
-            user=employee,
-            year=now.year,
-            month=now.month,
-            defaults={'total_allowed': 4, 'used_leaves': 0, 'remaining_leaves': 4}
-        )
-        
-        # Check if employee is currently clocked in
-        is_clocked_in = AttendanceRecord.objects.filter(
-            user=employee,
-            date=today,
-            clock_in__isnull=False,
-            clock_out__isnull=True
-        ).exists()
-        
-        # Build full URL for profile picture
-        profile_picture_url = None
-        if employee.profile_picture:
-            profile_picture_url = request.build_absolute_uri(employee.profile_picture.url)
+        balance = employee.current_balance
+        is_clocked_in = employee.is_clocked_in
         
         employee_data.append({
             'id': employee.id,
@@ -329,7 +383,8 @@ def employees_leave_management(request):
             'email': employee.email,
             'designation': employee.designation,
             'project': employee.project,
-            'profile_picture': profile_picture_url,  # Use full URL
+            # Full URL of the avatar-sized thumbnail, not the original upload
+            'profile_picture': picture_url(request, employee, 'small'),
             'status': 'Active' if is_clocked_in else 'Inactive',
             'is_clocked_in': is_clocked_in,
             'leave_balance': {
@@ -337,7 +392,7 @@ def employees_leave_management(request):
                 'used_leaves': balance.used_leaves,
                 'remaining_leaves': balance.remaining_leaves
             },
-            'recent_leave_requests': LeaveRequestSerializer(recent_leaves, many=True).data
+            'recent_leave_requests': LeaveRequestSerializer(employee.recent_leaves, many=True).data
         })
     
     return Response(employee_data)
@@ -365,8 +420,26 @@ def debug_organization_users(request):
     }
     
     if request.user.organization:
-        # Get all users in the same organization
-        org_users = User.objects.filter(organization=request.user.organization)
+        try:
+            limit = parse_limit(request.query_params)
+            # Users in the same organization
+            org_users, debug_info['users_next_cursor'] = keyset_page(
+                User.objects.filter(organization=request.user.organization).only(
+                    'username', 'role', 'is_active', 'employee_id', 'organization'
+                ),
+                ('id',), request.query_params.get('users_cursor'), limit
+            )
+            # Leave requests in the organization
+            leave_requests, debug_info['leaves_next_cursor'] = keyset_page(
+                LeaveRequest.objects.filter(organization=request.user.organization).select_related('user').only(
+                    'leave_type', 'status', 'start_date', 'applied_on',
+                    'user__username', 'user__employee_id', 'user__is_active'
+                ),
+                LEAVE_ORDERING, request.query_params.get('leaves_cursor'), limit
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
         for user in org_users:
             debug_info['all_users_in_org'].append({
                 'id': user.id,
@@ -374,14 +447,9 @@ def debug_organization_users(request):
                 'role': user.role,
                 'is_active': user.is_active,
                 'employee_id': user.employee_id,
-                'organization_id': user.organization.id if user.organization else None
+                'organization_id': user.organization_id
             })
         
-        # Get all leave requests in the organization
-        leave_requests = LeaveRequest.objects.filter(
-            user__organization=request.user.organization
-        ).select_related('user')
-        
         for leave in leave_requests:
             debug_info['leave_requests_in_org'].append({
                 'id': leave.id,
@@ -404,38 +472,9 @@ def approve_leave(request, leave_id):
     
     try:
         leave_request = LeaveRequest.objects.get(id=leave_id)
-        leave_request.status = 'approved'
-        leave_request.approved_by = request.user
-        leave_request.save()
-        
-        # Calculate leave days
-        requested_days = (leave_request.end_date - leave_request.start_date).days + 1
-        if leave_request.leave_type == 'half_day':
-            requested_days = 0.5
-        
-        # Update leave balance
-        now = timezone.now()
-        balance, _ = MonthlyLeaveBalance.objects.get_or_create(
-            user=leave_request.user,
-            year=now.year,
-            month=now.month,
-            defaults={'total_allowed': 4, 'used_leaves': 0, 'remaining_leaves': 4}
-        )
-        
-        balance.used_leaves += requested_days
-        balance.remaining_leaves = balance.total_allowed - balance.used_leaves
-        balance.save()
-        
-        # Create notification
-        try:
-            Notification.objects.create(
-                user=leave_request.user,
-                title='Leave Request Approved',
-                message=f'Your {leave_request.leave_type} leave request from {leave_request.start_date} to {leave_request.end_date} has been approved.',
-                notification_type='leave_approved'
-            )
-        except Exception:
-            pass
+        # Charges the ledger (split across the months the leave spans) and the balances,
+        # and queues the employee's notification in the same transaction
+        approve_leave_request(leave_request, request.user)
         
         return Response({'message': 'Leave approved and balance updated'})
     except LeaveRequest.DoesNotExist:
@@ -449,64 +488,144 @@ def reject_leave(request, leave_id):
     
     try:
         leave_request = LeaveRequest.objects.get(id=leave_id)
-        
-        # If previously approved, restore leave balance
-        if leave_request.status == 'approved':
-            requested_days = (leave_request.end_date - leave_request.start_date).days + 1
-            if leave_request.leave_type == 'half_day':
-                requested_days = 0.5
-            
-            now = timezone.now()
-            balance, _ = MonthlyLeaveBalance.objects.get_or_create(
-                user=leave_request.user,
-                year=now.year,
-                month=now.month,
-                defaults={'total_allowed': 4, 'used_leaves': 0, 'remaining_leaves': 4}
-            )
-            
-            balance.used_leaves -= requested_days
-            balance.remaining_leaves = balance.total_allowed - balance.used_leaves
-            balance.save()
-        
-        leave_request.status = 'rejected'
-        leave_request.approved_by = request.user
-        leave_request.save()
-        
-        # Create notification
-        try:
-            Notification.objects.create(
-                user=leave_request.user,
-                title='Leave Request Rejected',
-                message=f'Your {leave_request.leave_type} leave request from {leave_request.start_date} to {leave_request.end_date} has been rejected.',
-                notification_type='leave_rejected'
-            )
-        except Exception:
-            pass
+        # If previously approved, the ledger refunds the days to their months
+        reject_leave_request(leave_request, request.user)
         
         return Response({'message': 'Leave rejected'})
     except LeaveRequest.DoesNotExist:
         return Response({'error': 'Leave request not found'}, status=status.HTTP_404_NOT_FOUND)
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def bulk_leave_decision(request):
+    """Approve or reject a list of leave requests in one transaction"""
+    if request.user.role != 'admin':
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    if not request.user.organization:
+        return Response({'error': 'No organization assigned'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    action = request.data.get('action')
+    leave_ids = request.data.get('ids')
+    if action not in DECISIONS:
+        return Response({'error': "action must be 'approve' or 'reject'"}, status=status.HTTP_400_BAD_REQUEST)
+    if not isinstance(leave_ids, list) or not leave_ids or not all(isinstance(i, int) and not isinstance(i, bool) for i in leave_ids):
+        return Response({'error': 'ids must be a non-empty list of leave request ids'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(leave_ids) > MAX_BULK_DECISIONS:
+        return Response({'error': f'At most {MAX_BULK_DECISIONS} leave requests per call'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    results = decide_leave_requests(request.user.organization, request.user, leave_ids, action)
+    return Response({'action': action, 'results': results})
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def leave_calendar(request):
+    """Who is off on each day between ``?from=`` and ``?to=`` (default: this week)"""
+    if not request.user.organization:
+        return Response({'error': 'No organization assigned'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        date_from, date_to = parse_calendar_range(request.query_params)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Admins see the whole organization, employees only their own leave
+    employee = request.query_params.get('employee') if request.user.role == 'admin' else request.user.pk
+    if employee and not str(employee).isdigit():
+        return Response({'error': 'employee must be a user id'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    rows = calendar_queryset(request.user.organization, date_from, date_to, employee)
+    return Response({'from': date_from, 'to': date_to, 'days': calendar_days(rows)})
+
 @api_view(['GET'])
+@authentication_classes([ClaimsJWTAuthentication])
 @permission_classes([permissions.IsAuthenticated])
 def notifications(request):
     try:
-        notifications = Notification.objects.filter(user=request.user)[:20]
-        serializer = NotificationSerializer(notifications, many=True)
-        return Response(serializer.data)
+        notifications = Notification.objects.filter(user_id=request.user.pk)
+        if request.query_params.get('unread') in ('1', 'true'):
+            notifications = notifications.filter(is_read=False)
+        return Response(paginate(request, notifications, NotificationSerializer, ('-created_at', '-id'), default_limit=20))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception:
-        return Response([])
+        return Response({'results': [], 'next_cursor': None})
+
+# Event stream (served over ASGI; a WSGI worker would block on it)
+EVENT_STREAM_HEARTBEAT = 15
+
+def sse_message(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+async def event_stream(request):
+    """Push the user's attendance state changes and new notifications as server-sent events"""
+    # EventSource cannot set headers, so the access token may also come as ?token=
+    raw_token = request.GET.get('token')
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        raw_token = header.split(' ', 1)[1]
+    if not raw_token:
+        return JsonResponse({'error': 'Authentication credentials were not provided.'}, status=401)
+    
+    authentication = ClaimsJWTAuthentication()
+    try:
+        # get_user() refuses revoked tokens, not just malformed or expired ones
+        user = await sync_to_async(authentication.get_user)(authentication.get_validated_token(raw_token))
+    except InvalidToken:
+        return JsonResponse({'error': 'Invalid or expired token'}, status=401)
+    except AuthenticationFailed as e:
+        return JsonResponse({'error': str(e.detail)}, status=401)
+    # The claim is serialized as a string; publishers key events by the real pk
+    user_id = get_user_model()._meta.pk.to_python(user.id)
+    # A stream stays open for hours and the active claim only changes with a new
+    # token, so check the account itself (it may have been deactivated in the admin)
+    if not await get_user_model().objects.filter(pk=user_id, is_active=True).aexists():
+        return JsonResponse({'error': 'User is inactive'}, status=401)
+    
+    async def stream():
+        broker = get_broker()
+        queue = broker.subscribe(user_id)
+        try:
+            # Current state first, so clients need no separate status call
+            state = await sync_to_async(get_presence)(user_id)
+            yield sse_message('attendance', state)
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), EVENT_STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield sse_message(event, data)
+        finally:
+            broker.unsubscribe(user_id, queue)
+    
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 @api_view(['PATCH'])
 @permission_classes([permissions.IsAuthenticated])
 def mark_notification_read(request, notification_id):
-    try:
-        notification = Notification.objects.get(id=notification_id, user=request.user)
-        notification.is_read = True
-        notification.save()
-        return Response({'message': 'Notification marked as read'})
-    except Notification.DoesNotExist:
+    # A conditional UPDATE; the unread counter only moves if the notification was unread
+    if not mark_read(request.user, notification_id):
         return Response({'error': 'Notification not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response({'message': 'Notification marked as read'})
+
+@api_view(['PATCH'])
+@permission_classes([permissions.IsAuthenticated])
+def mark_all_notifications_read(request):
+    marked = mark_all_read(request.user)
+    return Response({'message': 'All notifications marked as read', 'marked_read': marked, 'unread': 0})
+
+@api_view(['GET'])
+@authentication_classes([ClaimsJWTAuthentication])
+@permission_classes([permissions.IsAuthenticated])
+def notification_unread_count(request):
+    """The bell icon's badge: one primary-key read of the user's counter"""
+    return Response({'unread': unread_count(request.user.pk)})
+LEAVE_HISTORY_PAGE_SIZE = 20
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def employee_leave_history(request, employee_id):
@@ -524,48 +643,33 @@ def employee_leave_history(request, employee_id):
     except User.DoesNotExist:
         return Response({'error': 'Employee not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    # Get leave history
-    leaves = LeaveRequest.objects.filter(user=employee).order_by('-applied_on')
+    # Get leave history, one page at a time
+    try:
+        leaves, next_cursor = keyset_page(
+            LeaveRequest.objects.filter(user=employee).select_related('user'),
+            LEAVE_ORDERING, request.query_params.get('cursor'), parse_limit(request.query_params, LEAVE_HISTORY_PAGE_SIZE)
+        )
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
     # Get leave balance for current month
     now = timezone.now()
-    balance, _ = MonthlyLeaveBalance.objects.get_or_create(
-        user=employee,
-        year=now.year,
-        month=now.month,
-        defaults={'total_allowed': 4, 'used_leaves': 0, 'remaining_leaves': 4}
-    )
-    
-    # Calculate leave statistics
-    approved_leaves = leaves.filter(status='approved')
-    total_days_taken = sum(
-        (leave.end_date - leave.start_date).days + 1 
-        for leave in approved_leaves
-    )
-    
-    leave_by_type = {}
-    for leave in approved_leaves:
-        days = (leave.end_date - leave.start_date).days + 1
-        leave_by_type[leave.leave_type] = leave_by_type.get(leave.leave_type, 0) + days
+    balance = month_balance(employee, now.year, now.month)
     
     return Response({
         'employee': {
             'id': employee.id,
             'name': f"{employee.first_name} {employee.last_name}",
             'employee_id': employee.employee_id,
-            'profile_picture': request.build_absolute_uri(employee.profile_picture.url) if employee.profile_picture else None
+            'profile_picture': picture_url(request, employee, 'small')
         },
         'leave_balance': {
             'total_allowed': balance.total_allowed,
             'used_leaves': balance.used_leaves,
             'remaining_leaves': balance.remaining_leaves
         },
-        'statistics': {
-            'total_days_taken': total_days_taken,
-            'leave_by_type': leave_by_type,
-            'total_requests': leaves.count(),
-            'approved_requests': approved_leaves.count(),
-            'pending_requests': leaves.filter(status='pending').count()
-        },
-        'leave_history': LeaveRequestSerializer(leaves, many=True).data
+        # One conditional-aggregation query, cached until the employee's leaves change
+        'statistics': get_leave_stats(employee.pk),
+        'leave_history': LeaveRequestSerializer(leaves, many=True).data,
+        'next_cursor': next_cursor
     })
@@ -3,6 +3,10 @@ ASGI config for attendance_system project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve the project with an ASGI server (e.g. ``uvicorn attendance_system.asgi:application``)
+so the long-lived ``/api/attendance/events/`` streams are held by the event
+loop rather than by a worker thread each.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -83,9 +83,51 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Wait for the write lock instead of failing during the clock-in
+            # rush, and take it up front so transactions never deadlock on
+            # a read-to-write lock upgrade.
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+        },
+        'TEST': {
+            # A file (not shared-cache memory) database, so concurrent tests
+            # see real SQLite locking
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    }
+}
+
+
+# Cache
+# Local memory works for a single process; point this at a shared backend
+# (Redis, Memcached, database) when running several workers.
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
+# Seconds a user's cached clock-in state is kept for /api/attendance/status/
+ATTENDANCE_PRESENCE_TTL = 60 * 60 * 24
+
+# Seconds an employee's leave statistics are cached; writes invalidate them sooner
+ATTENDANCE_LEAVE_STATS_TTL = 60 * 60
+
+# Delivers attendance/notification events to /api/attendance/events/ streams.
+# The in-process broker only reaches streams held by the same worker.
+ATTENDANCE_EVENT_BROKER = 'attendance.events.InProcessBroker'
+
+# Upper bound on clock events accepted by one /api/attendance/events/batch/ call
+ATTENDANCE_BATCH_MAX_EVENTS = 50000
+
+# purge_notifications: read notifications older than this many days are removed,
+# copied to NotificationArchive first when ARCHIVE is on
+ATTENDANCE_NOTIFICATION_RETENTION_DAYS = 90
+ATTENDANCE_NOTIFICATION_ARCHIVE = False
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -131,7 +173,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.VersionedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -146,6 +188,14 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': True,
 }
 
+# Seconds a user's token version is cached for ClaimsJWTAuthentication; with a
+# per-process cache this bounds how long a revoked token works on other workers
+ACCOUNTS_TOKEN_VERSION_TTL = 60 * 5
+
+# Seconds an authenticated user (with their organization) stays cached; every
+# write path through the API drops the entry sooner
+ACCOUNTS_USER_CACHE_TTL = 60 * 5
+
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
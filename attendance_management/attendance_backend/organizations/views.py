@@ -5,6 +5,7 @@ from django.contrib.auth import get_user_model
 from django.db import transaction
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
+from attendance.pagination import paginate
 from .models import Organization, OrganizationAdmin
 from .serializers import OrganizationSerializer, OrganizationRegistrationSerializer
 
@@ -66,5 +67,7 @@ def organization_register(request):
 @permission_classes([])
 def organization_list(request):
     organizations = Organization.objects.filter(is_active=True)
-    serializer = OrganizationSerializer(organizations, many=True)
-    return Response(serializer.data)
\ No newline at end of file
+    try:
+        return Response(paginate(request, organizations, OrganizationSerializer, ('id',)))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file